@@ -0,0 +1,162 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+import ai
+
+# Background move advisor: expectimax search off the UI thread.
+#
+# submit(board) hands the board to a worker, which searches it iteratively
+# deeper and publishes the best move after every finished depth. poll()
+# picks those results up without blocking, so a frame loop (pygame's main
+# loop, a kivy Clock callback) calls both every frame and never waits for
+# the search.
+#
+# Every submit() bumps a generation counter that the worker also sees, as
+# a shared RawValue read without a lock. The search checks it every few
+# hundred nodes and drops out as soon as it changes, so a stale board
+# stops costing CPU within a millisecond or so; results tagged with an
+# older generation are thrown away by poll(). Boards travel over a request
+# queue (the worker skips to the newest one) and results over a result
+# queue, as small tuples.
+#
+# The worker is a process by default, so the search runs at full speed
+# beside the UI instead of sharing its interpreter lock; use_process=False
+# runs it on a thread instead, for platforms without multiprocessing
+# (Android) or to save the start-up cost.
+
+
+class _Counter:
+    """The slice of RawValue the worker uses, for the thread worker"""
+
+    def __init__(self):
+        self.value = 0
+
+
+def _advise(requests, results, generation, max_depth, table_size):
+    """Worker loop: search each requested board until a newer one arrives"""
+    searcher = ai.ExpectimaxAI(max_depth=max_depth, table_size=table_size)
+    while True:
+        request = requests.get()
+        # Only the newest request matters
+        while request is not None:
+            try:
+                request = requests.get_nowait()
+            except queue.Empty:
+                break
+        if request is None:
+            return
+        wanted, board = request
+        if generation.value != wanted:
+            continue
+
+        searcher.cancelled = lambda: generation.value != wanted
+        depth = direction = None
+        for depth, direction in searcher.deepen(board):
+            results.put((wanted, depth, direction, False))
+        if depth is not None and generation.value == wanted:
+            results.put((wanted, depth, direction, True))
+
+
+class MoveAdvisor:
+    def __init__(self, max_depth=6, table_size=1 << 18, use_process=True):
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.use_process = use_process
+        self.board = None        # Board being advised on, None when idle
+        self.advice = None       # (direction, depth, final) for it, once known
+        self.submitted_at = None
+        self.searches = 0        # Boards submitted
+        self._generation = 0
+        self._worker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        if self.use_process:
+            self._shared = multiprocessing.RawValue('Q', 0)
+            self._requests = multiprocessing.Queue()
+            self._results = multiprocessing.Queue()
+            worker_class = multiprocessing.Process
+        else:
+            self._shared = _Counter()
+            self._requests = queue.Queue()
+            self._results = queue.Queue()
+            worker_class = threading.Thread
+        self._worker = worker_class(
+            target=_advise, name='MoveAdvisor', daemon=True,
+            args=(self._requests, self._results, self._shared, self.max_depth, self.table_size))
+        self._worker.start()
+
+    def submit(self, board):
+        """Advise on board from now on; does nothing if it already is"""
+        if board == self.board:
+            return
+        if self._worker is None:
+            self._start()
+        self._generation += 1
+        self._shared.value = self._generation
+        self._requests.put((self._generation, board))
+        self.board = board
+        self.advice = None
+        self.submitted_at = time.perf_counter()
+        self.searches += 1
+
+    def cancel(self):
+        """Stop searching; the worker goes idle until the next submit()"""
+        if self.board is None:
+            return
+        self._generation += 1
+        self._shared.value = self._generation
+        self.board = None
+        self.advice = None
+
+    def poll(self):
+        """Collect finished results, returns the current advice or None
+
+        The advice is a (direction, depth, final) tuple for the submitted
+        board: the best move of the deepest search finished so far, final
+        once the search is complete. direction is None when no move is
+        legal.
+        """
+        if self._worker is None:
+            return None
+        while True:
+            try:
+                generation, depth, direction, final = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                self.advice = (direction, depth, final)
+        return self.advice
+
+    @property
+    def searching(self):
+        """True while a submitted board has no final advice yet"""
+        return self.board is not None and (self.advice is None or not self.advice[2])
+
+    def elapsed_ms(self):
+        """Time since the current board was submitted"""
+        if self.submitted_at is None:
+            return 0.0
+        return (time.perf_counter() - self.submitted_at) * 1000.0
+
+    def close(self, timeout=1.0):
+        """Stop the worker"""
+        if self._worker is None:
+            return
+        self.cancel()
+        self._requests.put(None)
+        self._worker.join(timeout)
+        if self.use_process:
+            if self._worker.is_alive():
+                self._worker.terminate()
+                self._worker.join()
+            self._requests.close()
+            self._results.close()
+        self._worker = None
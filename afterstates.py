@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+import bitboard
+import heuristic
+import nboard
+
+# Afterstates: for one board, the board and score each of the four moves
+# leads to, and which of them are legal. The front-ends look them up once
+# per position, so a key press commits a ready-made result, an illegal move
+# is turned away without doing any work, and the game-over check and hints
+# read the same entry, as does the AI for the root of its search. Caches are
+# shared per board size and bounded, so long sessions and several games in
+# one process don't grow them without limit.
+#
+# Entries are (boards, scores, legal): the afterstate board and score per
+# direction, indexed like bitboard.DIRECTIONS, and a bitmask with bit d set
+# when direction d changes the board. The cache is an OrderedDict kept in
+# least recently used order: a hit moves the board to the end, and once the
+# cache is over capacity the board at the front is dropped.
+
+DEFAULT_CAPACITY = 1 << 16
+
+_caches = {}
+
+
+def get_cache(size):
+    """Return the AfterstateCache shared by size x size games"""
+    cache = _caches.get(size)
+    if cache is None:
+        cache = _caches[size] = AfterstateCache(nboard.get_engine(size))
+    return cache
+
+
+class AfterstateCache:
+    def __init__(self, engine, capacity=DEFAULT_CAPACITY):
+        self.engine = engine
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, board):
+        """Return the (boards, scores, legal) entry for board"""
+        entries = self.entries
+        entry = entries.get(board)
+        if entry is not None:
+            self.hits += 1
+            entries.move_to_end(board)
+            return entry
+
+        self.misses += 1
+        move_left, move_right, move_up, move_down = self.engine.moves
+        left, left_score = move_left(board)
+        right, right_score = move_right(board)
+        up, up_score = move_up(board)
+        down, down_score = move_down(board)
+        legal = ((left != board) | (right != board) << 1 |
+                 (up != board) << 2 | (down != board) << 3)
+        entry = entries[board] = ((left, right, up, down),
+                                  (left_score, right_score, up_score, down_score), legal)
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+        return entry
+
+    def legal_moves(self, board):
+        """Directions that change board"""
+        legal = self.get(board)[2]
+        return [d for d in bitboard.DIRECTIONS if legal >> d & 1]
+
+    def is_game_over(self, board):
+        return not self.get(board)[2]
+
+    def hint(self, board, evaluate=None):
+        """Suggest a direction by one-ply lookahead, None if no move is legal
+
+        Each legal move is rated by its score plus evaluate(afterstate).
+        evaluate defaults to the AI heuristic on 4x4 boards and to a count
+        of empty cells, weighted like the heuristic's, on other sizes.
+        """
+        boards, scores, legal = self.get(board)
+        if not legal:
+            return None
+        if evaluate is None:
+            evaluate = self._default_evaluate()
+        best = None
+        best_value = None
+        for direction in bitboard.DIRECTIONS:
+            if legal >> direction & 1:
+                value = scores[direction] + evaluate(boards[direction])
+                if best_value is None or value > best_value:
+                    best = direction
+                    best_value = value
+        return best
+
+    def _default_evaluate(self):
+        if self.engine.size == 4:
+            return heuristic.evaluate
+        weight = heuristic.DEFAULT_WEIGHTS['empty']
+        count_empty = self.engine.count_empty
+        return lambda board: weight * count_empty(board)
+
+    def clear(self):
+        self.entries.clear()
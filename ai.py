@@ -0,0 +1,181 @@
+import time
+
+import bitboard
+import heuristic
+
+# Expectimax player over packed bitboards. Max nodes try the four moves,
+# chance nodes average over every empty cell receiving a 2 (90%) or a 4
+# (10%). Chance nodes are cached in a bounded transposition table, spawn
+# chains whose probability drops below a cutoff are scored directly, and
+# the search depth grows as the board fills up. The root's moves can come
+# from an afterstates.AfterstateCache shared with the game, which already
+# holds them for the position on screen. Inner max nodes don't use it: the
+# table above already catches repeated positions below the root, and a
+# cache in front of it hit too rarely to pay for its bookkeeping.
+
+SPAWN_2 = 0.9
+SPAWN_4 = 0.1
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def search_depth(board, max_depth=6):
+    """Pick a search depth from the number of empty cells"""
+    empty = bitboard.count_empty(board)
+    if empty >= 8:
+        depth = 2
+    elif empty >= 4:
+        depth = 3
+    elif empty >= 2:
+        depth = 4
+    else:
+        depth = 5
+    return min(depth, max_depth)
+
+
+class ExpectimaxAI:
+    def __init__(self, evaluate=heuristic.evaluate, max_depth=6, prob_cutoff=1e-4,
+                 table_size=1 << 18, target_moves_per_sec=10, afterstates=None):
+        self.evaluate = evaluate
+        self.max_depth = max_depth
+        self.prob_cutoff = prob_cutoff
+        self.table_size = table_size
+        self.target_moves_per_sec = target_moves_per_sec
+        self.afterstates = afterstates
+        self.table = {}
+        self.nodes = 0
+        self.last_depth = 0
+        self.deadline = None
+        self.cancelled = None  # Optional callable, a search stops once it returns True
+
+    def default_budget_ms(self):
+        """Time per move that meets the moves/second target"""
+        return 1000.0 / self.target_moves_per_sec
+
+    def best_move(self, board, time_budget_ms=None):
+        """Return the best direction for board, or None if no move is legal
+
+        Searches iteratively deeper up to the adaptive depth and returns the
+        result of the deepest search that finished inside the time budget.
+        """
+        moves = self._root_moves(board)
+        if not moves:
+            return None
+        if len(moves) == 1:
+            return moves[0][0]
+
+        if time_budget_ms is None:
+            time_budget_ms = self.default_budget_ms()
+        self.deadline = time.perf_counter() + time_budget_ms / 1000.0
+        best = moves[0][0]
+        try:
+            for _, best in self.deepen(board):
+                pass
+        finally:
+            self.deadline = None
+        return best
+
+    def deepen(self, board, max_depth=None):
+        """Yield (depth, direction) as each iteration of the search finishes
+
+        Goes up to the adaptive depth, or max_depth when given, and stops
+        quietly once the deadline passes or cancelled() returns True. A
+        board with fewer than two legal moves yields (0, the move or None).
+        """
+        moves = self._root_moves(board)
+        if len(moves) < 2:
+            yield 0, moves[0][0] if moves else None
+            return
+
+        self.nodes = 0
+        self.last_depth = 0
+        self.trim_table()
+        if max_depth is None:
+            max_depth = search_depth(board, self.max_depth)
+        for depth in range(1, max_depth + 1):
+            try:
+                best = self._search_root(moves, depth)
+            except SearchTimeout:
+                return
+            self.last_depth = depth
+            yield depth, best
+
+    def trim_table(self):
+        """Empty the transposition table once it is full
+
+        _chance stops inserting at table_size, so a full table would
+        otherwise keep its old positions for good and cache nothing new.
+        """
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+
+    def _root_moves(self, board):
+        """(direction, afterstate, score) of every legal move"""
+        if self.afterstates is not None:
+            boards, scores, legal = self.afterstates.get(board)
+            return [(d, boards[d], scores[d]) for d in bitboard.DIRECTIONS if legal >> d & 1]
+        moves = [(d, bitboard.move(board, d)) for d in bitboard.DIRECTIONS]
+        return [(d, new, score) for d, (new, score) in moves if new != board]
+
+    def _search_root(self, moves, depth):
+        best_value = None
+        best_direction = None
+        for direction, new_board, score in moves:
+            value = score + self._chance(new_board, depth, 1.0)
+            if best_value is None or value > best_value:
+                best_value = value
+                best_direction = direction
+        return best_direction
+
+    def _max(self, board, depth, prob):
+        best = None
+        for move in bitboard.MOVES:
+            new_board, score = move(board)
+            if new_board == board:
+                continue
+            value = score + self._chance(new_board, depth, prob)
+            if best is None or value > best:
+                best = value
+        # No legal move: the game is over here
+        return best if best is not None else 0.0
+
+    def _chance(self, board, depth, prob):
+        if depth <= 0 or prob < self.prob_cutoff:
+            return self.evaluate(board)
+
+        entry = self.table.get(board)
+        if entry is not None and entry[0] >= depth:
+            return entry[1]
+
+        self.nodes += 1
+        if not self.nodes & 0xFF and (
+                (self.deadline is not None and time.perf_counter() > self.deadline) or
+                (self.cancelled is not None and self.cancelled())):
+            raise SearchTimeout()
+
+        empty = bitboard.empty_cells(board)
+        prob_2 = prob * SPAWN_2 / len(empty)
+        prob_4 = prob * SPAWN_4 / len(empty)
+        total = 0.0
+        for index in empty:
+            shift = 4 * index
+            total += SPAWN_2 * self._max(board | (1 << shift), depth - 1, prob_2)
+            total += SPAWN_4 * self._max(board | (2 << shift), depth - 1, prob_4)
+        value = total / len(empty)
+
+        if len(self.table) < self.table_size:
+            self.table[board] = (depth, value)
+        return value
+
+
+_default_ai = None
+
+
+def best_move(board, time_budget_ms=100):
+    """Return the best direction for board using a shared ExpectimaxAI"""
+    global _default_ai
+    if _default_ai is None:
+        _default_ai = ExpectimaxAI()
+    return _default_ai.best_move(board, time_budget_ms)
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+# Slot bookkeeping for tile atlases: one image (a pygame Surface, a kivy
+# Texture) cut into a grid of equal slots, each holding one rendered tile
+# or number. The front-ends ask for a key such as (value, cell size) and
+# get back the rectangle to blit from; the first request for a key has the
+# front-end paint it into a free slot, every later one is a dict lookup.
+# Nothing is painted up front, so start-up only pays for the image.
+#
+# Slots are kept in an OrderedDict in least recently used order. Once
+# every slot is taken, a new key takes over the slot at the front, so huge
+# tiles on big boards can't grow the image without limit. This module
+# knows nothing about either UI toolkit; painting is a callback.
+#
+# Rects are (x, y, width, height) in the image's own coordinates, measured
+# from whichever corner the toolkit counts from (top-left in pygame,
+# bottom-left in kivy); painting and blitting use the same ones.
+
+DEFAULT_CAPACITY = 64
+
+
+class TileAtlas:
+    def __init__(self, slot_width, slot_height, capacity=DEFAULT_CAPACITY, columns=None):
+        self.slot_width = slot_width
+        self.slot_height = slot_height
+        self.capacity = capacity
+        self.columns = columns or max(1, int(capacity ** 0.5 + 0.999))
+        self.rows = -(-capacity // self.columns)
+        self.width = self.columns * slot_width
+        self.height = self.rows * slot_height
+        self.slots = OrderedDict()  # key -> (slot, rect), least recently used first
+        self.free = list(range(capacity - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    def slot_rect(self, slot):
+        """(x, y, width, height) of a whole slot"""
+        row, column = divmod(slot, self.columns)
+        return (column * self.slot_width, row * self.slot_height,
+                self.slot_width, self.slot_height)
+
+    def get(self, key, paint):
+        """Rect of key's image, painted with paint(key, rect) on a miss
+
+        paint gets the whole slot and may return the (width, height) it
+        actually used, anchored at the slot's corner; the rect returned
+        here and by later hits is then cut down to that.
+        """
+        slots = self.slots
+        entry = slots.get(key)
+        if entry is not None:
+            self.hits += 1
+            slots.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = slots.popitem(last=False)[1][0]
+            self.evictions += 1
+        rect = self.slot_rect(slot)
+        used = paint(key, rect)
+        if used is not None:
+            rect = (rect[0], rect[1], used[0], used[1])
+        slots[key] = (slot, rect)
+        return rect
+
+    def clear(self):
+        """Forget every key; their slots get painted over as they are reused"""
+        self.slots.clear()
+        self.free = list(range(self.capacity - 1, -1, -1))
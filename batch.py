@@ -0,0 +1,177 @@
+import numpy as np
+
+import bitboard
+from rng import BulkRandom
+
+# Steps many 4x4 games at once. Boards are kept as an (N,) uint64 array in
+# the same packed layout as bitboard, and moves use the same row tables,
+# copied into NumPy arrays so a whole batch is handled by a few fancy-index
+# lookups per row.
+
+_U = np.uint64
+_ROW_MASK = _U(0xFFFF)
+_CELL_MASK = _U(0xF)
+_NIBBLE_LOW_BITS = _U(0x1111111111111111)
+_CELL_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+_ROW_LEFT = np.array(bitboard.ROW_LEFT, dtype=np.uint64)
+_ROW_RIGHT = np.array(bitboard.ROW_RIGHT, dtype=np.uint64)
+_COL_UP = np.array(bitboard.COL_UP, dtype=np.uint64)
+_COL_DOWN = np.array(bitboard.COL_DOWN, dtype=np.uint64)
+_SCORE_LEFT = np.array(bitboard.SCORE_LEFT, dtype=np.int64)
+_SCORE_RIGHT = np.array(bitboard.SCORE_RIGHT, dtype=np.int64)
+
+# (result table, score table, read from transposed board, output shift step)
+_MOVE_TABLES = {
+    bitboard.LEFT: (_ROW_LEFT, _SCORE_LEFT, False, 16),
+    bitboard.RIGHT: (_ROW_RIGHT, _SCORE_RIGHT, False, 16),
+    bitboard.UP: (_COL_UP, _SCORE_LEFT, True, 4),
+    bitboard.DOWN: (_COL_DOWN, _SCORE_RIGHT, True, 4),
+}
+
+
+def transpose(boards):
+    """Swap rows and columns of every board"""
+    a1 = boards & _U(0xF0F00F0FF0F00F0F)
+    a2 = boards & _U(0x0000F0F00000F0F0)
+    a3 = boards & _U(0x0F0F00000F0F0000)
+    a = a1 | (a2 << _U(12)) | (a3 >> _U(12))
+    b1 = a & _U(0xFF00FF0000FF00FF)
+    b2 = a & _U(0x00FF00FF00000000)
+    b3 = a & _U(0x00000000FF00FF00)
+    return b1 | (b2 >> _U(24)) | (b3 << _U(24))
+
+
+def move(boards, direction):
+    """Move every board in one direction, returns (new_boards, score_gained)"""
+    result_table, score_table, transposed, step = _MOVE_TABLES[direction]
+    src = transpose(boards) if transposed else boards
+    new = np.zeros_like(boards)
+    score = np.zeros(boards.shape, dtype=np.int64)
+    for k in range(4):
+        row = ((src >> _U(16 * k)) & _ROW_MASK).astype(np.intp)
+        new |= result_table[row] << _U(step * k)
+        score += score_table[row]
+    return new, score
+
+
+def move_all(boards, out=None, scores=None):
+    """Move every board in all four directions
+
+    Returns (4, N) arrays of new boards and scores indexed by direction,
+    written into out and scores when given. The rows of the board and of
+    its transpose are read once and shared by the two directions using them.
+    """
+    n = len(boards)
+    if out is None:
+        out = np.empty((4, n), dtype=np.uint64)
+    if scores is None:
+        scores = np.empty((4, n), dtype=np.int64)
+    out[:, :n] = 0
+    scores[:, :n] = 0
+    for src, first, second in ((boards, bitboard.LEFT, bitboard.RIGHT),
+                               (transpose(boards), bitboard.UP, bitboard.DOWN)):
+        for k in range(4):
+            row = ((src >> _U(16 * k)) & _ROW_MASK).astype(np.intp)
+            for direction in (first, second):
+                result_table, score_table, _, step = _MOVE_TABLES[direction]
+                out[direction, :n] |= result_table[row] << _U(step * k)
+                scores[direction, :n] += score_table[row]
+    return out[:, :n], scores[:, :n]
+
+
+def empty_cells(boards):
+    """Return an (N, 16) bool array marking the empty cells of every board"""
+    x = boards | (boards >> _U(2))
+    x |= x >> _U(1)
+    x = ~x & _NIBBLE_LOW_BITS
+    return ((x[:, None] >> _CELL_SHIFTS) & _U(1)).astype(bool)
+
+
+def is_game_over(boards):
+    """Return a bool array, True where no move changes the board"""
+    full = ~empty_cells(boards).any(axis=1)
+    return full & (move(boards, bitboard.LEFT)[0] == boards) & (move(boards, bitboard.UP)[0] == boards)
+
+
+def spawn(boards, rng, mask=None):
+    """Add a random tile (2 or 4) to an empty cell of every board in mask"""
+    empty = empty_cells(boards)
+    counts = empty.sum(axis=1)
+    if mask is None:
+        mask = counts > 0
+    else:
+        mask = mask & (counts > 0)
+
+    # Pick the k-th empty cell with k uniform in [0, count)
+    k = (rng.random(len(boards)) * counts).astype(np.int64)
+    index = (np.cumsum(empty, axis=1) > k[:, None]).argmax(axis=1).astype(np.uint64)
+    exponent = np.where(rng.random(len(boards)) < 0.9, _U(1), _U(2))
+    tiles = np.where(mask, exponent << (index * _U(4)), _U(0))
+    return boards | tiles
+
+
+def to_grids(boards):
+    """Unpack boards into an (N, 4, 4) array of tile values"""
+    exponents = ((boards[:, None] >> _CELL_SHIFTS) & _CELL_MASK).astype(np.int64)
+    values = np.where(exponents > 0, np.left_shift(1, exponents), 0)
+    return values.reshape(len(boards), bitboard.SIZE, bitboard.SIZE)
+
+
+def from_grids(grids):
+    """Pack an (N, 4, 4) array of tile values into boards"""
+    values = np.asarray(grids, dtype=np.int64).reshape(-1, 16)
+    exponents = np.zeros(values.shape, dtype=np.uint64)
+    nonzero = values > 0
+    exponents[nonzero] = np.log2(values[nonzero]).round().astype(np.uint64)
+    return np.bitwise_or.reduce(exponents << _CELL_SHIFTS, axis=1)
+
+
+class BatchGame:
+    def __init__(self, n, seed=None):
+        self.rng = BulkRandom(seed)
+        self.boards = np.zeros(n, dtype=np.uint64)
+        self.scores = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def __len__(self):
+        return len(self.boards)
+
+    def reset(self, mask=None):
+        """Start new games on every board in mask (all boards by default)"""
+        if mask is None:
+            mask = np.ones(len(self.boards), dtype=bool)
+        boards = np.where(mask, _U(0), self.boards)
+        boards = spawn(boards, self.rng, mask)
+        self.boards = spawn(boards, self.rng, mask)
+        self.scores[mask] = 0
+        self.done[mask] = False
+
+    def step(self, actions):
+        """Apply one action per board and spawn tiles where something moved
+
+        actions is an (N,) array of LEFT/RIGHT/UP/DOWN. Finished boards are
+        left untouched. Returns (score_gained, moved, done) arrays.
+        """
+        actions = np.asarray(actions)
+        new_boards = self.boards.copy()
+        score_gained = np.zeros(len(self.boards), dtype=np.int64)
+        for direction in bitboard.DIRECTIONS:
+            selected = (actions == direction) & ~self.done
+            if not selected.any():
+                continue
+            moved_boards, score = move(self.boards[selected], direction)
+            new_boards[selected] = moved_boards
+            score_gained[selected] = score
+
+        moved = new_boards != self.boards
+        score_gained[~moved] = 0
+        self.boards = spawn(new_boards, self.rng, moved)
+        self.scores += score_gained
+        self.done |= is_game_over(self.boards)
+        return score_gained, moved, self.done.copy()
+
+    def max_tiles(self):
+        """Return the largest tile value on every board"""
+        return to_grids(self.boards).reshape(len(self.boards), -1).max(axis=1)
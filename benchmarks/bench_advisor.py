@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advisor import MoveAdvisor  # noqa: E402
+from ai import ExpectimaxAI  # noqa: E402
+from game_core import GameCore  # noqa: E402
+
+# Background advisor correctness and UI smoothness. verify() feeds boards
+# to both kinds of worker and checks that every published result matches
+# a serial search of the same boards in the same order (the transposition
+# table carries over between boards, so the order matters), and that a
+# superseded board's results never show up. The timings run a simulated
+# 60 fps UI loop that spends FRAME_WORK_MS per frame on its own work and
+# lets the AI play: blocking best_move() calls, the thread worker and the
+# process worker, and report frame times, moves played and how long each
+# move took to find. They also time how long a stale search takes to give
+# way to a new board. On a single core the process worker shares the CPU
+# with the loop like the thread does; with more cores it searches beside it.
+
+FRAME_MS = 1000.0 / 60
+FRAME_WORK_MS = 4  # Stand-in for event handling and drawing
+MOVE_BUDGET_MS = 100
+
+
+def _positions(count, seed=0):
+    """Mid-game boards with at least two legal moves"""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        game = GameCore(rng.getrandbits(32))
+        for _ in range(rng.randrange(20, 120)):
+            if game.is_game_over():
+                break
+            game.step(rng.randrange(4))
+        if len(game.legal_moves()) >= 2:
+            boards.append(game.board)
+    return boards
+
+
+def _wait_final(advisor, timeout=60.0):
+    """Poll until the advice is final, returns every distinct advice seen"""
+    seen = []
+    deadline = time.perf_counter() + timeout
+    while advisor.searching:
+        advice = advisor.poll()
+        if advice is not None and advice not in seen:
+            seen.append(advice)
+        assert time.perf_counter() < deadline, "advisor never finished"
+        time.sleep(0.0005)
+    if advisor.advice not in seen:
+        seen.append(advisor.advice)
+    return seen
+
+
+def verify(boards=8, seed=0):
+    """Raise AssertionError on the first mismatch, returns results checked"""
+    positions = _positions(boards, seed)
+    serial = ExpectimaxAI()
+    expected = [[(direction, depth) for depth, direction in serial.deepen(board)]
+                for board in positions]
+    checked = 0
+    for use_process in (False, True):
+        with MoveAdvisor(use_process=use_process) as advisor:
+            # A board replaced at once must never publish anything
+            advisor.submit(positions[0] ^ 1)
+            for board, moves in zip(positions, expected):
+                advisor.submit(board)
+                seen = _wait_final(advisor)
+                # Polling can miss intermediate depths but never invents one
+                assert all((d, depth) in moves for d, depth, _ in seen)
+                assert [depth for _, depth, _ in seen] == sorted({depth for _, depth, _ in seen})
+                assert (seen[-1][0], seen[-1][1]) == moves[-1]
+                assert all(not final for _, _, final in seen[:-1]) and seen[-1][2]
+                checked += len(seen)
+    return checked
+
+
+def ui_loop(mode, seconds=5.0, seed=1):
+    """Frame times of a 60 fps loop while the AI plays, and moves made"""
+    game = GameCore(seed)
+    advisor = None
+    searcher = None
+    if mode == 'blocking':
+        searcher = ExpectimaxAI()
+    else:
+        advisor = MoveAdvisor(use_process=mode == 'process')
+    frames = []
+    move_times = []  # Time from a board first being searched to its move
+    end = time.perf_counter() + seconds
+    next_frame = time.perf_counter()
+    while time.perf_counter() < end and not game.is_game_over():
+        start = time.perf_counter()
+        # The UI's own work, pure Python like the search
+        busy_until = start + FRAME_WORK_MS / 1000.0
+        while time.perf_counter() < busy_until:
+            pass
+        if searcher is not None:
+            searched = time.perf_counter()
+            game.step(searcher.best_move(game.board, MOVE_BUDGET_MS))
+            move_times.append((time.perf_counter() - searched) * 1000)
+        else:
+            advisor.submit(game.board)
+            advice = advisor.poll()
+            if advice is not None and advice[0] is not None and (
+                    advice[2] or advisor.elapsed_ms() >= MOVE_BUDGET_MS):
+                move_times.append(advisor.elapsed_ms())
+                game.step(advice[0])
+        frames.append((time.perf_counter() - start) * 1000)
+        # Sleep out the rest of the frame, as Clock.tick(60) does
+        next_frame = max(next_frame + FRAME_MS / 1000.0, time.perf_counter())
+        time.sleep(max(0.0, next_frame - time.perf_counter()))
+    if advisor is not None:
+        advisor.close()
+    frames.sort()
+    move_times.sort()
+    return {
+        'frames': len(frames),
+        'median_frame_ms': round(frames[len(frames) // 2], 2),
+        'p99_frame_ms': round(frames[len(frames) * 99 // 100], 2),
+        'max_frame_ms': round(frames[-1], 2),
+        'over_16ms': sum(f > FRAME_MS for f in frames),
+        'moves_per_sec': round(len(move_times) / seconds, 1),
+        'median_move_ms': round(move_times[len(move_times) // 2], 1),
+    }
+
+
+def cancel_latency(trials=10, seed=2):
+    """Time from submitting a new board to its first result, with and without a stale search"""
+    positions = _positions(4 * trials + 1, seed)
+    results = {}
+    with MoveAdvisor() as advisor:
+        advisor.submit(positions[-1])
+        _wait_final(advisor)  # Start-up and heuristic tables out of the way
+        for name, stale in (('idle', False), ('replacing_search', True)):
+            times = []
+            # Fresh boards for each case, so neither gets the other's table entries
+            for k in range(trials):
+                old, new = positions[2 * k + stale * 2 * trials:][:2]
+                if stale:
+                    advisor.submit(old)
+                    time.sleep(0.02)
+                start = time.perf_counter()
+                advisor.submit(new)
+                while advisor.poll() is None:
+                    time.sleep(0.0002)
+                times.append((time.perf_counter() - start) * 1000)
+                advisor.cancel()
+            times.sort()
+            results[name + '_first_result_ms'] = round(times[len(times) // 2], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the background move advisor")
+    parser.add_argument('--seconds', type=float, default=5.0, help="length of each UI run")
+    parser.add_argument('--skip-verify', action='store_true')
+    args = parser.parse_args(argv)
+    if not args.skip_verify:
+        print(f"verified {verify()} results", file=sys.stderr)
+    print(json.dumps({
+        'ui_loop': {mode: ui_loop(mode, args.seconds) for mode in ('blocking', 'thread', 'process')},
+        'cancel': cancel_latency(),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
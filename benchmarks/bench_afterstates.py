@@ -0,0 +1,83 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nboard  # noqa: E402
+from afterstates import AfterstateCache  # noqa: E402
+from game_core import GameCore  # noqa: E402
+
+# The front-ends look up a position's four afterstates while they wait for
+# input, so a key press only commits one (tests/test_afterstates.py checks
+# the entries against the engine). timings() compares the work done between
+# a key press and the new board: computing the move as it is played, or
+# committing a prefetched afterstate, for legal and illegal moves alike,
+# and times a hint.
+
+
+def _sample(count, size, seed=0):
+    rng = random.Random(seed)
+    game = GameCore(seed, size)
+    positions = []
+    while len(positions) < count:
+        if game.is_game_over():
+            game.reset()
+        direction = rng.randrange(4)
+        positions.append((game.board, direction))
+        game.step(direction)
+    return positions
+
+
+def _best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def timings(size=4, count=20000, repeat=5):
+    """Microseconds from key press to new board, with and without prefetching"""
+    positions = _sample(count, size)
+    plain = GameCore(0, size)
+    cached = GameCore(0, size, afterstates=AfterstateCache(nboard.get_engine(size)))
+    legal = sum(1 for board, d in positions if cached.afterstates.get(board)[2] >> d & 1)
+
+    def computed():
+        for board, direction in positions:
+            plain.board = board
+            plain.move(direction)
+
+    def committed():
+        for board, direction in positions:
+            cached.board = board
+            cached.move(direction)
+
+    def prefetch():
+        for board, _ in positions:
+            cached.afterstates.get(board)
+
+    def hints():
+        for board, _ in positions:
+            cached.board = board
+            cached.hint()
+
+    cached.afterstates.clear()
+    prefetch_time = _best(prefetch, 1)
+    return {
+        'size': size,
+        'positions': count,
+        'legal_moves': legal,
+        'computed_move_us': round(_best(computed, repeat) / count * 1e6, 3),
+        'committed_move_us': round(_best(committed, repeat) / count * 1e6, 3),
+        'prefetch_us': round(prefetch_time / count * 1e6, 3),
+        'hint_us': round(_best(hints, repeat) / count * 1e6, 3),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps([timings(4), timings(8, count=5000)], indent=2))
@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nboard  # noqa: E402
+from bench_sizes import sample_boards  # noqa: E402
+
+# Tile atlases of both front-ends (tests/test_atlas.py checks that pygame
+# frames drawn from the atlas are pixel for pixel the old direct drawing).
+# The pygame timings compare drawing tile by tile with a rect and a freshly
+# rendered number (the old Game2048.draw) with the atlas, for a whole-board
+# frame and for a new Game2048 up to its first frame. The kivy part runs in
+# a child process (both toolkits want SDL) and needs a window provider: it
+# checks that every atlas region draws like the label texture it was cut
+# from, and times changing a tile's number with a label rendered per
+# change, with one cached texture per number (the previous scheme) and
+# with the atlas.
+
+BOARD_SIZES = (4, 8, 16)
+
+
+def _boards(size, count, seed=0):
+    """Boards from random play, plus some with one big tile per cell"""
+    boards = sample_boards(size, count, seed)
+    engine = nboard.get_engine(size)
+    for offset in range(0, count // 10):
+        grid = [[1 << (1 + (offset + i * size + j) % min(engine.cell_mask, 30))
+                 for j in range(size)] for i in range(size)]
+        boards.append(engine.from_grid(grid))
+    return boards
+
+
+def _draw_directly(game, screen):
+    """The grid as Game2048.draw painted it before the atlas"""
+    import pygame
+    import main
+    cell_size = game.cell_size
+    grid = game.grid
+    for i in range(game.size):
+        for j in range(game.size):
+            x, y = game.cell_pos(i, j)
+            value = grid[i][j]
+            pygame.draw.rect(screen, main.COLORS.get(value, main.COLORS[8192]),
+                             (x, y, cell_size, cell_size), border_radius=3)
+            if value != 0:
+                text_color = main.COLORS['text_light'] if value > 4 else main.COLORS['text_dark']
+                font_size = main.tile_font_size(value, cell_size)
+                font = game.tile_fonts.get(font_size)
+                if font is None:
+                    font = game.tile_fonts[font_size] = pygame.font.Font(None, font_size)
+                text = font.render(str(value), True, text_color)
+                screen.blit(text, text.get_rect(center=(x + cell_size // 2, y + cell_size // 2)))
+
+
+def _draw_atlas(game, screen):
+    grid = game.grid
+    for i in range(game.size):
+        for j in range(game.size):
+            game.tiles.blit(screen, grid[i][j], game.cell_pos(i, j))
+
+
+class _NullStore:
+    best_score = 0
+
+    def set_best_score(self, score):
+        pass
+
+    def record_game(self, *args):
+        pass
+
+
+def pygame_frames(frames=200):
+    """ms per whole-grid frame and to a new game's first frame, direct vs atlas"""
+    import pygame
+    import main
+    pygame.init()
+    results = {}
+    for size in BOARD_SIZES:
+        states = _boards(size, frames)
+        row = {}
+        for name, draw in (('direct', _draw_directly), ('atlas', _draw_atlas)):
+            # A new game and its first frame; fonts and tiles all start cold
+            main.Game2048(seed=0, store=_NullStore(), size=size)  # Module-level set-up out of the way
+            start = time.perf_counter()
+            game = main.Game2048(seed=0, store=_NullStore(), size=size)
+            screen = pygame.Surface((game.window_width, game.window_height))
+            draw(game, screen)
+            row[name + '_first_frame_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            for board in states:  # Warm every font and tile
+                game.board = board
+                draw(game, screen)
+            start = time.perf_counter()
+            for board in states:
+                game.board = board
+                draw(game, screen)
+            row[name + '_frame_ms'] = round((time.perf_counter() - start) / len(states) * 1000, 3)
+        atlas = game.tiles.atlas
+        row['atlas_tiles'] = len(atlas)
+        surface = game.tiles.surface
+        row['atlas_kb'] = surface.get_width() * surface.get_height() * surface.get_bytesize() // 1024
+        results[f'{size}x{size}'] = row
+    pygame.quit()
+    return results
+
+
+def kivy_part(changes=3000):
+    """Glyph regions against their labels, and the cost of changing a tile's number"""
+    # Importing the window creates the GL context the Fbo below draws into
+    from kivy.core.window import Window  # noqa: F401
+    from kivy.graphics import Color, Fbo, Rectangle
+    import kivy_main
+
+    def draw(texture):
+        fbo = Fbo(size=(texture.width, texture.height))
+        with fbo:
+            Color(1, 1, 1, 1)
+            Rectangle(texture=texture, size=texture.size)
+        fbo.draw()
+        return fbo.pixels
+
+    glyphs = kivy_main.GlyphAtlas()
+    checked = 0
+    values = [1 << e for e in range(1, 31)]
+    for board_size in (4, 8):
+        for value in values:
+            font_size = kivy_main.tile_font_size(value, board_size)
+            label = glyphs._render(value, font_size)
+            region = glyphs.region(value, board_size)
+            assert region.size == label.size, (value, region.size, label.size)
+            assert draw(region) == draw(label), value
+            checked += 1
+
+    rng = random.Random(0)
+    sequence = [rng.choice(values[:17]) for _ in range(changes)]
+    tile = kivy_main.TileWidget(board_size=4)
+    results = {'regions_checked': checked}
+
+    def per_label(value, board_size):
+        label = kivy_main._number_label(str(value), kivy_main.tile_font_size(value, board_size),
+                                        kivy_main.TEXT_DARK if value <= 4 else kivy_main.TEXT_LIGHT)
+        label.refresh()
+        return label.texture
+
+    cached = {}
+
+    def per_number(value, board_size):
+        key = (value, kivy_main.tile_font_size(value, board_size))
+        texture = cached.get(key)
+        if texture is None:
+            texture = cached[key] = per_label(value, board_size)
+        return texture
+
+    fresh = kivy_main.GlyphAtlas()
+    schemes = (('label_per_change', per_label), ('texture_per_number', per_number),
+               ('atlas', fresh.region))
+    for name, source in schemes:
+        kivy_main.label_texture = source
+        # The first pass includes rendering every number once
+        start = time.perf_counter()
+        for value in values[:17]:
+            tile.value = 0
+            tile.set_value(value)
+        results[name + '_first_pass_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        start = time.perf_counter()
+        for value in sequence:
+            tile.value = 0
+            tile.set_value(value)
+        results[name + '_change_us'] = round((time.perf_counter() - start) / changes * 1e6, 1)
+    results['atlas_texture_kb'] = fresh.atlas.width * fresh.atlas.height * 4 // 1024
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time the tile atlases")
+    parser.add_argument('--kivy', action='store_true', help="run only the kivy part, in this process")
+    parser.add_argument('--skip-kivy', action='store_true')
+    args = parser.parse_args(argv)
+    if args.kivy:
+        print(json.dumps(kivy_part()))
+        return 0
+    # pygame draws off screen; the kivy child keeps the real video driver
+    child_env = dict(os.environ)
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    results = {'pygame': pygame_frames()}
+    if not args.skip_kivy:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--kivy'],
+                             capture_output=True, text=True, env=child_env)
+        # kivy may exit non-zero at shutdown after printing its results
+        lines = out.stdout.strip().splitlines()
+        results['kivy'] = json.loads(lines[-1]) if lines else {
+            'error': (out.stderr.strip().splitlines() or ['no output, no window provider?'])[-1]}
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+
+# Board-moves per second of BatchGame.step for growing batch sizes. Boards
+# that finish are restarted so the batch stays full for the whole run.
+
+
+def measure(n, steps=50, seed=0):
+    game = batch.BatchGame(n, seed=seed)
+    actions = game.rng.integers(0, 4, size=(steps, n))
+    start = time.perf_counter()
+    for k in range(steps):
+        game.step(actions[k])
+        if game.done.any():
+            game.reset(game.done)
+    elapsed = time.perf_counter() - start
+    return {
+        'boards': n,
+        'steps': steps,
+        'board_moves_per_sec': round(n * steps / elapsed),
+    }
+
+
+def run(sizes=(1000, 10000, 100000)):
+    return [measure(n) for n in sizes]
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
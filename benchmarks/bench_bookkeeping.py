@@ -0,0 +1,108 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bitboard  # noqa: E402
+import nboard  # noqa: E402
+from game_core import GameCore  # noqa: E402
+
+# GameCore keeps an empty-cell mask, the max tile and a cached game-over
+# flag up to date as it moves and spawns. The timings compare repeated
+# status queries and whole turns with and without the bookkeeping; the
+# check against a from-scratch recomputation is tests/test_game_core.py.
+
+
+class _Reference:
+    """The old spawn: rng.choice over a freshly built list of empty cells"""
+
+    def __init__(self, seed, size):
+        self.rng = random.Random(seed)
+        self.engine = nboard.get_engine(size)
+
+    def spawn(self, board):
+        cells = self.engine.empty_cells(board)
+        if not cells:
+            return board, None
+        index = self.rng.choice(cells)
+        exponent = 1 if self.rng.random() < 0.9 else 2
+        return self.engine.set_exponent(board, index, exponent), (index, exponent)
+
+
+def _sample(count=20000, seed=0):
+    rng = random.Random(seed)
+    game = GameCore(seed)
+    boards = []
+    while len(boards) < count:
+        if game.is_game_over():
+            game.reset()
+        if game.step(rng.randrange(4))[0]:
+            boards.append(game.board)
+    return boards
+
+
+def _best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def timings(count=20000, frames=10, repeat=5):
+    """Status queries per board (as a renderer asks every frame) and turns/s"""
+    boards = _sample(count)
+    game = GameCore(0)
+
+    def rescan_status():
+        for board in boards:
+            for _ in range(frames):
+                bitboard.is_game_over(board)
+                bitboard.has_won(board)
+
+    def cached_status():
+        for board in boards:
+            game.board = board
+            for _ in range(frames):
+                game.is_game_over()
+                game.has_won()
+
+    rng = random.Random(0)
+    directions = [rng.randrange(4) for _ in range(count)]
+
+    def reference_turns():
+        reference = _Reference(0, 4)
+        board, _ = reference.spawn(0)
+        board, _ = reference.spawn(board)
+        for direction in directions:
+            if bitboard.is_game_over(board):
+                board, _ = reference.spawn(reference.spawn(0)[0])
+            new_board, _ = bitboard.move(board, direction)
+            if new_board != board and not bitboard.is_game_over(new_board):
+                new_board, _ = reference.spawn(new_board)
+            board = new_board
+            bitboard.has_won(board)
+
+    def bookkept_turns():
+        turn_game = GameCore(0)
+        for direction in directions:
+            if turn_game.is_game_over():
+                turn_game.reset()
+            turn_game.step(direction)
+            turn_game.has_won()
+
+    queries = count * frames * 2
+    return {
+        'rescan_status_queries_per_sec': round(queries / _best(rescan_status, repeat)),
+        'cached_status_queries_per_sec': round(queries / _best(cached_status, repeat)),
+        'rescan_turns_per_sec': round(count / _best(reference_turns, repeat)),
+        'bookkept_turns_per_sec': round(count / _best(bookkept_turns, repeat)),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(timings(), indent=2))
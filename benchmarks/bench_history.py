@@ -0,0 +1,103 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_core import GameCore  # noqa: E402
+from history import History  # noqa: E402
+from rng import SplitMix64  # noqa: E402
+
+# Undo history memory and speed (tests/test_history.py checks the restored
+# states). The measurements fill a history with 100k turns, with the
+# default Mersenne Twister RNG and with SplitMix64, and compare it to a
+# list of deep-copied grids with getstate() snapshots (measured on fewer
+# entries and scaled, it would need gigabytes).
+
+
+def _play(game, history, count, seed=0):
+    """Record count turns from as many games as it takes, returns seconds spent recording"""
+    rng = random.Random(seed)
+    recorded = 0
+    elapsed = 0.0
+    while recorded < count:
+        if game.is_game_over():
+            game.reset()
+        if game.step(rng.randrange(4))[0]:
+            start = time.perf_counter()
+            history.record(game)
+            elapsed += time.perf_counter() - start
+            recorded += 1
+    return elapsed
+
+
+def history_bytes(entries, rng_class):
+    game = GameCore(0, rng_class=rng_class)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = History(game, entries)
+    # Recorded by hand, so resetting between games doesn't clear it
+    game.observers.remove(history)
+    _play(game, history, entries)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    record = _play(game, history, entries // 10, seed=1) / (entries // 10)
+
+    start = time.perf_counter()
+    while history.undo():
+        pass
+    undo = (time.perf_counter() - start) / entries
+    start = time.perf_counter()
+    while history.redo():
+        pass
+    redo = (time.perf_counter() - start) / entries
+    return used / entries, record, undo, redo
+
+
+def naive_bytes(entries, rng_class):
+    """A list of deep-copied list grids, scores and getstate() snapshots"""
+    game = GameCore(0, rng_class=rng_class)
+    rng = random.Random(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    stack = []
+    while len(stack) < entries:
+        if game.is_game_over():
+            game.reset()
+        if game.step(rng.randrange(4))[0]:
+            stack.append((copy.deepcopy(game.grid), game.score, game.moves, game.rng.getstate()))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / entries
+
+
+def run(entries=100000, naive_entries=2000):
+    results = {'entries': entries}
+    for name, rng_class in (('mt', random.Random), ('splitmix', SplitMix64)):
+        per_entry, record, undo, redo = history_bytes(entries, rng_class)
+        results[name] = {
+            'history_bytes_per_entry': round(per_entry, 1),
+            'history_mb': round(per_entry * entries / 1e6, 2),
+            'naive_bytes_per_entry': round(naive_bytes(naive_entries, rng_class), 1),
+            'record_us': round(record * 1e6, 2),
+            'undo_us': round(undo * 1e6, 2),
+            'redo_us': round(redo * 1e6, 2),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure undo history memory and speed")
+    parser.add_argument('--entries', type=int, default=100000)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.entries), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
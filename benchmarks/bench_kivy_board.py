@@ -0,0 +1,49 @@
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Times GameBoard.update_display over a simulated move sequence, touching
+# all 16 tiles (the old behaviour) vs only the tiles that changed, and
+# checks that the tiles end up showing the board. Needs a window provider,
+# so run it on a desktop or under a virtual display (e.g. xvfb-run).
+
+
+def simulate(board, moves, full):
+    rng = random.Random(0)
+    board.game.rng.seed(1)
+    board.reset_game()
+    start = time.perf_counter()
+    for _ in range(moves):
+        if board.is_game_over():
+            board.game.reset()
+        moved, _ = board.game.move(rng.randrange(4))
+        if moved:
+            board.add_random_tile()
+        board.update_display(full=full)
+        # Let the shared animation callback run as it would between frames
+        board.animate_tiles(1 / 60)
+    elapsed = time.perf_counter() - start
+    shown = [tile.value for tile in board.tiles]
+    assert shown == [value for row in board.grid for value in row], (full, shown)
+    return elapsed / moves
+
+
+def run(moves=2000):
+    from kivy_main import GameBoard
+
+    board = GameBoard()
+    return {
+        'moves': moves,
+        'all_tiles_ms': round(simulate(board, moves, full=True) * 1000, 4),
+        'changed_tiles_ms': round(simulate(board, moves, full=False) * 1000, 4),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
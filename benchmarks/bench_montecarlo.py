@@ -0,0 +1,157 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+import bitboard  # noqa: E402
+from game_core import GameCore  # noqa: E402
+from montecarlo import MonteCarloAI  # noqa: E402
+
+# Monte Carlo player speed and frame safety. verify() checks batch.move_all
+# against batch.move, that decisions are legal, reproducible for a seed
+# and stop at the playout budget, and that think() spread over many calls
+# reaches a legal decision. The timings report playouts per second by
+# round size, how many playouts early elimination saves on late-game
+# positions, and how long think() calls with an 8 ms slice really take.
+
+FRAME_SLICE_MS = 8
+
+
+def _positions(count, seed=0, moves=(0, 200)):
+    """Boards from random games, after a random number of random moves"""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        game = GameCore(rng.getrandbits(32))
+        for _ in range(rng.randrange(*moves)):
+            if game.is_game_over():
+                break
+            game.step(rng.randrange(4))
+        if not game.is_game_over():
+            boards.append(game.board)
+    return boards
+
+
+def verify(seed=0):
+    """Raise AssertionError on the first failure, returns decisions checked"""
+    rng = np.random.default_rng(seed)
+    boards = np.zeros(1000, dtype=np.uint64)
+    for _ in range(10):
+        boards = batch.spawn(boards, rng)
+    moved, scores = batch.move_all(boards)
+    for direction in bitboard.DIRECTIONS:
+        expected, gained = batch.move(boards, direction)
+        assert (moved[direction] == expected).all() and (scores[direction] == gained).all()
+
+    checked = 0
+    for board in _positions(20, seed):
+        legal = [d for d in bitboard.DIRECTIONS if bitboard.move(board, d)[0] != board]
+        ai = MonteCarloAI(playouts=64, round_size=16, seed=seed, confidence=math.inf)
+        direction = ai.best_move(board, time_budget_ms=1e6)
+        assert direction in legal
+        # Without elimination every move gets the whole budget
+        assert ai.last_playouts == (64 * len(legal) if len(legal) > 1 else 0)
+        again = MonteCarloAI(playouts=64, round_size=16, seed=seed, confidence=math.inf)
+        assert again.best_move(board, time_budget_ms=1e6) == direction
+
+        thinker = MonteCarloAI(playouts=64, round_size=16, seed=seed)
+        decided = None
+        while decided is None:
+            decided = thinker.think(board, 1, decision_budget_ms=1e6)
+        assert decided in legal
+        checked += 1
+
+    over = 0x1234432112344321  # Full, no two neighbours equal
+    assert all(bitboard.move(over, d)[0] == over for d in bitboard.DIRECTIONS)
+    assert MonteCarloAI().best_move(over) is None
+    return checked
+
+
+def throughput(round_sizes=(16, 32, 64, 128, 256), positions=20):
+    results = []
+    boards = _positions(positions, seed=1)
+    for round_size in round_sizes:
+        ai = MonteCarloAI(playouts=round_size, round_size=round_size, confidence=math.inf,
+                          seed=0)
+        for board in boards:
+            ai.best_move(board, time_budget_ms=1e6)
+        results.append({'round_size': round_size,
+                        'playouts_per_sec': round(ai.playouts_per_sec)})
+    return results
+
+
+def early_stopping(positions=20, playouts=256):
+    """Playouts and time per decision with and without elimination
+
+    The positions are from later in the game, where moves differ more.
+    """
+    boards = _positions(positions, seed=2, moves=(100, 300))
+    results = {}
+    choices = {}
+    for name, confidence in (('full', math.inf), ('z_2.58', 2.58), ('z_1.96', 1.96)):
+        ai = MonteCarloAI(playouts=playouts, confidence=confidence, seed=0)
+        start = time.perf_counter()
+        choices[name] = [ai.best_move(board, time_budget_ms=1e6) for board in boards]
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'playouts_per_decision': round(ai.total_playouts / len(boards)),
+            'ms_per_decision': round(elapsed * 1000 / len(boards), 1),
+            # Both sides are estimates, so this is never quite 1
+            'same_choice_as_full': round(sum(
+                a == b for a, b in zip(choices['full'], choices[name])) / len(boards), 2),
+        }
+    return results
+
+
+def frame_slices(moves=50, target_moves_per_sec=10):
+    """Durations of think() calls while playing at the moves/second target"""
+    game = GameCore(3)
+    ai = MonteCarloAI(target_moves_per_sec=target_moves_per_sec, seed=0)
+    durations = []
+    frames_per_move = []
+    frames = 0
+    while len(frames_per_move) < moves and not game.is_game_over():
+        start = time.perf_counter()
+        direction = ai.think(game.board, FRAME_SLICE_MS)
+        durations.append((time.perf_counter() - start) * 1000)
+        frames += 1
+        if direction is not None:
+            game.step(direction)
+            frames_per_move.append(frames)
+            frames = 0
+    durations.sort()
+    return {
+        'slice_ms': FRAME_SLICE_MS,
+        'calls': len(durations),
+        'median_ms': round(durations[len(durations) // 2], 2),
+        'p99_ms': round(durations[len(durations) * 99 // 100], 2),
+        'max_ms': round(durations[-1], 2),
+        'frames_per_move': round(sum(frames_per_move) / len(frames_per_move), 1),
+        'playouts_per_sec': round(ai.playouts_per_sec),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the Monte Carlo player")
+    parser.add_argument('--skip-verify', action='store_true')
+    args = parser.parse_args(argv)
+    if not args.skip_verify:
+        print(f"verified {verify()} decisions", file=sys.stderr)
+    print(json.dumps({
+        'throughput': throughput(),
+        'early_stopping': early_stopping(),
+        'frame_slices': frame_slices(),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
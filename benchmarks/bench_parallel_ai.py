@@ -0,0 +1,70 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai  # noqa: E402
+from parallel_ai import ParallelExpectimaxAI  # noqa: E402
+from selfplay import corner_policy  # noqa: E402
+from game_core import GameCore  # noqa: E402
+
+# Search nodes per second of the root-split parallel AI against the number
+# of worker processes, with the serial ExpectimaxAI as the baseline. Every
+# run searches the same positions to a fixed depth with a generous budget,
+# so the node counts are comparable and only the wall time changes.
+
+
+def sample_boards(count=20, seed=0, skip=150):
+    game = GameCore(seed)
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        if game.is_game_over():
+            game.reset()
+        game.step(corner_policy(game, rng))
+        if game.moves > skip and game.moves % 10 == 0:
+            boards.append(game.board)
+    return boards
+
+
+def measure(searcher, boards, budget_ms=60000):
+    nodes = 0
+    start = time.perf_counter()
+    for board in boards:
+        searcher.best_move(board, budget_ms)
+        nodes += searcher.nodes
+    elapsed = time.perf_counter() - start
+    return {
+        'nodes': nodes,
+        'seconds': round(elapsed, 3),
+        'nodes_per_sec': round(nodes / elapsed),
+    }
+
+
+def worker_counts():
+    counts = []
+    n = 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    counts.append(os.cpu_count() or 1)
+    return counts
+
+
+def run(depth=3, workers=None):
+    boards = sample_boards()
+    serial = ai.ExpectimaxAI(max_depth=depth)
+    results = [dict(workers=0, **measure(serial, boards))]
+    for count in workers or worker_counts():
+        with ParallelExpectimaxAI(count, max_depth=depth) as searcher:
+            # Start the pool before timing
+            searcher.best_move(boards[0], 1000)
+            results.append(dict(workers=count, **measure(searcher, boards)))
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
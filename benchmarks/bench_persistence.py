@@ -0,0 +1,77 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+from persistence import ScoreStore  # noqa: E402
+
+# Frame times of the pygame client while the best score is saved on every
+# move (the old kivy behaviour), comparing a synchronous json.dump on the UI
+# thread with ScoreStore's background writer.
+
+
+def sync_save(path, score):
+    with open(path, 'w') as f:
+        json.dump({'best_score': score}, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def frames(screen, save, count=600):
+    game = main.Game2048(seed=1, store=ScoreStore(tempfile.mkdtemp()))
+    renderer = main.Renderer(game)
+    rng = random.Random(0)
+    times = []
+    for frame in range(count):
+        start = time.perf_counter()
+        if game.is_game_over():
+            game.reset()
+        game.step(rng.randrange(4))
+        save(frame)
+        rects = renderer.render(screen)
+        if rects:
+            pygame.display.update(rects)
+        times.append(time.perf_counter() - start)
+    game.store.close()
+    times.sort()
+    return {
+        'mean_ms': round(sum(times) / len(times) * 1000, 3),
+        'p99_ms': round(times[int(len(times) * 0.99)] * 1000, 3),
+        'max_ms': round(times[-1] * 1000, 3),
+    }
+
+
+def run():
+    pygame.init()
+    screen = pygame.display.set_mode((main.WINDOW_WIDTH, main.WINDOW_HEIGHT))
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'best_score.json')
+    store = ScoreStore(directory, flush_delay=0.05)
+
+    def background_save(frame):
+        store.set_best_score(frame)
+        if frame % 50 == 0:
+            store.record_game(frame, 256, 100, 60.0)
+
+    results = {
+        'no_save': frames(screen, lambda frame: None),
+        'sync_save': frames(screen, lambda frame: sync_save(path, frame)),
+        'score_store': frames(screen, background_save),
+    }
+    store.close()
+    pygame.quit()
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+
+# Compares the old full-redraw loop (Game2048.draw + display.flip every
+# frame) against the dirty-rectangle Renderer, both while moves happen and
+# while the game sits idle.
+
+
+def _play_moves(game, count, seed=0):
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        if game.is_game_over():
+            game.reset()
+        if game.move(rng.randrange(4))[0]:
+            game.add_random_tile()
+            boards.append((game.board, game.score))
+    return boards
+
+
+def frame_times(screen, moves=500):
+    """Mean ms per frame after a move, full redraw vs dirty rects"""
+    game = main.Game2048(seed=1)
+    states = _play_moves(game, moves)
+
+    start = time.perf_counter()
+    for board, score in states:
+        game.board, game.score = board, score
+        game.draw(screen)
+        pygame.display.flip()
+    full = (time.perf_counter() - start) / len(states)
+
+    renderer = main.Renderer(game)
+    renderer.render(screen)
+    start = time.perf_counter()
+    for board, score in states:
+        game.board, game.score = board, score
+        rects = renderer.render(screen)
+        if rects:
+            pygame.display.update(rects)
+    dirty = (time.perf_counter() - start) / len(states)
+    return {'full_redraw_ms': round(full * 1000, 3), 'dirty_rects_ms': round(dirty * 1000, 3)}
+
+
+def idle_cpu(screen, seconds=1.0):
+    """CPU seconds used per idle wall second, 60 FPS polling vs event.wait"""
+    game = main.Game2048(seed=1)
+    clock = pygame.time.Clock()
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    while time.perf_counter() - wall < seconds:
+        pygame.event.get()
+        game.draw(screen)
+        pygame.display.flip()
+        clock.tick(60)
+    polling = (time.process_time() - cpu) / (time.perf_counter() - wall)
+
+    renderer = main.Renderer(game)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    while time.perf_counter() - wall < seconds:
+        # The game loop blocks in event.wait; the timeout only ends the sample
+        pygame.event.wait(int(seconds * 1000))
+        rects = renderer.render(screen)
+        if rects:
+            pygame.display.update(rects)
+    waiting = (time.process_time() - cpu) / (time.perf_counter() - wall)
+    return {'polling_cpu_per_sec': round(polling, 4), 'event_wait_cpu_per_sec': round(waiting, 4)}
+
+
+def run():
+    pygame.init()
+    screen = pygame.display.set_mode((main.WINDOW_WIDTH, main.WINDOW_HEIGHT))
+    results = {'frame': frame_times(screen), 'idle': idle_cpu(screen)}
+    pygame.quit()
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,71 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import selfplay  # noqa: E402
+from game_core import GameCore  # noqa: E402
+from replay import KEYFRAME_INTERVAL, ReplayRecorder, Replay  # noqa: E402
+
+# Seek, verify and load cost of recorded games. A seek replays at most
+# KEYFRAME_INTERVAL - 1 turns from the nearest keyframe, so its cost does not
+# grow with game length; the per-turn verify cost gives the full-game figure.
+
+
+def record_games(count, seed=0):
+    replays = []
+    for index in range(count):
+        game = GameCore(selfplay.game_seed(seed, index))
+        recorder = ReplayRecorder(game)
+        rng = random.Random(index)
+        while not game.is_game_over():
+            game.step(selfplay.corner_policy(game, rng))
+        replays.append(recorder.replay)
+    return replays
+
+
+def run(games=20, seeks=2000):
+    replays = record_games(games)
+    turns = sum(len(r) for r in replays)
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    for _ in range(seeks):
+        replay = rng.choice(replays)
+        replay.state_at(rng.randrange(len(replay) + 1))
+    seek = (time.perf_counter() - start) / seeks
+
+    # Worst case: the turn just before a keyframe
+    longest = max(replays, key=len)
+    target = min(len(longest), KEYFRAME_INTERVAL - 1)
+    start = time.perf_counter()
+    for _ in range(100):
+        longest.state_at(target)
+    worst_seek = (time.perf_counter() - start) / 100
+
+    start = time.perf_counter()
+    for replay in replays:
+        replay.verify()
+    verify = (time.perf_counter() - start) / turns
+
+    data = [r.to_bytes() for r in replays]
+    start = time.perf_counter()
+    for blob in data:
+        Replay.from_bytes(blob)
+    load = (time.perf_counter() - start) / games
+    return {
+        'games': games,
+        'turns': turns,
+        'bytes_per_turn': round(sum(map(len, data)) / turns, 3),
+        'seek_ms': round(seek * 1000, 4),
+        'worst_seek_ms': round(worst_seek * 1000, 4),
+        'verify_us_per_turn': round(verify * 1e6, 3),
+        'load_ms': round(load * 1000, 4),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+from rng import BulkRandom, SplitMix64  # noqa: E402
+
+# Game RNG draw costs (tests/test_rng.py checks replays from seeds and
+# snapshots, and the spawn statistics). The timings compare uniform floats
+# drawn straight from a NumPy generator with BulkRandom slices, for the
+# batch sizes the simulators use, and a spawn's worth of scalar draws with
+# each RNG class.
+
+SCALAR_RNGS = {
+    'random.Random': random.Random,
+    'SplitMix64': SplitMix64,
+    'BulkRandom': BulkRandom,
+}
+
+
+def draws(sizes=(16, 64, 256, 4096), total=1 << 21, seed=0):
+    """Nanoseconds per uniform float, and per batch.spawn board, by batch size"""
+    results = []
+    boards = np.zeros(max(sizes), dtype=np.uint64)
+    for n in sizes:
+        calls = total // n
+        row = {'batch': n}
+        for name, source in (('generator', np.random.default_rng(seed)), ('bulk', BulkRandom(seed))):
+            start = time.perf_counter()
+            for _ in range(calls):
+                source.random(n)
+            row[name + '_ns_per_float'] = round((time.perf_counter() - start) / (calls * n) * 1e9, 2)
+            start = time.perf_counter()
+            for _ in range(calls // 16):
+                batch.spawn(boards[:n], source)
+            row[name + '_spawn_ns_per_board'] = round(
+                (time.perf_counter() - start) / (calls // 16 * n) * 1e9, 1)
+        results.append(row)
+    return results
+
+
+def scalar(count=200000, seed=0):
+    """Nanoseconds per spawn's worth of draws (a randrange and a random) with each RNG class"""
+    results = {}
+    for name, rng_class in SCALAR_RNGS.items():
+        source = rng_class(seed)
+        start = time.perf_counter()
+        for _ in range(count):
+            source.randrange(12)
+            source.random()
+        results[name + '_ns'] = round((time.perf_counter() - start) / count * 1e9)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the game RNGs")
+    parser.parse_args(argv)
+    print(json.dumps({
+        'draws': draws(),
+        'spawn_draws': scalar(),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from server import Client  # noqa: E402
+
+# Load generator for server.py. Opens a number of connections, spreads the
+# sessions over them and has every connection play its sessions round robin,
+# one move in flight at a time, recording the round-trip latency of each
+# move. By default the server is started as a subprocess on a Unix socket;
+# --connect points the generator at a running server instead.
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+async def _drive(client, sessions, deadline, latencies, rng):
+    while time.perf_counter() < deadline:
+        for k, session in enumerate(sessions):
+            start = time.perf_counter()
+            response = await client.request('move', session=session, direction=rng.randrange(4))
+            latencies.append(time.perf_counter() - start)
+            if response['over']:
+                await client.request('close', session=session)
+                sessions[k] = (await client.request('new'))['session']
+            if time.perf_counter() >= deadline:
+                return
+
+
+async def load(sessions=10000, connections=50, duration=10.0, unix_path=None,
+               host='127.0.0.1', port=2048, seed=0):
+    clients = [await Client.connect(host, port, unix_path) for _ in range(connections)]
+    owned = [[] for _ in clients]
+    for i in range(sessions):
+        response = await clients[i % connections].request('new', seed=seed + i)
+        owned[i % connections].append(response['session'])
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _drive(client, owned[k], deadline, latencies, random.Random(seed + k))
+        for k, client in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    return {
+        'sessions': sessions,
+        'connections': connections,
+        'moves': len(latencies),
+        'moves_per_sec': round(len(latencies) / elapsed),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def run(sessions=10000, connections=50, duration=10.0):
+    """Start a server subprocess and load it, returns the latency summary"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'server.sock')
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py'), '--unix', path],
+                                stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(path):
+                if proc.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                time.sleep(0.05)
+            return asyncio.run(load(sessions, connections, duration, unix_path=path))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure move latency of the game server")
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--connect', metavar='HOST:PORT', help="use a running TCP server")
+    parser.add_argument('--unix', dest='unix_path', help="use a running server on a Unix socket")
+    args = parser.parse_args(argv)
+
+    if args.connect or args.unix_path:
+        host, port = (args.connect or '127.0.0.1:0').rsplit(':', 1)
+        result = asyncio.run(load(args.sessions, args.connections, args.duration,
+                                  args.unix_path, host, int(port)))
+    else:
+        result = run(args.sessions, args.connections, args.duration)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_core import GameCore  # noqa: E402
+from rng import SplitMix64  # noqa: E402
+from sessions import SessionStore  # noqa: E402
+
+# Bytes per session, measured with tracemalloc: live GameCore objects with
+# the default Mersenne Twister RNG and with SplitMix64, and sessions parked
+# in a SessionStore. Also times rehydrating a parked session for a move.
+
+
+def live_bytes(count, rng_class):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [GameCore(i, rng_class=rng_class) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return used / count
+
+
+def parked(count, batch=10000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = SessionStore(max_sessions=count, park_after=0.0)
+    ids = []
+    for i in range(count):
+        ids.append(store.create(i)[0])
+        if len(store.live) >= batch:
+            store.park_idle()
+    store.park_idle()
+    parked_count = store.parked
+    # The id list belongs to the clients, not the store
+    id_bytes = sum(sys.getsizeof(i) for i in ids[:1000]) * count / 1000 + sys.getsizeof(ids)
+    used = tracemalloc.get_traced_memory()[0] - before - id_bytes
+    tracemalloc.stop()
+
+    rng = random.Random(0)
+    sample = rng.sample(ids, 10000)
+    start = time.perf_counter()
+    for session in sample:
+        store.get(session).step(rng.randrange(4))
+    unpark = (time.perf_counter() - start) / len(sample)
+    return {
+        'sessions': count,
+        'parked': parked_count,
+        'bytes_per_session': round(used / count, 1),
+        'array_bytes_per_session': round(store.memory_usage() / count, 1),
+        'unpark_and_move_us': round(unpark * 1e6, 2),
+    }
+
+
+def run(sessions=1000000, live_sample=10000):
+    return {
+        'live_mt_bytes_per_session': round(live_bytes(live_sample, random.Random)),
+        'live_splitmix_bytes_per_session': round(live_bytes(live_sample, SplitMix64)),
+        'parked': parked(sessions),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure memory per game session")
+    parser.add_argument('--sessions', type=int, default=1000000)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.sessions), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nboard  # noqa: E402
+from game_core import GameCore  # noqa: E402
+
+# Engine throughput per board size: raw moves per second on boards from
+# random play, and full GameCore turns (move, spawn, game-over check) per
+# second. Games that end are restarted; long games on big boards are cut
+# off after max_turns so every size gets a mix of early and late boards.
+
+
+def sample_boards(size, count, seed=0, max_turns=2000):
+    rng = random.Random(seed)
+    game = GameCore(seed, size)
+    boards = []
+    turns = 0
+    while len(boards) < count:
+        if game.is_game_over() or turns >= max_turns:
+            game.reset()
+            turns = 0
+        if game.step(rng.randrange(4))[0]:
+            boards.append(game.board)
+            turns += 1
+    return boards
+
+
+def measure(size, count=20000, seed=0):
+    engine = nboard.get_engine(size)
+    boards = sample_boards(size, count, seed)
+
+    start = time.perf_counter()
+    for board in boards:
+        for direction in range(4):
+            engine.move(board, direction)
+    move_elapsed = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    directions = [rng.randrange(4) for _ in range(count)]
+    game = GameCore(seed, size)
+    start = time.perf_counter()
+    for direction in directions:
+        if game.is_game_over():
+            game.reset()
+        game.step(direction)
+    turn_elapsed = time.perf_counter() - start
+
+    return {
+        'size': size,
+        'cell_bits': engine.cell_bits,
+        'table_driven': engine.table_driven,
+        'moves_per_sec': round(4 * count / move_elapsed),
+        'turns_per_sec': round(count / turn_elapsed),
+    }
+
+
+def run(sizes=(3, 4, 5, 6, 8)):
+    return [measure(size) for size in sizes]
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
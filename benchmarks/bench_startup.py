@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Measures how long a fresh interpreter takes to get to a playable game, for
+# the headless core and for the pygame front-end. Every sample runs in its
+# own process so nothing is shared through sys.modules.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS = '''
+import time
+t0 = time.perf_counter()
+import game_core
+t1 = time.perf_counter()
+game = game_core.GameCore()
+game.move_left()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t0)
+'''
+
+PYGAME = '''
+import time
+t0 = time.perf_counter()
+import main
+import pygame
+pygame.init()
+t1 = time.perf_counter()
+game = main.Game2048()
+game.move_left()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t0)
+'''
+
+
+def _run(code, env):
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    import_time, startup_time = map(float, out.split()[-2:])
+    return import_time, startup_time
+
+
+def measure(code, repeat=5, cache_dir=None):
+    """Return the best import and startup times in milliseconds"""
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    if cache_dir is not None:
+        env['GAME2048_CACHE_DIR'] = cache_dir
+    samples = [_run(code, env) for _ in range(repeat)]
+    return {
+        'import_ms': round(min(s[0] for s in samples) * 1000, 2),
+        'startup_ms': round(min(s[1] for s in samples) * 1000, 2),
+    }
+
+
+def run(repeat=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # An empty cache setting disables the table cache entirely
+        results['headless_cold'] = measure(HEADLESS, repeat, cache_dir='')
+        measure(HEADLESS, 1, cache_dir=cache_dir)
+        results['headless_warm'] = measure(HEADLESS, repeat, cache_dir=cache_dir)
+        try:
+            results['pygame'] = measure(PYGAME, repeat, cache_dir=cache_dir)
+        except subprocess.CalledProcessError:
+            results['pygame'] = None
+    return results
+
+
+if __name__ == '__main__':
+    print(json.dumps(run(), indent=2))
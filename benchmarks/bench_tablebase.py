@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_core import GameCore  # noqa: E402
+from tablebase import Tablebase, build  # noqa: E402
+
+PAGE = 4096
+_U = np.uint64
+
+# Tablebase build cost and lookups (tests/test_tablebase.py checks the
+# values). The timings build 3x3 tables of growing targets, then time
+# lookups against the biggest, count how many of its pages the lookups of
+# one game read, and compare games played by the tablebase with games
+# played by the greedy one-ply hint.
+
+
+def _rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def builds(directory, targets=(6, 7, 8)):
+    results = []
+    for target in targets:
+        path = os.path.join(directory, f'3-{target}')
+        start = time.perf_counter()
+        positions = build(path, 3, target)
+        elapsed = time.perf_counter() - start
+        tablebase = Tablebase(path)
+        results.append({
+            'target': 1 << target,
+            'positions': positions,
+            'build_s': round(elapsed, 1),
+            'file_mb': round(sum(os.path.getsize(os.path.join(path, f))
+                                 for f in os.listdir(path)) / 1e6, 1),
+            'new_game_win_probability': round(tablebase.start_value(), 6),
+        })
+    return results
+
+
+def _search_pages(keys, key):
+    """Pages of keys the binary search for key reads"""
+    pages = set()
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        pages.add((keys.offset + mid * keys.itemsize) // PAGE)
+        if keys[mid] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return pages
+
+
+def lookups(path, count=10000, seed=0):
+    """Lookup times, and how much of the table a game's worth of lookups reads
+
+    RSS is reported too, but the page cache may map a file in blocks much
+    bigger than a page (large folios), so it can show most of the table
+    after a few thousand scattered reads whatever the access pattern. The
+    pages each search actually reads are counted instead.
+    """
+    before = _rss()
+    start = time.perf_counter()
+    tablebase = Tablebase(path)
+    opened = time.perf_counter() - start
+    after_open = _rss()
+
+    searched = []
+    find = tablebase._find
+
+    def recording_find(keys):
+        searched.extend(int(key) for key in keys)
+        return find(keys)
+
+    tablebase._find = recording_find
+    game = GameCore(seed, tablebase.size)
+    while not game.is_game_over() and game.max_tile() < 1 << tablebase.target:
+        game.step(tablebase.best_move(game.board)[0])
+    after_game = _rss()
+    del tablebase._find
+    index, _ = find(np.array(searched, dtype=np.uint64))
+    key_pages = set()
+    for key in set(searched):
+        key_pages |= _search_pages(tablebase.keys, _U(key))
+    value_pages = {(tablebase.values.offset + i * 8) // PAGE for i in index.tolist()}
+
+    rng = np.random.default_rng(seed)
+    boards = [int(tablebase.keys[i]) for i in rng.integers(0, len(tablebase), count)]
+
+    start = time.perf_counter()
+    for board in boards:
+        tablebase.value(board)
+    value = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    batch = tablebase.lookup(boards)
+    vectorised = (time.perf_counter() - start) / count
+    assert batch is not None
+    start = time.perf_counter()
+    for board in boards[:1000]:
+        tablebase.best_move(board)
+    best_move = (time.perf_counter() - start) / 1000
+    return {
+        'positions': len(tablebase),
+        'open_ms': round(opened * 1000, 2),
+        'value_us': round(value * 1e6, 1),
+        'batched_lookup_us': round(vectorised * 1e6, 2),
+        'best_move_us': round(best_move * 1e6, 1),
+        'table_mb': round((tablebase.keys.nbytes + tablebase.values.nbytes) / 1e6, 1),
+        'rss_after_open_mb': round((after_open - before) / 1e6, 2),
+        'rss_after_game_mb': round((after_game - before) / 1e6, 2),
+        'game_turns': game.moves,
+        'game_lookups': len(searched),
+        'table_pages': -(-(tablebase.keys.nbytes + tablebase.values.nbytes) // PAGE),
+        'pages_read_by_game': len(key_pages) + len(value_pages),
+    }
+
+
+def play(path, games=200, seed=0):
+    """Share of 3x3 games reaching the target, tablebase vs greedy hint"""
+    tablebase = Tablebase(path)
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for _ in range(games)]
+    results = {}
+    for name in ('tablebase', 'greedy_hint'):
+        won = 0
+        for game_seed in seeds:
+            game = GameCore(game_seed, tablebase.size)
+            while not game.is_game_over() and game.max_tile() < 1 << tablebase.target:
+                exact = tablebase.best_move(game.board) if name == 'tablebase' else None
+                game.step(exact[0] if exact is not None else game.hint())
+            won += game.max_tile() >= 1 << tablebase.target
+        results[name + '_win_rate'] = round(won / games, 3)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure tablebase builds and lookups")
+    parser.add_argument('--targets', type=int, nargs='+', default=[6, 7, 8],
+                        help="3x3 target exponents to build")
+    parser.add_argument('--games', type=int, default=200)
+    args = parser.parse_args(argv)
+    directory = tempfile.mkdtemp(prefix='bench-tablebase-')
+    try:
+        biggest = os.path.join(directory, f'3-{max(args.targets)}')
+        print(json.dumps({
+            'builds': builds(directory, sorted(args.targets)),
+            'lookups': lookups(biggest),
+            'play': play(biggest, args.games),
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
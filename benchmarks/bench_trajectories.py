@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch  # noqa: E402
+from game_core import GameCore  # noqa: E402
+from trajectories import (TrajectoryDataset, TrajectoryRecorder, TrajectoryWriter,  # noqa: E402
+                          export_selfplay)
+
+# Trajectory export speed and memory (tests/test_trajectories.py checks
+# the rows read back). The timings compare the per-turn and batch
+# simulators with and without exporting, and the Python heap peak of
+# exports of growing size with the same batch size (the chunks themselves
+# are file-backed memory maps).
+
+
+def _best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def per_turn(directory, turns=200000):
+    """Turns per second of random headless play, without and with a recorder"""
+    directions = [random.Random(0).randrange(4) for _ in range(turns)]
+    runs = []
+
+    def play(record):
+        game = GameCore(0)
+        writer = None
+        if record:
+            path = os.path.join(directory, 'per-turn-%d' % len(runs))
+            runs.append(path)
+            writer = TrajectoryWriter(path)
+            TrajectoryRecorder(game, writer)
+        for direction in directions:
+            if game.is_game_over():
+                game.reset()
+            game.step(direction)
+        if writer is not None:
+            writer.close()
+            shutil.rmtree(runs[-1])
+
+    return {
+        'plain_turns_per_sec': round(turns / _best(lambda: play(False))),
+        'recorded_turns_per_sec': round(turns / _best(lambda: play(True))),
+    }
+
+
+def batched(directory, boards=10000, steps=100):
+    """Board-moves per second of batch.BatchGame, without and with export"""
+    rows = []
+
+    def play(export):
+        game = batch.BatchGame(boards, seed=0)
+        actions = game.rng.integers(0, 4, size=(steps, boards), dtype=np.uint8)
+        writer = None
+        if export:
+            writer = TrajectoryWriter(os.path.join(directory, 'batched'))
+        for k in range(steps):
+            before = game.boards
+            was_done = game.done.copy()
+            rewards, moved, done = game.step(actions[k])
+            if writer is not None:
+                played = moved & ~was_done
+                writer.write_batch(before[played], actions[k][played], rewards[played],
+                                   done[played])
+            if done.any():
+                game.reset(done)
+        if writer is not None:
+            writer.close()
+            rows.append(writer.rows)
+            shutil.rmtree(os.path.join(directory, 'batched'))
+
+    plain = _best(lambda: play(False))
+    exported = _best(lambda: play(True))
+    return {
+        'plain_board_moves_per_sec': round(boards * steps / plain),
+        'exported_board_moves_per_sec': round(boards * steps / exported),
+        'rows_per_run': rows[-1],
+    }
+
+
+def export_memory(directory, games_list=(10000, 100000)):
+    """Python heap peak of exports of growing size, and reading one back"""
+    results = []
+    for games in games_list:
+        path = os.path.join(directory, f'export-{games}')
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = export_selfplay(path, games, chunk_rows=1 << 20)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        dataset = TrajectoryDataset(path)
+        chunks = list(dataset.iter_chunks())
+        opened = time.perf_counter() - start
+        zero_copy = all(isinstance(chunk['board'].base, np.memmap) or
+                        isinstance(chunk['board'], np.memmap) for chunk in chunks)
+        # Allocated blocks: the unwritten end of the last chunk is sparse
+        disk = sum(os.stat(os.path.join(path, f)).st_blocks * 512 for f in os.listdir(path))
+        results.append({
+            'games': games,
+            'rows': rows,
+            'turns_per_sec': round(rows / elapsed),
+            'heap_peak_mb': round(peak / 1e6, 2),
+            'file_mb': round(disk / 1e6, 1),
+            'open_ms': round(opened * 1000, 2),
+            'zero_copy': zero_copy,
+        })
+        shutil.rmtree(path)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure trajectory export")
+    parser.add_argument('--games', type=int, nargs='+', default=[10000, 100000],
+                        help="games per export in the memory measurement")
+    args = parser.parse_args(argv)
+    directory = tempfile.mkdtemp(prefix='bench-trajectories-')
+    try:
+        print(json.dumps({
+            'per_turn': per_turn(directory),
+            'batched': batched(directory),
+            'export': export_memory(directory, args.games),
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from game_core import GameCore  # noqa: E402
+
+# Benchmark suite for the engine and the pygame renderer, run by
+# `make bench`. Every benchmark yields one number; the suite writes them as
+# JSON and, given a baseline file from an earlier run, flags any that got
+# worse by more than the threshold.
+#
+# Output format:
+#   {"meta": {...}, "results": {name: {"value": v, "unit": u, "higher_is_better": b}}}
+
+DEFAULT_THRESHOLD = 0.10
+SAMPLE_BOARDS = 2000
+
+
+def sample_boards(count=SAMPLE_BOARDS, seed=0):
+    """Mid-game boards from random play, a mix of early and late positions"""
+    rng = random.Random(seed)
+    game = GameCore(seed)
+    boards = []
+    while len(boards) < count:
+        if game.is_game_over():
+            game.reset()
+        if game.step(rng.randrange(4))[0] and game.moves >= 20:
+            boards.append(game.board)
+    return boards
+
+
+def best_rate(func, items, repeat=5):
+    """Best-of-repeat calls per second of func over items"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(items) / best
+
+
+def bench_moves(boards):
+    game = GameCore(0)
+    results = {}
+    for name, method in (('move_left', game.move_left), ('move_right', game.move_right),
+                         ('move_up', game.move_up), ('move_down', game.move_down)):
+        def run(items, method=method):
+            for board in items:
+                game.board = board
+                method()
+        results[name] = (best_rate(run, boards), 'ops/s', True)
+    return results
+
+
+def bench_add_random_tile(boards):
+    game = GameCore(0)
+
+    def run(items):
+        for board in items:
+            game.board = board
+            game.add_random_tile()
+    return {'add_random_tile': (best_rate(run, boards), 'ops/s', True)}
+
+
+def bench_is_game_over(boards):
+    game = GameCore(0)
+
+    def run(items):
+        for board in items:
+            game.board = board
+            game.is_game_over()
+    return {'is_game_over': (best_rate(run, boards), 'ops/s', True)}
+
+
+def bench_random_games(games=200):
+    def run(seeds):
+        for seed in seeds:
+            game = GameCore(seed)
+            rng = random.Random(seed)
+            while not game.is_game_over():
+                game.step(rng.randrange(4))
+    return {'random_games': (best_rate(run, range(games), repeat=3), 'games/s', True)}
+
+
+def bench_draw(boards, frames=300):
+    try:
+        import pygame
+        import main
+    except ImportError:
+        return {}
+    pygame.init()
+    game = main.Game2048(seed=0, store=_NullStore())
+    screen = pygame.display.set_mode((game.window_width, game.window_height))
+    states = boards[:frames]
+
+    def run(items):
+        for board in items:
+            game.board = board
+            game.draw(screen)
+    rate = best_rate(run, states, repeat=3)
+    pygame.quit()
+    return {'draw': (1000.0 / rate, 'ms/frame', False)}
+
+
+def bench_startup(repeat=5):
+    import bench_startup
+    results = {}
+    headless = bench_startup.measure(bench_startup.HEADLESS, repeat)
+    results['startup_headless'] = (headless['startup_ms'], 'ms', False)
+    # Only a missing pygame skips the front-end; any other failure is a bug
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        return results
+    pygame_times = bench_startup.measure(bench_startup.PYGAME, repeat)
+    results['startup_pygame'] = (pygame_times['startup_ms'], 'ms', False)
+    return results
+
+
+class _NullStore:
+    """Score store stand-in so drawing never touches the disk"""
+    best_score = 0
+
+    def set_best_score(self, score):
+        pass
+
+    def record_game(self, *args):
+        pass
+
+
+BENCHMARKS = ('moves', 'add_random_tile', 'is_game_over', 'random_games', 'draw', 'startup')
+
+
+def run(only=None):
+    """Run the suite, returns the result document"""
+    selected = [name for name in BENCHMARKS if not only or name in only]
+    boards = sample_boards()
+    results = {}
+    for name in selected:
+        if name == 'moves':
+            results.update(bench_moves(boards))
+        elif name == 'add_random_tile':
+            results.update(bench_add_random_tile(boards))
+        elif name == 'is_game_over':
+            results.update(bench_is_game_over(boards))
+        elif name == 'random_games':
+            results.update(bench_random_games())
+        elif name == 'draw':
+            results.update(bench_draw(boards))
+        elif name == 'startup':
+            results.update(bench_startup())
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+        },
+        'results': {
+            name: {'value': round(value, 4), 'unit': unit, 'higher_is_better': higher}
+            for name, (value, unit, higher) in results.items()
+        },
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (rows, regressions) comparing two result documents
+
+    Each row is (name, baseline_value, current_value, change, regressed),
+    change being the relative improvement (negative means slower).
+    """
+    rows = []
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or not base['value']:
+            continue
+        change = (result['value'] - base['value']) / base['value']
+        if not result['higher_is_better']:
+            change = -change
+        regressed = change < -threshold
+        rows.append((name, base['value'], result['value'], change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the 2048 benchmark suite")
+    parser.add_argument('-o', '--output', help="write results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="flag regressions against this file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default: %(default)s)")
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help="run only these benchmarks")
+    args = parser.parse_args(argv)
+
+    document = run(args.only)
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(document, baseline, args.threshold)
+        for name, base, value, change, regressed in rows:
+            flag = 'REGRESSION' if regressed else ''
+            print(f"{name:<20} {base:>14.4f} -> {value:>14.4f}  {change:+7.1%}  {flag}",
+                  file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# Bitboard engine for the 4x4 game.
+#
+# The board is a single 64-bit int holding 16 cells of 4 bits each. A cell
+# stores the log2 exponent of its tile (0 = empty, 1 = 2, 2 = 4, ... 15 = 32768).
+# Cell (row, col) lives at bit offset 4 * (4 * row + col), so every row is a
+# 16-bit chunk with its leftmost cell in the lowest nibble.
+#
+# All four moves go through 65536-entry row tables. They are built once and
+# cached on disk so later imports only have to read them back. Tiles of
+# 32768 (exponent 15) are the largest value that fits in a nibble and do
+# not merge with each other.
+
+import array
+import os
+import sys
+
+LEFT, RIGHT, UP, DOWN = range(4)
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+
+SIZE = 4
+ROW_MASK = 0xFFFF
+CELL_MASK = 0xF
+MAX_EXPONENT = 15
+WIN_EXPONENT = 11  # 2048
+
+_NIBBLE_LOW_BITS = 0x1111111111111111
+_TABLES_FILE = 'bitboard-tables-v1-%s.bin' % sys.byteorder
+
+
+def cache_path(filename):
+    """Return the path of a file in the on-disk cache, or None if disabled
+
+    The cache lives in $GAME2048_CACHE_DIR (set it to an empty string to
+    disable caching), defaulting to ~/.cache/game2048.
+    """
+    directory = os.environ.get('GAME2048_CACHE_DIR')
+    if directory is None:
+        directory = os.path.join(os.path.expanduser('~'), '.cache', 'game2048')
+    if not directory:
+        return None
+    return os.path.join(directory, filename)
+
+
+def _build_tables():
+    """Build the row move tables for all 65536 rows"""
+    row_left = [0] * 65536
+    row_right = [0] * 65536
+    score_left = [0] * 65536
+    score_right = [0] * 65536
+    col_up = [0] * 65536
+    col_down = [0] * 65536
+
+    for row in range(65536):
+        line = [row & 0xF, (row >> 4) & 0xF, (row >> 8) & 0xF, (row >> 12) & 0xF]
+
+        # Slide and merge towards index 0, same rules as Game2048.move_left
+        tiles = [v for v in line if v]
+        merged = []
+        score = 0
+        j = 0
+        while j < len(tiles):
+            if j + 1 < len(tiles) and tiles[j] == tiles[j + 1] and tiles[j] < MAX_EXPONENT:
+                merged.append(tiles[j] + 1)
+                score += 1 << (tiles[j] + 1)
+                j += 2
+            else:
+                merged.append(tiles[j])
+                j += 1
+        merged += [0] * (SIZE - len(merged))
+
+        result = merged[0] | (merged[1] << 4) | (merged[2] << 8) | (merged[3] << 12)
+        row_left[row] = result
+        score_left[row] = score
+        col_up[row] = (merged[0] | (merged[1] << 16) |
+                       (merged[2] << 32) | (merged[3] << 48))
+
+        # The right move of the mirrored row is the mirror of the left move
+        rev_row = ((row >> 12) | ((row >> 4) & 0x00F0) |
+                   ((row << 4) & 0x0F00) | ((row << 12) & 0xF000))
+        row_right[rev_row] = ((result >> 12) | ((result >> 4) & 0x00F0) |
+                              ((result << 4) & 0x0F00) | ((result << 12) & 0xF000))
+        score_right[rev_row] = score
+        col_down[rev_row] = (merged[3] | (merged[2] << 16) |
+                             (merged[1] << 32) | (merged[0] << 48))
+
+    return row_left, row_right, score_left, score_right, col_up, col_down
+
+
+def _load_tables():
+    """Read the move tables from the disk cache, building them on a miss"""
+    path = cache_path(_TABLES_FILE)
+    if path is not None:
+        try:
+            data = array.array('Q')
+            with open(path, 'rb') as f:
+                data.fromfile(f, 6 * 65536)
+            return tuple(data[k * 65536:(k + 1) * 65536].tolist() for k in range(6))
+        except (OSError, EOFError):
+            pass
+
+    tables = _build_tables()
+    if path is not None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = array.array('Q')
+            for table in tables:
+                data.extend(table)
+            # Write to a temporary name first so a concurrent import never
+            # sees a half-written file
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                data.tofile(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    return tables
+
+
+ROW_LEFT, ROW_RIGHT, SCORE_LEFT, SCORE_RIGHT, COL_UP, COL_DOWN = _load_tables()
+
+
+def transpose(board):
+    """Swap rows and columns of a packed board"""
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def move_left(board):
+    """Return (new_board, score_gained) for a left move"""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = board >> 48
+    return (ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) |
+            (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48),
+            SCORE_LEFT[r0] + SCORE_LEFT[r1] + SCORE_LEFT[r2] + SCORE_LEFT[r3])
+
+
+def move_right(board):
+    """Return (new_board, score_gained) for a right move"""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = board >> 48
+    return (ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) |
+            (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48),
+            SCORE_RIGHT[r0] + SCORE_RIGHT[r1] + SCORE_RIGHT[r2] + SCORE_RIGHT[r3])
+
+
+def move_up(board):
+    """Return (new_board, score_gained) for an up move"""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = t >> 48
+    return (COL_UP[c0] | (COL_UP[c1] << 4) |
+            (COL_UP[c2] << 8) | (COL_UP[c3] << 12),
+            SCORE_LEFT[c0] + SCORE_LEFT[c1] + SCORE_LEFT[c2] + SCORE_LEFT[c3])
+
+
+def move_down(board):
+    """Return (new_board, score_gained) for a down move"""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = t >> 48
+    return (COL_DOWN[c0] | (COL_DOWN[c1] << 4) |
+            (COL_DOWN[c2] << 8) | (COL_DOWN[c3] << 12),
+            SCORE_RIGHT[c0] + SCORE_RIGHT[c1] + SCORE_RIGHT[c2] + SCORE_RIGHT[c3])
+
+
+MOVES = (move_left, move_right, move_up, move_down)
+
+
+def move(board, direction):
+    """Return (new_board, score_gained) for a move in the given direction"""
+    return MOVES[direction](board)
+
+
+def empty_mask(board):
+    """Return a 16-bit mask with bit i set when cell i is empty"""
+    x = board | (board >> 2)
+    x |= x >> 1
+    x = ~x & _NIBBLE_LOW_BITS
+    # Gather the low bit of every nibble into a 16-bit mask
+    x = (x | (x >> 3)) & 0x0303030303030303
+    x = (x | (x >> 6)) & 0x000F000F000F000F
+    x = (x | (x >> 12)) & 0x000000FF000000FF
+    return (x | (x >> 24)) & 0xFFFF
+
+
+def count_empty(board):
+    """Count empty cells"""
+    x = board | (board >> 2)
+    x |= x >> 1
+    x = ~x & _NIBBLE_LOW_BITS
+    return bin(x).count('1')
+
+
+def empty_cells(board):
+    """Return the indices (4 * row + col) of all empty cells"""
+    return [i for i in range(16) if not (board >> (4 * i)) & CELL_MASK]
+
+
+def select_bit(mask, k):
+    """Return the position of the k-th (from 0) set bit of mask"""
+    for _ in range(k):
+        mask &= mask - 1
+    return (mask & -mask).bit_length() - 1
+
+
+def get_exponent(board, index):
+    """Return the exponent stored in cell index"""
+    return (board >> (4 * index)) & CELL_MASK
+
+
+def set_exponent(board, index, exponent):
+    """Return board with cell index set to exponent"""
+    shift = 4 * index
+    return (board & ~(CELL_MASK << shift)) | (exponent << shift)
+
+
+def max_exponent(board):
+    """Return the largest exponent on the board"""
+    best = 0
+    while board:
+        if board & CELL_MASK > best:
+            best = board & CELL_MASK
+        board >>= 4
+    return best
+
+
+def is_game_over(board):
+    """Check if no move changes the board"""
+    if count_empty(board):
+        return False
+    # On a full board a move is possible iff some neighbours can merge, and
+    # a horizontal (vertical) merge allows both left and right (up and down)
+    return move_left(board)[0] == board and move_up(board)[0] == board
+
+
+def has_won(board, exponent=WIN_EXPONENT):
+    """Check if any tile reached 2 ** exponent"""
+    return max_exponent(board) >= exponent
+
+
+def changed_cells(old, new):
+    """Return (index, exponent in new) of every cell that differs from old
+
+    Every cell counts as changed when old is None.
+    """
+    changed = (1 << (4 * SIZE * SIZE)) - 1 if old is None else old ^ new
+    cells = []
+    index = 0
+    while changed:
+        if changed & CELL_MASK:
+            cells.append((index, (new >> (4 * index)) & CELL_MASK))
+        changed >>= 4
+        index += 1
+    return cells
+
+
+def from_grid(grid):
+    """Pack a 4x4 list grid of tile values into a board"""
+    board = 0
+    for i in range(SIZE):
+        for j in range(SIZE):
+            value = grid[i][j]
+            if value:
+                board |= (value.bit_length() - 1) << (4 * (SIZE * i + j))
+    return board
+
+
+def to_grid(board):
+    """Unpack a board into a 4x4 list grid of tile values"""
+    grid = []
+    for i in range(SIZE):
+        row = []
+        for j in range(SIZE):
+            exponent = (board >> (4 * (SIZE * i + j))) & CELL_MASK
+            row.append(1 << exponent if exponent else 0)
+        grid.append(row)
+    return grid
@@ -0,0 +1,240 @@
+import random
+import time
+
+import bitboard
+import nboard
+from afterstates import AfterstateCache
+
+# Game rules shared by the pygame and kivy front-ends. Nothing in here
+# touches a display, so batch simulations can import it on its own.
+
+LEFT = bitboard.LEFT
+RIGHT = bitboard.RIGHT
+UP = bitboard.UP
+DOWN = bitboard.DOWN
+
+GRID_SIZE = bitboard.SIZE
+
+
+class GameCore:
+    # Slots keep headless games small when a server holds many of them;
+    # front-end subclasses still get a __dict__ for fonts and the like
+    __slots__ = ('seed', 'rng', 'size', 'engine', 'board', 'score', 'moves',
+                 'started_at', 'observers', 'afterstates',
+                 '_status_board', '_empty', '_max_exponent', '_over')
+
+    def __init__(self, seed=None, size=GRID_SIZE, rng_class=random.Random, afterstates=None):
+        # Each game owns its RNG so seeded games are reproducible and
+        # independent of whatever else uses the random module
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        self.rng = rng_class(seed)
+        # Boards of any size are packed ints; 4x4 uses the bitboard tables
+        self.size = size
+        self.engine = nboard.get_engine(size)
+        self.board = 0
+        self.score = 0
+        self.moves = 0
+        self.started_at = time.time()
+        self._status_board = None
+        # An afterstates.AfterstateCache makes moves, the game-over check and
+        # hints read precomputed afterstates; without one moves are computed
+        # as they are played, which suits games that never revisit a board
+        self.afterstates = afterstates
+
+        # Objects with on_step(game, direction, score_gained, spawn) and
+        # on_reset(game) methods, e.g. a replay recorder; those that also
+        # have on_restore(game) hear about undo and redo (see history.py)
+        self.observers = []
+
+        # Add initial tiles
+        self.add_random_tile()
+        self.add_random_tile()
+
+    @classmethod
+    def restore(cls, board, score, moves, seed, rng, size=GRID_SIZE, started_at=None):
+        """Rebuild a game from saved state without spawning any tiles
+
+        rng is the game's RNG object, already positioned where the saved
+        game left off.
+        """
+        game = cls.__new__(cls)
+        game.seed = seed
+        game.rng = rng
+        game.size = size
+        game.engine = nboard.get_engine(size)
+        game.board = board
+        game.score = score
+        game.moves = moves
+        game.started_at = time.time() if started_at is None else started_at
+        game.observers = []
+        game.afterstates = None
+        game._status_board = None
+        return game
+
+    # Status bookkeeping. _empty (bit i set when cell i is empty),
+    # _max_exponent and _over (None until someone asks) describe
+    # _status_board. move() and add_random_tile() keep them current as they
+    # change the board; if anything else assigns to board, the next query
+    # sees the mismatch and rebuilds them.
+
+    def _sync_status(self):
+        board = self.board
+        self._status_board = board
+        self._empty = self.engine.empty_mask(board)
+        self._max_exponent = self.engine.max_exponent(board)
+        self._over = None
+
+    @property
+    def grid(self):
+        """Tile values as a list of rows, unpacked from the bitboard
+
+        The rows are a fresh copy: writing into them leaves the game alone.
+        Assign a whole grid back, or use set_tile() for one cell.
+        """
+        return self.engine.to_grid(self.board)
+
+    @grid.setter
+    def grid(self, grid):
+        self.board = self.engine.from_grid(grid)
+
+    def set_tile(self, row, col, value):
+        """Put a tile value (0 for empty) into one cell of the board"""
+        exponent = value.bit_length() - 1 if value else 0
+        self.board = self.engine.set_exponent(self.board, row * self.size + col, exponent)
+
+    def add_random_tile(self):
+        """Add a random tile (2 or 4) to an empty cell
+
+        Returns (cell_index, exponent) of the new tile, or None if the board
+        is full.
+        """
+        if self.board != self._status_board:
+            self._sync_status()
+        empty = self._empty
+        if not empty:
+            return None
+
+        # The k-th empty cell in index order; draws the same numbers as
+        # choice() on the list of empty cells, so seeded games are unchanged
+        index = bitboard.select_bit(empty, self.rng.randrange(bin(empty).count('1')))
+        exponent = 1 if self.rng.random() < 0.9 else 2
+        self.board = self._status_board = self.engine.set_exponent(self.board, index, exponent)
+        self._empty = empty & ~(1 << index)
+        if exponent > self._max_exponent:
+            self._max_exponent = exponent
+        self._over = None
+        return index, exponent
+
+    def step(self, direction):
+        """Play one turn: move, then spawn a tile if anything moved
+
+        Returns (moved, score_gained) and notifies observers of the turn.
+        """
+        moved, score_gained = self.move(direction)
+        if not moved:
+            return False, 0
+
+        # A move that changed the board always leaves an empty cell, so
+        # there is always a spawn; game over is only worked out after it
+        self.moves += 1
+        spawn = self.add_random_tile()
+        for observer in self.observers:
+            observer.on_step(self, direction, score_gained, spawn)
+        return True, score_gained
+
+    def move(self, direction):
+        """Apply a move, returns (moved, score_gained)"""
+        if self.afterstates is not None:
+            boards, scores, _ = self.afterstates.get(self.board)
+            board = boards[direction]
+            score_gained = scores[direction]
+        else:
+            board, score_gained = self.engine.move(self.board, direction)
+        if board == self.board:
+            return False, 0
+
+        if self.board != self._status_board:
+            self._sync_status()
+        self.board = self._status_board = board
+        self.score += score_gained
+        self._empty = self.engine.empty_mask(board)
+        # A merge into 2 ** e scores 2 ** e, so the max can only have grown
+        # if the move scored at least twice the old max tile
+        if score_gained >> (self._max_exponent + 1):
+            self._max_exponent = self.engine.max_exponent(board)
+        self._over = None
+        return True, score_gained
+
+    def move_left(self):
+        """Move and merge tiles to the left"""
+        return self.move(LEFT)[0]
+
+    def move_right(self):
+        """Move and merge tiles to the right"""
+        return self.move(RIGHT)[0]
+
+    def move_up(self):
+        """Move and merge tiles up"""
+        return self.move(UP)[0]
+
+    def move_down(self):
+        """Move and merge tiles down"""
+        return self.move(DOWN)[0]
+
+    def is_game_over(self):
+        """Check if game is over (no moves possible)"""
+        if self.board != self._status_board:
+            self._sync_status()
+        if self._empty:
+            return False
+        if self._over is None:
+            if self.afterstates is not None:
+                self._over = self.afterstates.is_game_over(self.board)
+            else:
+                self._over = self.engine.is_game_over(self.board)
+        return self._over
+
+    def legal_moves(self):
+        """Directions that would change the board"""
+        if self.afterstates is not None:
+            return self.afterstates.legal_moves(self.board)
+        return [d for d in bitboard.DIRECTIONS
+                if self.engine.move(self.board, d)[0] != self.board]
+
+    def hint(self):
+        """Suggested direction for the current board, None if none is legal"""
+        afterstates = self.afterstates
+        if afterstates is None:
+            afterstates = AfterstateCache(self.engine, capacity=1)
+        return afterstates.hint(self.board)
+
+    def has_won(self):
+        """Check if player has reached 2048"""
+        if self.board != self._status_board:
+            self._sync_status()
+        return self._max_exponent >= bitboard.WIN_EXPONENT
+
+    def max_tile(self):
+        """Return the largest tile value on the board"""
+        if self.board != self._status_board:
+            self._sync_status()
+        return 1 << self._max_exponent if self._max_exponent else 0
+
+    def reset(self):
+        """Start a new game
+
+        The next game is seeded from the current RNG, so a seeded game's
+        successors are reproducible too.
+        """
+        self.seed = self.rng.getrandbits(63)
+        self.rng.seed(self.seed)
+        self.board = 0
+        self.score = 0
+        self.moves = 0
+        self.started_at = time.time()
+        self.add_random_tile()
+        self.add_random_tile()
+        for observer in self.observers:
+            observer.on_reset(self)
@@ -0,0 +1,166 @@
+import array
+import os
+
+import bitboard
+
+# Board evaluation for the AI and hints. Every feature is a per-row value, so
+# it is precomputed once for all 65536 rows; scoring a board is then four
+# row lookups plus four column lookups on the transposed board.
+#
+# The feature tables only depend on the two power parameters and are cached
+# on disk next to the bitboard tables. Weights are applied on top of them,
+# so changing a weight only recombines the tables.
+
+FEATURES = ('empty', 'merges', 'monotonicity', 'sum')
+
+DEFAULT_WEIGHTS = {
+    'lost_penalty': 200000.0,
+    'empty': 270.0,
+    'merges': 700.0,
+    'monotonicity': 47.0,
+    'sum': 11.0,
+}
+
+MONOTONICITY_POWER = 4.0
+SUM_POWER = 3.5
+
+_FEATURES_VERSION = 1
+
+
+def _build_features(monotonicity_power, sum_power):
+    """Compute the raw feature value of every row"""
+    empty = array.array('d', bytes(8 * 65536))
+    merges = array.array('d', bytes(8 * 65536))
+    monotonicity = array.array('d', bytes(8 * 65536))
+    total = array.array('d', bytes(8 * 65536))
+    powered = [(e ** monotonicity_power, e ** sum_power) for e in range(16)]
+
+    for row in range(65536):
+        line = (row & 0xF, (row >> 4) & 0xF, (row >> 8) & 0xF, row >> 12)
+
+        row_sum = 0.0
+        row_empty = 0
+        for e in line:
+            row_sum += powered[e][1]
+            if e == 0:
+                row_empty += 1
+
+        # Count runs of equal tiles that could merge, skipping empty cells
+        row_merges = 0
+        run = 0
+        prev = 0
+        for e in line:
+            if e == 0:
+                continue
+            if e == prev:
+                run += 1
+            else:
+                if run > 0:
+                    row_merges += 1 + run
+                run = 0
+            prev = e
+        if run > 0:
+            row_merges += 1 + run
+
+        # Penalise steps against the row's dominant direction
+        mono_left = 0.0
+        mono_right = 0.0
+        for k in range(3):
+            a = powered[line[k]][0]
+            b = powered[line[k + 1]][0]
+            if line[k] > line[k + 1]:
+                mono_left += a - b
+            else:
+                mono_right += b - a
+
+        empty[row] = row_empty
+        merges[row] = row_merges
+        monotonicity[row] = min(mono_left, mono_right)
+        total[row] = row_sum
+    return {'empty': empty, 'merges': merges, 'monotonicity': monotonicity, 'sum': total}
+
+
+def load_features(monotonicity_power=MONOTONICITY_POWER, sum_power=SUM_POWER, use_cache=True):
+    """Return the feature tables, reading them from the disk cache if possible"""
+    path = None
+    if use_cache:
+        path = bitboard.cache_path('heuristic-v%d-%g-%g.bin' % (
+            _FEATURES_VERSION, monotonicity_power, sum_power))
+    if path is not None:
+        try:
+            data = array.array('d')
+            with open(path, 'rb') as f:
+                data.fromfile(f, len(FEATURES) * 65536)
+                # Trailing bytes mean the file was not written by this version
+                if f.read(1):
+                    raise EOFError(path)
+            return {name: data[k * 65536:(k + 1) * 65536] for k, name in enumerate(FEATURES)}
+        except (OSError, EOFError):
+            pass
+
+    features = _build_features(monotonicity_power, sum_power)
+    if path is not None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                for name in FEATURES:
+                    features[name].tofile(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    return features
+
+
+class Heuristic:
+    def __init__(self, weights=None, monotonicity_power=MONOTONICITY_POWER,
+                 sum_power=SUM_POWER, use_cache=True):
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        self.monotonicity_power = monotonicity_power
+        self.sum_power = sum_power
+        self.use_cache = use_cache
+        self._features = None
+        self._table = None
+
+    @property
+    def table(self):
+        """Weighted score of every row, built on first use"""
+        if self._table is None:
+            if self._features is None:
+                self._features = load_features(self.monotonicity_power, self.sum_power,
+                                               self.use_cache)
+            w = self.weights
+            self._table = [
+                w['lost_penalty'] + w['empty'] * e + w['merges'] * m
+                - w['monotonicity'] * mono - w['sum'] * s
+                for e, m, mono, s in zip(self._features['empty'], self._features['merges'],
+                                         self._features['monotonicity'], self._features['sum'])
+            ]
+        return self._table
+
+    def set_weights(self, **weights):
+        """Change weights; only the weighted table is rebuilt"""
+        unknown = set(weights) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown heuristic weights: {', '.join(sorted(unknown))}")
+        self.weights.update(weights)
+        self._table = None
+
+    def evaluate(self, board):
+        """Score a board with eight row lookups"""
+        table = self.table
+        t = bitboard.transpose(board)
+        return (table[board & 0xFFFF] + table[(board >> 16) & 0xFFFF] +
+                table[(board >> 32) & 0xFFFF] + table[board >> 48] +
+                table[t & 0xFFFF] + table[(t >> 16) & 0xFFFF] +
+                table[(t >> 32) & 0xFFFF] + table[t >> 48])
+
+
+_default = Heuristic()
+
+
+def evaluate(board):
+    """Score a board with the default weights"""
+    return _default.evaluate(board)
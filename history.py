@@ -0,0 +1,180 @@
+import array
+
+from game_core import GameCore
+from rng import MASK64
+
+# Undo/redo history for a game.
+#
+# A History is a game observer that records the state after every turn in
+# a ring buffer of flat arrays: board, score, move count and RNG state.
+# undo() and redo() move a cursor through it and write the state back, so
+# both are O(1) whatever the depth, and playing a move after an undo drops
+# the states that could have been redone. Once depth undo levels are
+# stored, recording overwrites the oldest one.
+#
+# Restoring the RNG state makes a position replay exactly as it was, which
+# also keeps a replay recording valid across undos. RNG states are split
+# into a shared key and a per-entry position:
+#   SplitMix64      the whole state is one int, kept in the position array
+#   random.Random   the 624-word Mersenne Twister key only changes every
+#                   few hundred turns, so consecutive entries share one
+#                   array of it and store the word index as their position
+#   anything else   the getstate() object itself is the key
+#
+# Observers with an on_restore(game) method are told after an undo or redo.
+
+DEFAULT_DEPTH = 1000
+
+_TWISTER_WORDS = 624
+
+
+class _TwisterKey:
+    __slots__ = ('version', 'words', 'gauss_next')
+
+    def __init__(self, version, words, gauss_next):
+        self.version = version
+        self.words = words
+        self.gauss_next = gauss_next
+
+    def matches(self, version, words, gauss_next):
+        return (self.words == words and self.version == version and
+                self.gauss_next == gauss_next)
+
+
+def split_rng_state(state, last_key=None):
+    """Return (key, position) for an RNG getstate() value
+
+    last_key is returned again instead of an equal new key, so runs of
+    entries share one key object.
+    """
+    if isinstance(state, int) and 0 <= state <= MASK64:
+        return None, state
+    if (isinstance(state, tuple) and len(state) == 3 and isinstance(state[1], tuple)
+            and len(state[1]) == _TWISTER_WORDS + 1):
+        version, internal, gauss_next = state
+        words = array.array('L', internal[:_TWISTER_WORDS])
+        if isinstance(last_key, _TwisterKey) and last_key.matches(version, words, gauss_next):
+            return last_key, internal[_TWISTER_WORDS]
+        return _TwisterKey(version, words, gauss_next), internal[_TWISTER_WORDS]
+    return state, 0
+
+
+def join_rng_state(key, position):
+    """Inverse of split_rng_state"""
+    if key is None:
+        return position
+    if isinstance(key, _TwisterKey):
+        return key.version, tuple(key.words) + (position,), key.gauss_next
+    return key
+
+
+class History:
+    def __init__(self, game, depth=DEFAULT_DEPTH):
+        if depth < 1:
+            raise ValueError(f"History depth must be at least 1, got {depth}")
+        self.game = game
+        self.depth = depth
+        capacity = self.capacity = depth + 1  # The current state and depth before it
+
+        # Boards that don't fit in 64 bits (5x5 and up) go in a list
+        if game.engine.cells * game.engine.cell_bits <= 64:
+            self.boards = array.array('Q', [0]) * capacity
+        else:
+            self.boards = [0] * capacity
+        self.scores = array.array('Q', [0]) * capacity
+        self.moves = array.array('L', [0]) * capacity
+        self.rng_positions = array.array('Q', [0]) * capacity
+        self.rng_keys = [None] * capacity
+
+        self._first = 0   # Ring index of the oldest state
+        self._count = 0   # States stored
+        self._cursor = 0  # Offset from the oldest state to the current one
+        self._last_key = None
+        self.record(game)
+        game.observers.append(self)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def undo_levels(self):
+        """How many undo() calls would succeed"""
+        return self._cursor
+
+    @property
+    def redo_levels(self):
+        """How many redo() calls would succeed"""
+        return self._count - 1 - self._cursor
+
+    def record(self, game):
+        """Store game's state as the current one, dropping any redo states"""
+        self._count = self._cursor + 1 if self._count else 0
+        if self._count == self.capacity:
+            self._first = (self._first + 1) % self.capacity
+            self._count -= 1
+        i = (self._first + self._count) % self.capacity
+        self.boards[i] = game.board
+        self.scores[i] = game.score
+        self.moves[i] = game.moves
+        key, position = split_rng_state(game.rng.getstate(), self._last_key)
+        self.rng_keys[i] = self._last_key = key
+        self.rng_positions[i] = position
+        self._cursor = self._count
+        self._count += 1
+
+    def clear(self):
+        """Forget every state, including the current one"""
+        self._count = self._cursor = 0
+        self._last_key = None
+        # Drop the key references so shared RNG keys can be freed
+        self.rng_keys = [None] * self.capacity
+
+    def _restore(self):
+        i = (self._first + self._cursor) % self.capacity
+        game = self.game
+        game.board = self.boards[i]
+        game.score = self.scores[i]
+        game.moves = self.moves[i]
+        game.rng.setstate(join_rng_state(self.rng_keys[i], self.rng_positions[i]))
+        for observer in game.observers:
+            on_restore = getattr(observer, 'on_restore', None)
+            if on_restore is not None:
+                on_restore(game)
+
+    def undo(self):
+        """Go back one state, returns False if there is nothing to undo"""
+        if not self._cursor:
+            return False
+        self._cursor -= 1
+        self._restore()
+        return True
+
+    def redo(self):
+        """Go forward one undone state, returns False if there is none"""
+        if self._cursor >= self._count - 1:
+            return False
+        self._cursor += 1
+        self._restore()
+        return True
+
+    def fork(self, back=0):
+        """A new game starting from the state back undo levels ago
+
+        The new game has its own RNG in the recorded state, so it plays on
+        exactly as the original did from there until their moves differ.
+        """
+        if not 0 <= back <= self._cursor:
+            raise IndexError(f"Can go back 0..{self._cursor} states, not {back}")
+        i = (self._first + self._cursor - back) % self.capacity
+        game = self.game
+        rng = type(game.rng)(game.seed)
+        rng.setstate(join_rng_state(self.rng_keys[i], self.rng_positions[i]))
+        return GameCore.restore(self.boards[i], self.scores[i], self.moves[i], game.seed, rng,
+                                game.size)
+
+    def on_step(self, game, direction, score_gained, spawn):
+        self.record(game)
+
+    def on_reset(self, game):
+        self.clear()
+        self.record(game)
@@ -0,0 +1,209 @@
+import array
+import json
+import os
+import time
+
+# Opt-in timing for the pygame main loop.
+#
+# A Profiler records (phase, start, duration) triples into a fixed-size ring
+# buffer of flat arrays, so recording never allocates and old events simply
+# fall off the end. Phases are timed with `with profiler.phase('render'):`
+# and game methods can be wrapped with instrument(). When profiling is off
+# the loop gets a NullProfiler, whose methods do nothing and whose phase()
+# returns one shared no-op context manager, and no methods are wrapped.
+#
+# The buffer can be dumped in Chrome's trace event format (load it in
+# chrome://tracing or https://ui.perfetto.dev). The pygame client draws a
+# live summary of it with main.Overlay.
+
+DEFAULT_CAPACITY = 1 << 16
+FRAME = 'frame'
+# Upper bounds in ms of the frame time histogram buckets, the last is open
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 33, 66)
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.profiler.record(self.name, self.start, end - self.start)
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.names = []
+        self._name_ids = {}
+        self._ids = array.array('H', bytes(2 * capacity))
+        self._starts = array.array('d', bytes(8 * capacity))
+        self._durations = array.array('d', bytes(8 * capacity))
+        self._next = 0
+        self.total = 0  # Events ever recorded, including overwritten ones
+        self.origin = time.perf_counter()
+        self._frame_start = None
+
+    def _name_id(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def record(self, name, start, duration):
+        """Add one event to the ring buffer"""
+        i = self._next
+        self._ids[i] = self._name_id(name)
+        self._starts[i] = start
+        self._durations[i] = duration
+        self._next = (i + 1) % self.capacity
+        self.total += 1
+
+    def phase(self, name):
+        """Context manager timing the enclosed block as one event"""
+        return _Phase(self, name)
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self._frame_start is not None:
+            self.record(FRAME, self._frame_start, time.perf_counter() - self._frame_start)
+            self._frame_start = None
+
+    def events(self):
+        """Return the buffered events as (name, start, duration), oldest first"""
+        count = min(self.total, self.capacity)
+        first = (self._next - count) % self.capacity
+        names = self.names
+        result = []
+        for k in range(count):
+            i = (first + k) % self.capacity
+            result.append((names[self._ids[i]], self._starts[i], self._durations[i]))
+        return result
+
+    def recent(self, window=1.0):
+        """Events that started within the last window seconds"""
+        cutoff = time.perf_counter() - window
+        result = []
+        count = min(self.total, self.capacity)
+        names = self.names
+        # Walk backwards from the newest event until the window is left
+        for k in range(1, count + 1):
+            i = (self._next - k) % self.capacity
+            if self._starts[i] < cutoff:
+                break
+            result.append((names[self._ids[i]], self._starts[i], self._durations[i]))
+        result.reverse()
+        return result
+
+    def phase_stats(self, events=None):
+        """Return {name: (count, mean_ms, max_ms)} over events"""
+        stats = {}
+        for name, _, duration in (self.events() if events is None else events):
+            count, total, longest = stats.get(name, (0, 0.0, 0.0))
+            stats[name] = (count + 1, total + duration, max(longest, duration))
+        return {name: (count, total * 1000 / count, longest * 1000)
+                for name, (count, total, longest) in stats.items()}
+
+    def frame_histogram(self, events=None):
+        """Count frames per HISTOGRAM_BUCKETS bucket, plus one open bucket"""
+        counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for name, _, duration in (self.events() if events is None else events):
+            if name != FRAME:
+                continue
+            ms = duration * 1000
+            for k, bound in enumerate(HISTOGRAM_BUCKETS):
+                if ms < bound:
+                    counts[k] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def chrome_trace(self):
+        """Buffered events in Chrome's trace event format"""
+        pid = os.getpid()
+        return {
+            'traceEvents': [
+                {'name': name, 'ph': 'X', 'pid': pid, 'tid': 0,
+                 'ts': round((start - self.origin) * 1e6, 3), 'dur': round(duration * 1e6, 3)}
+                for name, start, duration in self.events()
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def dump_chrome_trace(self, path):
+        """Write the buffer to path as a Chrome trace JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every method is a no-op"""
+
+    enabled = False
+    total = 0
+
+    def record(self, name, start, duration):
+        pass
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def events(self):
+        return []
+
+    def recent(self, window=1.0):
+        return []
+
+
+def instrument(obj, profiler, names):
+    """Time calls to the named methods of obj as profiler phases
+
+    The wrappers are set on the instance, so obj needs a __dict__ and the
+    class itself is left untouched. Does nothing for a disabled profiler.
+    """
+    if not profiler.enabled:
+        return
+    for name in names:
+        method = getattr(obj, name)
+
+        def timed(*args, _method=method, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                profiler.record(_name, start, time.perf_counter() - start)
+        setattr(obj, name, timed)
@@ -5,14 +5,32 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.graphics import Color, Rectangle, RoundedRectangle
+from kivy.graphics.texture import Texture
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.core.window import Window
-from kivy.metrics import dp
-from kivy.animation import Animation
+from kivy.metrics import dp, sp
+from kivy.core.text import Label as CoreLabel
 from kivy.core.audio import SoundLoader
-import random
-import json
+from kivy.utils import platform
 import os
+import time
+
+from advisor import MoveAdvisor
+from afterstates import get_cache
+from atlas import TileAtlas
+from game_core import GameCore, GRID_SIZE, LEFT, RIGHT, UP, DOWN
+from history import History
+from persistence import ScoreStore
+from replay import ReplayRecorder
+
+REPLAY_DIR = 'replays'  # Every finished game is recorded here
+SIZE_ENV = 'GAME2048_SIZE'  # Board size for the app, e.g. GAME2048_SIZE=6
+TABLEBASE_ENV = 'GAME2048_TABLEBASE'  # Tablebase directory for exact hints
+HINT_NAMES = ('Left', 'Right', 'Up', 'Down')  # Indexed by direction
+UNDO_DEPTH = 1000  # Undo levels kept
+ADVICE_INTERVAL = 1 / 30  # Seconds between checks for a deeper hint
+GLYPH_SLOTS = 64  # Numbers kept in the shared texture; the least recently used gives way
 
 # Colors for different tile values
 TILE_COLORS = {
@@ -31,17 +49,95 @@ TILE_COLORS = {
     4096: (0.24, 0.24, 0.24, 1),  # Dark
 }
 
+TEXT_DARK = (0.47, 0.43, 0.4, 1)
+TEXT_LIGHT = (0.98, 0.96, 0.95, 1)
+APPEAR_DURATION = 0.2  # Fade out and back in when a tile changes
+
+def tile_font_size(value, board_size=GRID_SIZE):
+    # Adjust font size based on number length, smaller on bigger boards
+    scale = min(1.0, GRID_SIZE / board_size)
+    if value >= 100000:
+        return sp(13) * scale
+    elif value >= 1000:
+        return sp(16) * scale
+    elif value >= 100:
+        return sp(18) * scale
+    return sp(20) * scale
+
+def _number_label(text, font_size, color):
+    return CoreLabel(text=text, font_size=font_size, color=color, bold=True)
+
+class GlyphAtlas:
+    # Tile numbers rasterised on demand into one shared texture, one slot
+    # per (value, font size); tiles show a region of it, so changing a tile
+    # only swaps a texture region. Slots fit the widest number of each font
+    # size up to ten digits, longer ones get a texture of their own. Once
+    # every slot is taken the least recently used number gives its slot up,
+    # and tiles still showing it have to fetch their region again: the
+    # board does that whenever evictions has gone up.
+    
+    # Widest text of each font size step in tile_font_size
+    WIDEST = ((20, '88'), (18, '888'), (16, '88888'), (13, '8' * 10))
+    
+    def __init__(self, capacity=GLYPH_SLOTS):
+        self.capacity = capacity
+        self.atlas = None  # Slots are sized and the texture made at first use
+        self.texture = None
+        self.regions = {}  # Region per rect; a rect shows whatever its slot holds
+    
+    @property
+    def evictions(self):
+        return self.atlas.evictions if self.atlas is not None else 0
+    
+    def _create(self):
+        width = height = 0
+        for size, text in self.WIDEST:
+            w, h = _number_label(text, sp(size), TEXT_DARK).get_extents(text)
+            width, height = max(width, w), max(height, h)
+        self.atlas = TileAtlas(int(width) + 2, int(height) + 2, self.capacity)
+        self.texture = Texture.create(size=(self.atlas.width, self.atlas.height), colorfmt='rgba')
+    
+    def region(self, value, board_size=GRID_SIZE):
+        # Texture showing value's number at its font size for board_size
+        if self.atlas is None:
+            self._create()
+        key = (value, tile_font_size(value, board_size))
+        if len(str(value)) > 10:
+            return self._render(*key)
+        rect = self.atlas.get(key, self._paint)
+        region = self.regions.get(rect)
+        if region is None:
+            region = self.regions[rect] = self.texture.get_region(*rect)
+        return region
+    
+    def _render(self, value, font_size):
+        label = _number_label(str(value), font_size, TEXT_DARK if value <= 4 else TEXT_LIGHT)
+        label.refresh()
+        return label.texture
+    
+    def _paint(self, key, rect):
+        texture = self._render(*key)
+        width = min(texture.width, rect[2])
+        height = min(texture.height, rect[3])
+        # Label textures keep their rows top first and are drawn flipped;
+        # the atlas is not flipped, so the rows go in bottom first
+        stride = texture.width * 4
+        pixels = texture.pixels
+        rows = [pixels[row * stride:row * stride + width * 4] for row in range(texture.height)]
+        self.texture.blit_buffer(b''.join(rows[::-1][:height]), pos=(rect[0], rect[1]),
+                                 size=(width, height), colorfmt='rgba', bufferfmt='ubyte')
+        return width, height
+
+_glyphs = GlyphAtlas()
+
+def label_texture(value, board_size=GRID_SIZE):
+    return _glyphs.region(value, board_size)
+
 class TileWidget(Widget):
-    def __init__(self, value=0, **kwargs):
+    def __init__(self, value=0, board_size=GRID_SIZE, **kwargs):
         super(TileWidget, self).__init__(**kwargs)
         self.value = value
-        self.label = Label(
-            text=str(value) if value > 0 else '',
-            font_size='20sp',
-            color=(0.47, 0.43, 0.4, 1) if value <= 4 else (0.98, 0.96, 0.95, 1),
-            bold=True
-        )
-        self.add_widget(self.label)
+        self.board_size = board_size
         
         with self.canvas.before:
             self.color = Color(*TILE_COLORS.get(value, TILE_COLORS[4096]))
@@ -50,153 +146,149 @@ class TileWidget(Widget):
                 size=self.size,
                 radius=[dp(3)]
             )
+        with self.canvas:
+            self.text_color = Color(1, 1, 1, 1 if value > 0 else 0)
+            self.text_rect = Rectangle()
+        self.update_texture()
         
         self.bind(pos=self.update_graphics, size=self.update_graphics)
     
     def update_graphics(self, *args):
         self.rect.pos = self.pos
         self.rect.size = self.size
-        self.label.center = self.center
-        
-        # Adjust font size based on number length
-        if self.value >= 1000:
-            self.label.font_size = '16sp'
-        elif self.value >= 100:
-            self.label.font_size = '18sp'
+        self.text_rect.pos = (self.center_x - self.text_rect.size[0] / 2,
+                              self.center_y - self.text_rect.size[1] / 2)
+    
+    def update_texture(self):
+        if self.value > 0:
+            texture = label_texture(self.value, self.board_size)
+            self.text_rect.texture = texture
+            self.text_rect.size = texture.size
+            self.text_color.a = 1
         else:
-            self.label.font_size = '20sp'
+            self.text_color.a = 0
+        self.update_graphics()
     
     def set_value(self, value):
         if self.value != value:
             self.value = value
-            self.label.text = str(value) if value > 0 else ''
-            
-            # Update color
             self.color.rgba = TILE_COLORS.get(value, TILE_COLORS[4096])
-            
-            # Update text color
-            self.label.color = (0.47, 0.43, 0.4, 1) if value <= 4 else (0.98, 0.96, 0.95, 1)
-            
-            # Animate tile appearance
-            if value > 0:
-                anim = Animation(opacity=0, duration=0.1) + Animation(opacity=1, duration=0.1)
-                anim.start(self)
+            self.update_texture()
+            return value > 0
+        return False
+
+def hint_text(direction, depth=None, win=None):
+    # Text of the hint button; depth is that of the search behind the hint,
+    # win the exact win probability from a tablebase
+    if direction is None:
+        return 'No moves'
+    if win is not None:
+        return f'Hint: {HINT_NAMES[direction]} ({win:.0%})'
+    if depth:
+        return f'Hint: {HINT_NAMES[direction]} ({depth})'
+    return f'Hint: {HINT_NAMES[direction]}'
 
 class GameBoard(GridLayout):
-    def __init__(self, **kwargs):
+    def __init__(self, board_size=GRID_SIZE, **kwargs):
         super(GameBoard, self).__init__(**kwargs)
-        self.cols = 4
-        self.rows = 4
-        self.spacing = dp(5)
+        self.cols = board_size
+        self.rows = board_size
+        self.spacing = dp(5) if board_size <= 6 else dp(3)
         self.padding = dp(10)
         
-        # Initialize game state
-        self.grid = [[0 for _ in range(4)] for _ in range(4)]
+        # Initialize game state; moves and the game-over check read the
+        # afterstates cache, filled in after each move while the app idles
+        self.game = GameCore(size=board_size, afterstates=get_cache(board_size))
+        self.history = History(self.game, UNDO_DEPTH)
+        self.cell_count = board_size * board_size
+        self.shown_board = None
+        self.glyph_evictions = _glyphs.evictions
         self.tiles = []
         
+        # Tiles fading in, driven by one shared clock callback
+        self.appearing = {}
+        self.appear_event = None
+        
         # Create tile widgets
-        for i in range(16):
-            tile = TileWidget()
+        for i in range(self.cell_count):
+            tile = TileWidget(board_size=board_size)
             self.tiles.append(tile)
             self.add_widget(tile)
         
-        # Add initial tiles
-        self.add_random_tile()
-        self.add_random_tile()
         self.update_display()
     
+    @property
+    def grid(self):
+        return self.game.grid
+    
     def add_random_tile(self):
-        empty_cells = []
-        for i in range(4):
-            for j in range(4):
-                if self.grid[i][j] == 0:
-                    empty_cells.append((i, j))
-        
-        if empty_cells:
-            i, j = random.choice(empty_cells)
-            self.grid[i][j] = 2 if random.random() < 0.9 else 4
-    
-    def update_display(self):
-        for i in range(4):
-            for j in range(4):
-                tile_index = i * 4 + j
-                self.tiles[tile_index].set_value(self.grid[i][j])
-    
-    def move_left(self):
-        moved = False
-        score_gained = 0
-        new_grid = [[0 for _ in range(4)] for _ in range(4)]
-        
-        for i in range(4):
-            row = [val for val in self.grid[i] if val != 0]
-            
-            j = 0
-            while j < len(row):
-                if j + 1 < len(row) and row[j] == row[j + 1]:
-                    new_grid[i][j] = row[j] * 2
-                    score_gained += row[j] * 2
-                    row.pop(j + 1)
-                else:
-                    new_grid[i][j] = row[j]
-                j += 1
-        
-        if new_grid != self.grid:
-            moved = True
-            self.grid = new_grid
-        
-        return moved, score_gained
-    
-    def move_right(self):
-        self.grid = [row[::-1] for row in self.grid]
-        moved, score = self.move_left()
-        self.grid = [row[::-1] for row in self.grid]
-        return moved, score
-    
-    def move_up(self):
-        self.grid = list(map(list, zip(*self.grid)))
-        moved, score = self.move_left()
-        self.grid = list(map(list, zip(*self.grid)))
-        return moved, score
-    
-    def move_down(self):
-        self.grid = list(map(list, zip(*self.grid)))
-        moved, score = self.move_right()
-        self.grid = list(map(list, zip(*self.grid)))
-        return moved, score
+        self.game.add_random_tile()
+    
+    def update_display(self, full=False):
+        board = self.game.board
+        
+        # Only touch tiles whose cell changed since the last update
+        shown = None if full else self.shown_board
+        for index, exponent in self.game.engine.changed_cells(shown, board):
+            if self.tiles[index].set_value(1 << exponent if exponent else 0):
+                self.start_appear(self.tiles[index])
+        self.shown_board = board
+        
+        # A glyph slot given to another number leaves the tiles that showed
+        # the old one pointing at the new; fetch theirs again. One pass does
+        # it as long as the atlas has a slot for every number on the board
+        if self.glyph_evictions != _glyphs.evictions:
+            self.glyph_evictions = _glyphs.evictions
+            for tile in self.tiles:
+                tile.update_texture()
+    
+    def start_appear(self, tile):
+        self.appearing[tile] = Clock.get_time()
+        if self.appear_event is None:
+            self.appear_event = Clock.schedule_interval(self.animate_tiles, 0)
+    
+    def animate_tiles(self, dt):
+        now = Clock.get_time()
+        for tile, started in list(self.appearing.items()):
+            progress = (now - started) / APPEAR_DURATION
+            if progress >= 1:
+                tile.opacity = 1
+                del self.appearing[tile]
+            else:
+                # Fade to transparent over the first half, back over the second
+                tile.opacity = abs(1 - 2 * progress)
+        if not self.appearing and self.appear_event is not None:
+            self.appear_event.cancel()
+            self.appear_event = None
+    
+    def step(self, direction):
+        return self.game.step(direction)
+    
+    def undo(self):
+        return self.history.undo()
+    
+    def redo(self):
+        return self.history.redo()
+    
+    def prepare_moves(self):
+        # Work out the next four moves now, so a swipe just commits one
+        self.game.legal_moves()
+    
+    def hint(self):
+        return self.game.hint()
     
     def is_game_over(self):
-        # Check for empty cells
-        for i in range(4):
-            for j in range(4):
-                if self.grid[i][j] == 0:
-                    return False
-        
-        # Check for possible merges
-        for i in range(4):
-            for j in range(4):
-                current = self.grid[i][j]
-                if j < 3 and self.grid[i][j + 1] == current:
-                    return False
-                if i < 3 and self.grid[i + 1][j] == current:
-                    return False
-        
-        return True
+        return self.game.is_game_over()
     
     def has_won(self):
-        for i in range(4):
-            for j in range(4):
-                if self.grid[i][j] >= 2048:
-                    return True
-        return False
+        return self.game.has_won()
     
     def reset_game(self):
-        self.grid = [[0 for _ in range(4)] for _ in range(4)]
-        self.add_random_tile()
-        self.add_random_tile()
+        self.game.reset()
         self.update_display()
 
 class Game2048Widget(BoxLayout):
-    def __init__(self, **kwargs):
+    def __init__(self, board_size=GRID_SIZE, **kwargs):
         super(Game2048Widget, self).__init__(**kwargs)
         self.orientation = 'vertical'
         self.spacing = dp(10)
@@ -204,6 +296,7 @@ class Game2048Widget(BoxLayout):
         
         # Game state
         self.score = 0
+        self.store = ScoreStore()
         self.best_score = self.load_best_score()
         self.game_won = False
         self.game_over = False
@@ -229,7 +322,34 @@ class Game2048Widget(BoxLayout):
         header.add_widget(self.best_label)
         
         # Game board
-        self.board = GameBoard()
+        self.board = GameBoard(board_size=board_size)
+        # Hints are deepened by an expectimax search in the background (a
+        # thread on Android, which has no multiprocessing); 4x4 only
+        self.advisor = None
+        if board_size == GRID_SIZE:
+            self.advisor = MoveAdvisor(use_process=platform != 'android')
+        self.hint_board = None
+        self.advice_event = None
+        # Exact hints from a tablebase built for this board size
+        self.tablebase = None
+        if os.environ.get(TABLEBASE_ENV):
+            # A missing or broken tablebase only costs the exact hints
+            try:
+                from tablebase import Tablebase, TablebaseError
+            except ImportError as e:
+                Logger.warning("Tablebase: needs NumPy (%s), hints are searched instead", e)
+            else:
+                try:
+                    tablebase = Tablebase(os.environ[TABLEBASE_ENV])
+                except (TablebaseError, OSError) as e:
+                    Logger.warning("Tablebase: could not open %s: %s", os.environ[TABLEBASE_ENV], e)
+                else:
+                    if tablebase.size == board_size:
+                        self.tablebase = tablebase
+        # The replay format only covers 4x4 boards
+        self.recorder = None
+        if board_size == GRID_SIZE:
+            self.recorder = ReplayRecorder(self.board.game, REPLAY_DIR)
         
         # Control buttons
         controls = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(50))
@@ -241,8 +361,31 @@ class Game2048Widget(BoxLayout):
         )
         self.restart_btn.bind(on_press=self.restart_game)
         
+        self.hint_btn = Button(
+            text='Hint',
+            size_hint_x=0.5,
+            background_color=(0.93, 0.69, 0.47, 1)
+        )
+        self.hint_btn.bind(on_press=self.show_hint)
+        
+        self.undo_btn = Button(
+            text='Undo',
+            size_hint_x=0.25,
+            background_color=(0.93, 0.69, 0.47, 1)
+        )
+        self.undo_btn.bind(on_press=self.undo)
+        
+        self.redo_btn = Button(
+            text='Redo',
+            size_hint_x=0.25,
+            background_color=(0.93, 0.69, 0.47, 1)
+        )
+        self.redo_btn.bind(on_press=self.redo)
+        
         controls.add_widget(self.restart_btn)
-        controls.add_widget(Widget())  # Spacer
+        controls.add_widget(self.hint_btn)
+        controls.add_widget(self.undo_btn)
+        controls.add_widget(self.redo_btn)
         
         # Instructions
         instructions = Label(
@@ -278,41 +421,36 @@ class Game2048Widget(BoxLayout):
         self.bg.pos = self.pos
     
     def load_best_score(self):
-        try:
-            if os.path.exists('best_score.json'):
-                with open('best_score.json', 'r') as f:
-                    data = json.load(f)
-                    return data.get('best_score', 0)
-        except:
-            pass
-        return 0
+        return self.store.best_score
     
     def save_best_score(self):
-        try:
-            with open('best_score.json', 'w') as f:
-                json.dump({'best_score': self.best_score}, f)
-        except:
-            pass
+        # Only updates memory; the store writes in the background
+        self.store.set_best_score(self.best_score)
+    
+    def record_game(self):
+        game = self.board.game
+        if game.moves:
+            self.store.record_game(game.score, game.max_tile(), game.moves,
+                                   time.time() - game.started_at)
     
     def on_keyboard(self, window, key, *args):
         # Handle keyboard input for desktop
-        moved = False
-        score_gained = 0
-        
         if key == 97 or key == 276:  # 'a' or left arrow
-            moved, score_gained = self.board.move_left()
+            self.make_move(LEFT)
         elif key == 100 or key == 275:  # 'd' or right arrow
-            moved, score_gained = self.board.move_right()
+            self.make_move(RIGHT)
         elif key == 119 or key == 273:  # 'w' or up arrow
-            moved, score_gained = self.board.move_up()
+            self.make_move(UP)
         elif key == 115 or key == 274:  # 's' or down arrow
-            moved, score_gained = self.board.move_down()
+            self.make_move(DOWN)
         elif key == 114:  # 'r' for restart
             self.restart_game()
-            return True
-        
-        if moved:
-            self.make_move(score_gained)
+        elif key == 104:  # 'h' for a hint
+            self.show_hint()
+        elif key == 117:  # 'u' for undo
+            self.undo()
+        elif key == 121:  # 'y' for redo
+            self.redo()
         
         return True
     
@@ -330,29 +468,22 @@ class Game2048Widget(BoxLayout):
             
             if abs(dx) > abs(dy) and abs(dx) > dp(30):
                 # Horizontal swipe
-                if dx > 0:
-                    moved, score_gained = self.board.move_right()
-                else:
-                    moved, score_gained = self.board.move_left()
+                self.make_move(RIGHT if dx > 0 else LEFT)
             elif abs(dy) > dp(30):
                 # Vertical swipe
-                if dy > 0:
-                    moved, score_gained = self.board.move_up()
-                else:
-                    moved, score_gained = self.board.move_down()
-            else:
-                moved = False
-                score_gained = 0
-            
-            if moved:
-                self.make_move(score_gained)
+                self.make_move(UP if dy > 0 else DOWN)
             
             self.touch_start = None
             return True
         
         return super(Game2048Widget, self).on_touch_up(touch)
     
-    def make_move(self, score_gained):
+    def make_move(self, direction):
+        # Move and spawn the new tile; the replay recorder sees the turn here
+        moved, score_gained = self.board.step(direction)
+        if not moved:
+            return
+        
         # Update score
         self.score += score_gained
         if self.score > self.best_score:
@@ -362,12 +493,10 @@ class Game2048Widget(BoxLayout):
         self.score_label.text = f'Score: {self.score}'
         self.best_label.text = f'Best: {self.best_score}'
         
-        # Add new tile
-        if not self.board.is_game_over():
-            self.board.add_random_tile()
-        
         # Update display
         self.board.update_display()
+        self.hint_btn.text = 'Hint'
+        self.board.prepare_moves()
         
         # Check game status
         if self.board.has_won() and not self.game_won:
@@ -379,21 +508,81 @@ class Game2048Widget(BoxLayout):
             # Could show game over dialog here
     
     def restart_game(self, *args):
+        self.record_game()
         self.score = 0
         self.game_won = False
         self.game_over = False
         self.score_label.text = f'Score: {self.score}'
+        self.hint_btn.text = 'Hint'
         self.board.reset_game()
+        self.board.prepare_moves()
+    
+    def undo(self, *args):
+        if self.board.undo():
+            self.show_restored()
+    
+    def redo(self, *args):
+        if self.board.redo():
+            self.show_restored()
+    
+    def show_restored(self):
+        # The score and status follow the game back to the restored turn
+        game = self.board.game
+        self.score = game.score
+        self.score_label.text = f'Score: {self.score}'
+        self.game_won = game.has_won()
+        self.game_over = game.is_game_over()
+        self.hint_btn.text = 'Hint'
+        self.board.update_display()
+        self.board.prepare_moves()
+    
+    def show_hint(self, *args):
+        if self.tablebase is not None:
+            exact = self.tablebase.best_move(self.board.game.board)
+            if exact is not None:
+                direction, win = exact
+                self.hint_btn.text = hint_text(direction, win=win)
+                return
+        direction = self.board.hint()
+        self.hint_btn.text = hint_text(direction)
+        if self.advisor is not None:
+            self.hint_board = self.board.game.board
+            self.advisor.submit(self.hint_board)
+            if self.advice_event is None:
+                self.advice_event = Clock.schedule_interval(self.poll_advice, ADVICE_INTERVAL)
+    
+    def poll_advice(self, dt):
+        # Show each deeper result until the search ends or the board moves on
+        if self.hint_board != self.board.game.board:
+            self.advisor.cancel()
+            self.advice_event = None
+            return False
+        advice = self.advisor.poll()
+        if advice is not None:
+            direction, depth, final = advice
+            self.hint_btn.text = hint_text(direction, depth)
+            if final:
+                self.advice_event = None
+                return False
 
 class Game2048App(App):
     def build(self):
         self.title = '2048'
-        return Game2048Widget()
+        return Game2048Widget(board_size=int(os.environ.get(SIZE_ENV, GRID_SIZE)))
     
     def on_start(self):
         # Set window size for desktop
         if Window.size[0] < 400:
             Window.size = (400, 600)
+    
+    def on_stop(self):
+        # Keep the stats and replay of the game in progress
+        self.root.record_game()
+        self.root.store.close()
+        if self.root.recorder is not None:
+            self.root.recorder.save()
+        if self.root.advisor is not None:
+            self.root.advisor.close()
 
 if __name__ == '__main__':
     Game2048App().run()
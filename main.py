@@ -1,20 +1,37 @@
+import argparse
 import pygame
-import random
 import sys
-import json
-import os
+import time
 
-# Initialize Pygame
-pygame.init()
+from advisor import MoveAdvisor
+from afterstates import get_cache
+from atlas import TileAtlas
+from game_core import GameCore, GRID_SIZE, LEFT, RIGHT, UP, DOWN
+from history import History
+from instrumentation import FRAME, HISTOGRAM_BUCKETS, NullProfiler, Profiler, instrument
+from persistence import ScoreStore
+from replay import ReplayRecorder
 
-# Constants
-GRID_SIZE = 4
+# Constants (window layout for the default 4x4 board)
 CELL_SIZE = 100
 CELL_PADDING = 10
 GRID_WIDTH = GRID_SIZE * CELL_SIZE + (GRID_SIZE + 1) * CELL_PADDING
 GRID_HEIGHT = GRID_WIDTH
 WINDOW_WIDTH = GRID_WIDTH
 WINDOW_HEIGHT = GRID_HEIGHT + 100  # Extra space for score
+MAX_GRID_WIDTH = 800  # Bigger boards shrink their tiles to fit this
+MIN_CELL_SIZE = 40
+AI_MOVES_PER_SEC = 10  # Search time per AI move is 1000 / AI_MOVES_PER_SEC ms
+AI_FRAME_MS = 8  # Monte Carlo thinking per frame; its decisions span several frames
+ADVICE_POLL_MS = 16  # Wake-up interval while the advisor searches for a hint
+REPLAY_DIR = 'replays'  # Every finished game is recorded here
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)  # Window needs a full repaint
+TRACE_FILE = 'trace.json'  # Default --profile output
+OVERLAY_REFRESH_MS = 100  # Overlay redraw interval while the game is idle
+PROFILED_METHODS = ('step', 'move', 'add_random_tile', 'is_game_over')
+HINT_NAMES = ('Left', 'Right', 'Up', 'Down')  # Indexed by direction
+UNDO_DEPTH = 1000  # Default undo levels kept
+ATLAS_SLOTS = 64  # Tiles kept in the atlas; past that the least recently used is repainted
 
 # Colors
 COLORS = {
@@ -38,140 +55,162 @@ COLORS = {
     8192: (237, 194, 46)
 }
 
-class Game2048:
-    def __init__(self):
-        self.grid = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.score = 0
+def tile_font_size(value, cell_size=CELL_SIZE):
+    """Font size for a tile's number, smaller for longer numbers and tiles"""
+    if value < 100:
+        size = 48
+    elif value < 1000:
+        size = 36
+    elif value < 100000:
+        size = 24
+    else:
+        size = 18
+    return size * cell_size // CELL_SIZE
+
+def cell_size_for(size):
+    """Tile edge length that keeps a size x size grid on screen"""
+    fit = (MAX_GRID_WIDTH - (size + 1) * CELL_PADDING) // size
+    return max(MIN_CELL_SIZE, min(CELL_SIZE, fit))
+
+class TileSprites:
+    """Tiles of one cell size, painted on first use into a shared atlas surface
+    
+    blit() copies a tile, background corners and number included, out of
+    the atlas in one call instead of drawing its rect and text.
+    """
+    
+    def __init__(self, cell_size, fonts, capacity=ATLAS_SLOTS):
+        self.cell_size = cell_size
+        self.fonts = fonts  # Font per size, shared with the game
+        self.atlas = TileAtlas(cell_size, cell_size, capacity)
+        self.surface = None  # Grown as slots are first used
+    
+    def blit(self, screen, value, position):
+        """Draw the tile for value with its top-left corner at position, returns the rect"""
+        rect = self.atlas.get((value, self.cell_size), self.paint)
+        return screen.blit(self.surface, position, rect)
+    
+    def paint(self, key, rect):
+        value, cell_size = key
+        x, y = rect[0], rect[1]
+        # Slots fill row by row, so the surface grows a row at a time
+        if self.surface is None or self.surface.get_height() < y + cell_size:
+            surface = pygame.Surface((self.atlas.width, y + cell_size))
+            if self.surface is not None:
+                surface.blit(self.surface, (0, 0))
+            self.surface = surface
+        self.surface.fill(COLORS['background'], rect)
+        pygame.draw.rect(self.surface, COLORS.get(value, COLORS[8192]), rect, border_radius=3)
+        if value != 0:
+            text_color = COLORS['text_light'] if value > 4 else COLORS['text_dark']
+            font_size = tile_font_size(value, cell_size)
+            font = self.fonts.get(font_size)
+            if font is None:
+                font = self.fonts[font_size] = pygame.font.Font(None, font_size)
+            text = font.render(str(value), True, text_color)
+            # Clipped to the slot, so a number too wide for its tile can't spill into the next
+            self.surface.set_clip(rect)
+            self.surface.blit(text, text.get_rect(center=(x + cell_size // 2, y + cell_size // 2)))
+            self.surface.set_clip(None)
+
+class Game2048(GameCore):
+    def __init__(self, seed=None, store=None, size=GRID_SIZE, undo_depth=UNDO_DEPTH,
+                 tablebase=None):
+        pygame.font.init()
+        self.store = store if store is not None else ScoreStore()
         self.best_score = self.load_best_score()
         self.font = pygame.font.Font(None, 36)
         self.big_font = pygame.font.Font(None, 48)
         self.small_font = pygame.font.Font(None, 24)
+        self.tile_fonts = {}
+        
+        # The window is never narrower than the 4x4 one so the header fits;
+        # smaller grids are centred in it
+        self.cell_size = cell_size_for(size)
+        self.tiles = TileSprites(self.cell_size, self.tile_fonts)
+        grid_width = size * self.cell_size + (size + 1) * CELL_PADDING
+        self.window_width = max(grid_width, WINDOW_WIDTH)
+        self.window_height = grid_width + 100
+        self.grid_x = (self.window_width - grid_width) // 2 + CELL_PADDING
         
-        # Add initial tiles
-        self.add_random_tile()
-        self.add_random_tile()
+        # The suggested move, shown until the board changes, and the depth
+        # of the search behind it (None for the instant one) or its exact
+        # win probability from the tablebase
+        self.tablebase = tablebase
+        self.hint_board = None
+        self.hint_direction = None
+        self.hint_depth = None
+        self.hint_win = None
+        
+        # Moves and the game-over check read the afterstates cache, which
+        # the main loop fills in while it waits for the next key
+        super().__init__(seed, size, afterstates=get_cache(size))
+        self.history = History(self, undo_depth)
     
     def load_best_score(self):
-        """Load best score from file"""
-        try:
-            if os.path.exists('best_score.json'):
-                with open('best_score.json', 'r') as f:
-                    data = json.load(f)
-                    return data.get('best_score', 0)
-        except:
-            pass
-        return 0
+        """Load best score from the score store"""
+        return self.store.best_score
     
     def save_best_score(self):
-        """Save best score to file"""
-        try:
-            with open('best_score.json', 'w') as f:
-                json.dump({'best_score': self.best_score}, f)
-        except:
-            pass
-    
-    def add_random_tile(self):
-        """Add a random tile (2 or 4) to an empty cell"""
-        empty_cells = []
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.grid[i][j] == 0:
-                    empty_cells.append((i, j))
-        
-        if empty_cells:
-            i, j = random.choice(empty_cells)
-            self.grid[i][j] = 2 if random.random() < 0.9 else 4
-    
-    def move_left(self):
-        """Move and merge tiles to the left"""
-        moved = False
-        new_grid = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        
-        for i in range(GRID_SIZE):
-            # Get non-zero values
-            row = [val for val in self.grid[i] if val != 0]
-            
-            # Merge tiles
-            j = 0
-            while j < len(row):
-                if j + 1 < len(row) and row[j] == row[j + 1]:
-                    new_grid[i][j] = row[j] * 2
-                    self.score += row[j] * 2
-                    row.pop(j + 1)
-                else:
-                    new_grid[i][j] = row[j]
-                j += 1
-        
-        # Check if anything moved
-        if new_grid != self.grid:
-            moved = True
-            self.grid = new_grid
-        
-        return moved
-    
-    def move_right(self):
-        """Move and merge tiles to the right"""
-        # Reverse, move left, reverse back
-        self.grid = [row[::-1] for row in self.grid]
-        moved = self.move_left()
-        self.grid = [row[::-1] for row in self.grid]
-        return moved
-    
-    def move_up(self):
-        """Move and merge tiles up"""
-        # Transpose, move left, transpose back
-        self.grid = list(map(list, zip(*self.grid)))
-        moved = self.move_left()
-        self.grid = list(map(list, zip(*self.grid)))
-        return moved
-    
-    def move_down(self):
-        """Move and merge tiles down"""
-        # Transpose, move right, transpose back
-        self.grid = list(map(list, zip(*self.grid)))
-        moved = self.move_right()
-        self.grid = list(map(list, zip(*self.grid)))
-        return moved
-    
-    def is_game_over(self):
-        """Check if game is over (no moves possible)"""
-        # Check for empty cells
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.grid[i][j] == 0:
-                    return False
-        
-        # Check for possible merges
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                current = self.grid[i][j]
-                # Check right neighbor
-                if j < GRID_SIZE - 1 and self.grid[i][j + 1] == current:
-                    return False
-                # Check down neighbor
-                if i < GRID_SIZE - 1 and self.grid[i + 1][j] == current:
-                    return False
-        
-        return True
+        """Queue the best score for a background save"""
+        self.store.set_best_score(self.best_score)
     
-    def has_won(self):
-        """Check if player has reached 2048"""
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.grid[i][j] >= 2048:
-                    return True
-        return False
+    def record_game(self):
+        """Log the current game's statistics if it got anywhere"""
+        if self.moves:
+            self.store.record_game(self.score, self.max_tile(), self.moves,
+                                   time.time() - self.started_at)
     
     def reset_game(self):
         """Reset the game"""
+        self.record_game()
         if self.score > self.best_score:
             self.best_score = self.score
             self.save_best_score()
         
-        self.grid = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.score = 0
-        self.add_random_tile()
-        self.add_random_tile()
+        self.reset()
+    
+    def undo(self):
+        """Take back the last turn, returns False if there is none"""
+        return self.history.undo()
+    
+    def redo(self):
+        """Play the last undone turn again, returns False if there is none"""
+        return self.history.redo()
+    
+    def show_hint(self):
+        """Work out the suggested move for the current board"""
+        self.hint_board = self.board
+        self.hint_depth = None
+        self.hint_win = None
+        exact = self.tablebase.best_move(self.board) if self.tablebase is not None else None
+        if exact is not None:
+            self.hint_direction, self.hint_win = exact
+        else:
+            self.hint_direction = self.hint()
+    
+    def refine_hint(self, direction, depth):
+        """Show a deeper search's move instead, if the hint is still up"""
+        if self.hint_board == self.board and self.hint_win is None:
+            self.hint_direction = direction
+            self.hint_depth = depth
+    
+    def shown_hint(self):
+        """Text of the hint on screen, None once the board has changed"""
+        if self.hint_board != self.board:
+            return None
+        if self.hint_direction is None:
+            return "Hint: no moves"
+        if self.hint_win is not None:
+            return f"Hint: {HINT_NAMES[self.hint_direction]} (win {self.hint_win:.1%})"
+        if self.hint_depth:
+            return f"Hint: {HINT_NAMES[self.hint_direction]} (depth {self.hint_depth})"
+        return f"Hint: {HINT_NAMES[self.hint_direction]}"
+    
+    def cell_pos(self, i, j):
+        """Top-left corner of the cell in row i, column j"""
+        return (self.grid_x + j * (self.cell_size + CELL_PADDING),
+                100 + i * (self.cell_size + CELL_PADDING))
     
     def draw(self, screen):
         """Draw the game"""
@@ -185,35 +224,27 @@ class Game2048:
         
         # Draw instructions
         inst_text = self.small_font.render("Use WASD or Arrow Keys. R to restart", True, COLORS['text_dark'])
-        screen.blit(inst_text, (WINDOW_WIDTH - 250, 10))
+        screen.blit(inst_text, (self.window_width - 250, 10))
+        if self.size == GRID_SIZE:
+            ai_text = self.small_font.render("I to let the AI play", True, COLORS['text_dark'])
+            screen.blit(ai_text, (self.window_width - 250, 30))
+        hint_text = self.small_font.render("H hint, U undo, Y redo", True, COLORS['text_dark'])
+        screen.blit(hint_text, (self.window_width - 250, 50))
+        hint = self.shown_hint()
+        if hint is not None:
+            screen.blit(self.small_font.render(hint, True, COLORS['text_dark']),
+                        (self.window_width - 250, 70))
         
         # Draw grid
-        start_x = CELL_PADDING
-        start_y = 100
+        grid = self.grid
         
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                x = start_x + j * (CELL_SIZE + CELL_PADDING)
-                y = start_y + i * (CELL_SIZE + CELL_PADDING)
-                
-                value = self.grid[i][j]
-                color = COLORS.get(value, COLORS[8192])
-                
-                # Draw cell
-                pygame.draw.rect(screen, color, (x, y, CELL_SIZE, CELL_SIZE), border_radius=3)
-                
-                # Draw number
-                if value != 0:
-                    text_color = COLORS['text_light'] if value > 4 else COLORS['text_dark']
-                    font_size = 48 if value < 100 else (36 if value < 1000 else 24)
-                    font = pygame.font.Font(None, font_size)
-                    text = font.render(str(value), True, text_color)
-                    text_rect = text.get_rect(center=(x + CELL_SIZE // 2, y + CELL_SIZE // 2))
-                    screen.blit(text, text_rect)
+        for i in range(self.size):
+            for j in range(self.size):
+                self.tiles.blit(screen, grid[i][j], self.cell_pos(i, j))
         
         # Draw game over message
         if self.is_game_over():
-            overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+            overlay = pygame.Surface((self.window_width, self.window_height))
             overlay.set_alpha(128)
             overlay.fill((0, 0, 0))
             screen.blit(overlay, (0, 0))
@@ -222,15 +253,15 @@ class Game2048:
             restart_text = self.font.render("Press R to restart", True, (255, 255, 255))
             
             screen.blit(game_over_text, 
-                       (WINDOW_WIDTH // 2 - game_over_text.get_width() // 2, 
-                        WINDOW_HEIGHT // 2 - 50))
+                       (self.window_width // 2 - game_over_text.get_width() // 2, 
+                        self.window_height // 2 - 50))
             screen.blit(restart_text, 
-                       (WINDOW_WIDTH // 2 - restart_text.get_width() // 2, 
-                        WINDOW_HEIGHT // 2 + 10))
+                       (self.window_width // 2 - restart_text.get_width() // 2, 
+                        self.window_height // 2 + 10))
         
         # Draw win message
         elif self.has_won():
-            overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+            overlay = pygame.Surface((self.window_width, self.window_height))
             overlay.set_alpha(128)
             overlay.fill((255, 215, 0))
             screen.blit(overlay, (0, 0))
@@ -239,52 +270,363 @@ class Game2048:
             continue_text = self.font.render("Continue playing or press R to restart", True, (255, 255, 255))
             
             screen.blit(win_text, 
-                       (WINDOW_WIDTH // 2 - win_text.get_width() // 2, 
-                        WINDOW_HEIGHT // 2 - 50))
+                       (self.window_width // 2 - win_text.get_width() // 2, 
+                        self.window_height // 2 - 50))
             screen.blit(continue_text, 
-                       (WINDOW_WIDTH // 2 - continue_text.get_width() // 2, 
-                        WINDOW_HEIGHT // 2 + 10))
+                       (self.window_width // 2 - continue_text.get_width() // 2, 
+                        self.window_height // 2 + 10))
+
+class Renderer:
+    """Draws a Game2048 by only repainting what changed since the last frame
 
-def main():
+    Tiles come from the game's atlas and header text glyphs are rendered
+    once and cached. render() returns the dirty rectangles to pass to
+    pygame.display.update, or an empty list when nothing changed. It
+    observes the game so a new game is always drawn from scratch.
+    """
+    
+    def __init__(self, game):
+        self.game = game
+        self.glyphs = {}
+        # Cache lookups, reported by the profiling overlay
+        self.glyph_hits = self.glyph_misses = 0
+        self.last_board = None
+        self.last_header = None
+        self.last_status = None
+        self.last_size = None
+        game.observers.append(self)
+    
+    def on_step(self, game, direction, score_gained, spawn):
+        pass
+    
+    def on_reset(self, game):
+        self.invalidate()
+    
+    def glyph(self, text, font_size, color):
+        """Rendered text surface, cached per (text, size, color)"""
+        key = (text, font_size, color)
+        surface = self.glyphs.get(key)
+        if surface is not None:
+            self.glyph_hits += 1
+        else:
+            self.glyph_misses += 1
+            font = self.game.tile_fonts.get(font_size)
+            if font is None:
+                font = self.game.tile_fonts[font_size] = pygame.font.Font(None, font_size)
+            surface = self.glyphs[key] = font.render(text, True, color)
+        return surface
+    
+    def invalidate(self):
+        """Force a full redraw on the next frame"""
+        self.last_board = None
+    
+    def render(self, screen):
+        """Repaint changed parts of the screen, returns the dirty rects"""
+        game = self.game
+        board = game.board
+        header = (game.score, game.best_score, game.shown_hint())
+        if game.is_game_over():
+            status = 'over'
+        elif game.has_won():
+            status = 'won'
+        else:
+            status = None
+        
+        # Overlays cover the whole window, so any change under them or a
+        # status change means a full repaint, as does a resized window
+        if (self.last_board is None or status != self.last_status or
+                screen.get_size() != self.last_size or
+                (status is not None and (board != self.last_board or header != self.last_header))):
+            game.draw(screen)
+            self.last_board = board
+            self.last_header = header
+            self.last_status = status
+            self.last_size = screen.get_size()
+            return [screen.get_rect()]
+        
+        rects = []
+        if header != self.last_header:
+            rects.append(self.draw_header(screen))
+            self.last_header = header
+        
+        changed = board ^ self.last_board
+        if changed:
+            bits = game.engine.cell_bits
+            mask = game.engine.cell_mask
+            for index in range(game.size * game.size):
+                if (changed >> (bits * index)) & mask:
+                    exponent = (board >> (bits * index)) & mask
+                    position = game.cell_pos(*divmod(index, game.size))
+                    rects.append(game.tiles.blit(screen, 1 << exponent if exponent else 0, position))
+            self.last_board = board
+        return rects
+    
+    def draw_header(self, screen):
+        """Repaint the score area above the grid"""
+        game = self.game
+        rect = pygame.Rect(0, 0, game.window_width, 100)
+        screen.fill(COLORS['background'], rect)
+        screen.blit(game.font.render(f"Score: {game.score}", True, COLORS['text_dark']), (10, 10))
+        screen.blit(game.font.render(f"Best: {game.best_score}", True, COLORS['text_dark']), (10, 50))
+        screen.blit(self.glyph("Use WASD or Arrow Keys. R to restart", 24, COLORS['text_dark']),
+                    (game.window_width - 250, 10))
+        if game.size == GRID_SIZE:
+            screen.blit(self.glyph("I to let the AI play", 24, COLORS['text_dark']),
+                        (game.window_width - 250, 30))
+        screen.blit(self.glyph("H hint, U undo, Y redo", 24, COLORS['text_dark']),
+                    (game.window_width - 250, 50))
+        hint = game.shown_hint()
+        if hint is not None:
+            screen.blit(self.glyph(hint, 24, COLORS['text_dark']), (game.window_width - 250, 70))
+        return rect
+
+class Overlay:
+    """On-screen summary of the last second of profiler data
+    
+    Shows frame times, a frame time histogram, moves per second (from the
+    'step' phase), mean time per phase, and cache hit rates supplied by the
+    caller as {label: (hits, misses)}.
+    """
+    
+    WIDTH = 260
+    LINE = 16
+    
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.visible = False
+        self.font = pygame.font.Font(None, 18)
+    
+    def toggle(self):
+        self.visible = not self.visible
+    
+    def draw(self, screen, caches=None):
+        """Draw the overlay in the bottom-right corner, returns its rect"""
+        events = self.profiler.recent(1.0)
+        stats = self.profiler.phase_stats(events)
+        histogram = self.profiler.frame_histogram(events)
+        
+        lines = []
+        frames = stats.get(FRAME)
+        if frames:
+            lines.append(f"frame  avg {frames[1]:.2f} ms  max {frames[2]:.2f} ms")
+        steps = stats.get('step')
+        lines.append(f"moves/s  {steps[0] if steps else 0}")
+        for name in sorted(stats):
+            if name != FRAME:
+                count, mean, longest = stats[name]
+                lines.append(f"{name:<16} {count:>4}x {mean:7.3f} ms")
+        for label, (hits, misses) in (caches or {}).items():
+            lookups = hits + misses
+            rate = 100.0 * hits / lookups if lookups else 0.0
+            lines.append(f"{label} hits {rate:5.1f}%")
+        
+        bar_height = 40
+        height = (len(lines) + 1) * self.LINE + bar_height + 10
+        rect = pygame.Rect(screen.get_width() - self.WIDTH - 5, screen.get_height() - height - 5,
+                           self.WIDTH, height)
+        panel = pygame.Surface(rect.size)
+        panel.set_alpha(200)
+        panel.fill((0, 0, 0))
+        screen.blit(panel, rect)
+        
+        y = rect.y + 5
+        for line in lines:
+            screen.blit(self.font.render(line, True, (255, 255, 255)), (rect.x + 5, y))
+            y += self.LINE
+        
+        # Frame time histogram, bars scaled to the fullest bucket
+        most = max(histogram) or 1
+        bar_width = (self.WIDTH - 10) // len(histogram)
+        for k, count in enumerate(histogram):
+            h = bar_height * count // most
+            x = rect.x + 5 + k * bar_width
+            pygame.draw.rect(screen, (120, 200, 120), (x, y + bar_height - h, bar_width - 2, h))
+        labels = [f"<{b}" for b in HISTOGRAM_BUCKETS] + [f"{HISTOGRAM_BUCKETS[-1]}+"]
+        y += bar_height + 2
+        for k, label in enumerate(labels):
+            screen.blit(self.font.render(label, True, (200, 200, 200)),
+                        (rect.x + 5 + k * bar_width, y))
+        return rect
+
+def main(argv=None):
     """Main game loop"""
-    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    pygame.display.set_caption("2048")
+    parser = argparse.ArgumentParser(description="Play 2048")
+    parser.add_argument('--size', type=int, default=GRID_SIZE,
+                        help="board size (default: %(default)s)")
+    parser.add_argument('--profile', nargs='?', const=TRACE_FILE, default=None, metavar='TRACE',
+                        help="time the main loop; F3 shows the overlay, F4 writes a Chrome "
+                             "trace to TRACE (default: %(const)s, also written on exit)")
+    parser.add_argument('--undo-depth', type=int, default=UNDO_DEPTH,
+                        help="undo levels to keep (default: %(default)s)")
+    parser.add_argument('--trajectories', metavar='DIR',
+                        help="export every turn to a training dataset in DIR (needs NumPy)")
+    parser.add_argument('--ai', choices=['expectimax', 'montecarlo'], default='expectimax',
+                        help="player used by I (montecarlo needs NumPy; default: %(default)s)")
+    parser.add_argument('--tablebase', metavar='DIR',
+                        help="exact hints, and an exact AI player, from a tablebase built "
+                             "for this board size (needs NumPy)")
+    args = parser.parse_args(argv)
+    
+    tablebase = None
+    if args.tablebase:
+        # Imported here so the game itself doesn't need NumPy
+        from tablebase import Tablebase, TablebaseError
+        try:
+            tablebase = Tablebase(args.tablebase)
+        except TablebaseError as e:
+            parser.error(str(e))
+        if tablebase.size != args.size:
+            parser.error(f"{args.tablebase} is for {tablebase.size}x{tablebase.size} boards")
+    
+    pygame.init()
+    game = Game2048(size=args.size, undo_depth=args.undo_depth, tablebase=tablebase)
+    screen = pygame.display.set_mode((game.window_width, game.window_height))
+    pygame.display.set_caption("2048" if args.size == GRID_SIZE else f"2048 ({args.size}x{args.size})")
     clock = pygame.time.Clock()
     
-    game = Game2048()
+    # The AI and replay format work on 4x4 bitboards only. Expectimax runs
+    # in the advisor's worker process, which also deepens shown hints, so
+    # the loop keeps drawing while it searches
+    advisor = None
+    ai_player = None
+    if args.size == GRID_SIZE:
+        advisor = MoveAdvisor()
+        if args.ai == 'montecarlo':
+            from montecarlo import MonteCarloAI
+            ai_player = MonteCarloAI(target_moves_per_sec=AI_MOVES_PER_SEC)
+    ai_playing = False
+    renderer = Renderer(game)
+    recorder = ReplayRecorder(game, REPLAY_DIR) if args.size == GRID_SIZE else None
+    trajectory_writer = None
+    if args.trajectories:
+        # Imported here so the game itself doesn't need NumPy
+        from trajectories import TrajectoryRecorder, TrajectoryWriter
+        trajectory_writer = TrajectoryWriter(args.trajectories, args.size)
+        TrajectoryRecorder(game, trajectory_writer)
+    
+    # Profiling is opt-in; without it every phase() below is a shared no-op
+    profiler = Profiler() if args.profile else NullProfiler()
+    instrument(game, profiler, PROFILED_METHODS)
+    overlay = Overlay(profiler) if profiler.enabled else None
     
     running = True
     while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            
-            elif event.type == pygame.KEYDOWN:
-                moved = False
+        # Sleep until something happens unless the AI is driving the game;
+        # a visible overlay wakes up now and then to refresh itself
+        if ai_playing:
+            events = pygame.event.get()
+        elif overlay is not None and overlay.visible:
+            events = [pygame.event.wait(OVERLAY_REFRESH_MS)] + pygame.event.get()
+        elif advisor is not None and advisor.searching:
+            events = [pygame.event.wait(ADVICE_POLL_MS)] + pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+        profiler.begin_frame()
+        
+        with profiler.phase('events'):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
                 
-                if event.key in [pygame.K_LEFT, pygame.K_a]:
-                    moved = game.move_left()
-                elif event.key in [pygame.K_RIGHT, pygame.K_d]:
-                    moved = game.move_right()
-                elif event.key in [pygame.K_UP, pygame.K_w]:
-                    moved = game.move_up()
-                elif event.key in [pygame.K_DOWN, pygame.K_s]:
-                    moved = game.move_down()
-                elif event.key == pygame.K_r:
-                    game.reset_game()
-                    moved = False  # Don't add tile after reset
+                elif event.type in EXPOSE_EVENTS:
+                    renderer.invalidate()
                 
-                if moved and not game.is_game_over():
-                    game.add_random_tile()
+                elif event.type == pygame.KEYDOWN:
+                    # step() commits the precomputed afterstate and spawns the new
+                    # tile; an illegal move is rejected by its legality bit
+                    if event.key in [pygame.K_LEFT, pygame.K_a]:
+                        game.step(LEFT)
+                    elif event.key in [pygame.K_RIGHT, pygame.K_d]:
+                        game.step(RIGHT)
+                    elif event.key in [pygame.K_UP, pygame.K_w]:
+                        game.step(UP)
+                    elif event.key in [pygame.K_DOWN, pygame.K_s]:
+                        game.step(DOWN)
+                    elif event.key == pygame.K_r:
+                        game.reset_game()
+                    elif event.key == pygame.K_h:
+                        game.show_hint()
+                    elif event.key == pygame.K_u:
+                        game.undo()
+                    elif event.key == pygame.K_y:
+                        game.redo()
+                    elif event.key == pygame.K_i and (advisor is not None or tablebase is not None):
+                        ai_playing = not ai_playing
+                    elif event.key == pygame.K_F3 and overlay is not None:
+                        overlay.toggle()
+                        renderer.invalidate()
+                    elif event.key == pygame.K_F4 and profiler.enabled:
+                        profiler.dump_chrome_trace(args.profile)
+        
+        # Let the AI make at most one move per frame while it is playing.
+        # Expectimax moves come from the advisor, played once its search
+        # is complete or the time per move is up; the Monte Carlo player
+        # thinks AI_FRAME_MS per frame until it has decided
+        if advisor is not None:
+            with profiler.phase('advisor'):
+                expectimax_playing = ai_playing and ai_player is None and not game.is_game_over()
+                if expectimax_playing or game.hint_board == game.board:
+                    advisor.submit(game.board)
+                else:
+                    advisor.cancel()
+                advice = advisor.poll()
+            if advice is not None:
+                direction, depth, final = advice
+                game.refine_hint(direction, depth)
+                if expectimax_playing and direction is not None and (
+                        final or advisor.elapsed_ms() >= 1000.0 / AI_MOVES_PER_SEC):
+                    game.step(direction)
+        if ai_player is not None and ai_playing and not game.is_game_over():
+            with profiler.phase('ai'):
+                direction = ai_player.think(game.board, AI_FRAME_MS)
+            if direction is not None:
+                game.step(direction)
+        # Other sizes play the tablebase's exact best moves, and the greedy
+        # hint once the target tile is on the board
+        if advisor is None and ai_playing and not game.is_game_over():
+            with profiler.phase('ai'):
+                exact = tablebase.best_move(game.board)
+                direction = exact[0] if exact is not None else game.hint()
+            if direction is not None:
+                game.step(direction)
         
-        game.draw(screen)
-        pygame.display.flip()
-        clock.tick(60)
+        with profiler.phase('render'):
+            if overlay is not None and overlay.visible:
+                # The overlay sits on top of the grid, so repaint everything under it
+                renderer.invalidate()
+                rects = renderer.render(screen)
+                overlay.draw(screen, {
+                    'atlas': (game.tiles.atlas.hits, game.tiles.atlas.misses),
+                    'glyph': (renderer.glyph_hits, renderer.glyph_misses),
+                    'afterstate': (game.afterstates.hits, game.afterstates.misses),
+                })
+            else:
+                rects = renderer.render(screen)
+        with profiler.phase('display'):
+            if rects:
+                pygame.display.update(rects)
+        # Work out the four moves from the new position before waiting, so
+        # the next key press just commits one (or is turned away at once)
+        with profiler.phase('afterstates'):
+            game.legal_moves()
+        profiler.end_frame()
+        if ai_playing:
+            clock.tick(60)
     
-    # Save best score before quitting
+    # Save best score and the unfinished replay before quitting
     if game.score > game.best_score:
         game.best_score = game.score
         game.save_best_score()
+    game.record_game()
+    game.store.close()
+    if recorder is not None:
+        recorder.save()
+    if trajectory_writer is not None:
+        trajectory_writer.close()
+    if advisor is not None:
+        advisor.close()
+    if profiler.enabled:
+        profiler.dump_chrome_trace(args.profile)
     
     pygame.quit()
     sys.exit()
@@ -0,0 +1,203 @@
+import math
+import time
+
+import numpy as np
+
+import batch
+import bitboard
+from rng import BulkRandom
+
+# Monte Carlo player. Each legal move is rated by random playouts from its
+# afterstate: spawn a tile, then play uniformly random legal moves until
+# the game ends (or max_depth moves), scoring the move's own points plus
+# everything the playout scored. Playouts are run as one NumPy batch of
+# packed boards per round, round_size per candidate move, with every random
+# number taken from an rng.BulkRandom.
+#
+# After each round a move whose upper confidence bound falls below the best
+# lower bound is dropped, so a clearly dominant move is found without
+# spending the full playout budget. A decision ends when one move is left,
+# every remaining move has had `playouts` playouts, or its time runs out.
+#
+# think() advances the current decision by a bounded slice of time and
+# returns None until it is done, so a frame loop can spread a decision
+# over several frames; best_move() runs one to completion.
+
+class MonteCarloAI:
+    def __init__(self, playouts=256, round_size=64, min_playouts=64, confidence=2.58,
+                 max_depth=None, target_moves_per_sec=10, seed=None):
+        self.playouts = playouts          # Most playouts per move and decision
+        self.round_size = round_size      # Playouts per move run together
+        self.min_playouts = min_playouts  # Playouts before a move can be dropped
+        self.confidence = confidence      # z of the confidence bounds (2.58: 99%)
+        self.max_depth = max_depth        # Playout length cap, None plays to the end
+        self.target_moves_per_sec = target_moves_per_sec
+        self.random = BulkRandom(seed)
+
+        # Move results of the live playouts, reused by every step
+        self._moved = np.empty((4, 4 * round_size), dtype=np.uint64)
+        self._scores = np.empty((4, 4 * round_size), dtype=np.int64)
+        self._rows = np.arange(4 * round_size)
+
+        # Totals over all decisions, for playouts_per_sec
+        self.total_playouts = 0
+        self.total_time = 0.0
+        self.last_playouts = 0
+
+        self._board = None  # Board of the decision in progress
+        self._round = None
+
+    @property
+    def playouts_per_sec(self):
+        return self.total_playouts / self.total_time if self.total_time else 0.0
+
+    def default_budget_ms(self):
+        """Time per move that meets the moves/second target"""
+        return 1000.0 / self.target_moves_per_sec
+
+    def best_move(self, board, time_budget_ms=None):
+        """Return the best direction for board, or None if no move is legal"""
+        if time_budget_ms is None:
+            time_budget_ms = self.default_budget_ms()
+        self._start(board, time_budget_ms)
+        while self._decision is None:
+            self._advance(self._decision_deadline)
+        return self._finish()
+
+    def think(self, board, time_budget_ms, decision_budget_ms=None):
+        """Work on the decision for board for up to time_budget_ms
+
+        Starts a new decision when board is not the one being decided.
+        Returns the chosen direction once the decision is complete (after
+        at most decision_budget_ms of thinking, the moves/second target by
+        default), None before that.
+        """
+        if board != self._board:
+            if decision_budget_ms is None:
+                decision_budget_ms = self.default_budget_ms()
+            self._start(board, decision_budget_ms)
+        deadline = min(time.perf_counter() + time_budget_ms / 1000.0, self._decision_deadline)
+        while self._decision is None and time.perf_counter() < deadline:
+            self._advance(deadline)
+        if self._decision is None:
+            return None
+        return self._finish()
+
+    def _start(self, board, time_budget_ms):
+        self._board = board
+        self._decision_deadline = time.perf_counter() + time_budget_ms / 1000.0
+        self._thinking = 0.0
+        self._round = None
+        self._decision = None
+        self.last_playouts = 0
+
+        candidates = []
+        for direction in bitboard.DIRECTIONS:
+            new_board, score = bitboard.move(board, direction)
+            if new_board != board:
+                candidates.append((direction, new_board, score))
+        self._candidates = candidates
+        # Per candidate: playouts, sum and sum of squares of their values
+        self._count = np.zeros(len(candidates))
+        self._sum = np.zeros(len(candidates))
+        self._sum_sq = np.zeros(len(candidates))
+        self._alive = np.ones(len(candidates), dtype=bool)
+        if len(candidates) <= 1:
+            self._decision = candidates[0][0] if candidates else -1
+
+    def _finish(self):
+        decision = self._decision
+        self.total_time += self._thinking
+        self._board = None
+        self._round = None
+        return None if decision < 0 else decision
+
+    def _new_round(self):
+        alive = np.flatnonzero(self._alive)
+        starts = np.array([self._candidates[k][1] for k in alive], dtype=np.uint64)
+        values = np.array([self._candidates[k][2] for k in alive], dtype=np.float64)
+        boards = batch.spawn(np.repeat(starts, self.round_size), self.random)
+        self._round = {
+            'owner': np.repeat(alive, self.round_size),
+            'values': np.repeat(values, self.round_size),
+            # Playouts still going, as indexes into values, and their boards
+            'live': np.arange(len(boards)),
+            'boards': boards,
+            'depth': 0,
+        }
+
+    def _advance(self, deadline):
+        """Run playout steps until the round ends or deadline passes"""
+        started = time.perf_counter()
+        if self._round is None:
+            self._new_round()
+        state = self._round
+        values = state['values']
+        live = state['live']
+        boards = state['boards']
+        while len(live):
+            if self.max_depth is not None and state['depth'] >= self.max_depth:
+                break
+            if time.perf_counter() >= deadline:
+                break
+            n = len(live)
+            moved, scores = batch.move_all(boards, self._moved, self._scores)
+            legal = moved != boards
+            can_move = legal.any(axis=0)
+
+            # A uniformly random legal move: the legal one with the largest key
+            keys = self.random.random(4 * n).reshape(4, n)
+            choice = np.where(legal, keys, -1.0).argmax(axis=0)
+            rows = self._rows[:n]
+            values[live] += scores[choice, rows]
+            boards = batch.spawn(moved[choice, rows], self.random)
+
+            # Finished playouts leave the batch, so a round costs what its
+            # playouts do rather than its longest one times its size
+            if not can_move.all():
+                live = live[can_move]
+                boards = boards[can_move]
+            state['depth'] += 1
+        state['live'] = live
+        state['boards'] = boards
+
+        # The round is over when every playout ended or was cut off by
+        # max_depth or the decision's deadline; cut-off playouts count as
+        # they stand, which treats every move alike
+        now = time.perf_counter()
+        self._thinking += now - started
+        if len(live) and now < self._decision_deadline and (
+                self.max_depth is None or state['depth'] < self.max_depth):
+            return
+        self._fold(state)
+        self._round = None
+        if now >= self._decision_deadline:
+            self._decide()
+        elif self._alive.sum() == 1 or self._count[self._alive].min() >= self.playouts:
+            self._decide()
+
+    def _fold(self, state):
+        owner = state['owner']
+        values = state['values']
+        count = np.bincount(owner, minlength=len(self._candidates))
+        self._count += count
+        self._sum += np.bincount(owner, values, minlength=len(self._candidates))
+        self._sum_sq += np.bincount(owner, values * values, minlength=len(self._candidates))
+        self.total_playouts += len(owner)
+        self.last_playouts += len(owner)
+
+        # Successive elimination on normal-approximation confidence bounds
+        alive = self._alive & (self._count >= self.min_playouts)
+        if alive.sum() < 2:
+            return
+        n = self._count[alive]
+        mean = self._sum[alive] / n
+        variance = np.maximum(self._sum_sq[alive] / n - mean * mean, 0.0)
+        half_width = self.confidence * np.sqrt(variance / n)
+        dropped = mean + half_width < (mean - half_width).max()
+        self._alive[np.flatnonzero(alive)[dropped]] = False
+
+    def _decide(self):
+        mean = np.where(self._count > 0, self._sum / np.maximum(self._count, 1), -math.inf)
+        mean[~self._alive] = -math.inf
+        self._decision = self._candidates[int(mean.argmax())][0]
@@ -0,0 +1,267 @@
+import bitboard
+
+# Board engines for any square size. Each engine packs a board into one int
+# with a fixed number of bits per cell holding the tile's log2 exponent,
+# like bitboard does for 4x4:
+#   size <= 4   4-bit cells (tiles up to 32768)
+#   size >= 5   5-bit cells (tiles up to 2 ** 31)
+#
+# Moves go row by row through row tables. When every possible row fits in
+# FULL_TABLE_ROWS entries (sizes 2-4) the tables are built up front; bigger
+# rows are computed on first sight and memoised, which in real games covers
+# the few thousand rows that actually occur. Size 4 uses the bitboard
+# module directly, with its transpose trick and column tables.
+
+MIN_SIZE = 2
+MAX_SIZE = 16
+FULL_TABLE_ROWS = 1 << 16
+MEMO_LIMIT = 1 << 20  # Memoised rows kept per table before it is cleared
+
+_engines = {}
+
+
+def get_engine(size):
+    """Return the shared engine for size x size boards"""
+    engine = _engines.get(size)
+    if engine is None:
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f"Board size must be between {MIN_SIZE} and {MAX_SIZE}, got {size}")
+        engine = _engines[size] = Engine4() if size == 4 else Engine(size)
+    return engine
+
+
+class Engine4:
+    """The 4x4 bitboard engine behind the common engine interface"""
+
+    size = bitboard.SIZE
+    cells = bitboard.SIZE * bitboard.SIZE
+    cell_bits = 4
+    cell_mask = bitboard.CELL_MASK
+    max_exponent_value = bitboard.MAX_EXPONENT
+    table_driven = True
+
+    moves = bitboard.MOVES
+    move = staticmethod(bitboard.move)
+    empty_cells = staticmethod(bitboard.empty_cells)
+    empty_mask = staticmethod(bitboard.empty_mask)
+    count_empty = staticmethod(bitboard.count_empty)
+    get_exponent = staticmethod(bitboard.get_exponent)
+    set_exponent = staticmethod(bitboard.set_exponent)
+    max_exponent = staticmethod(bitboard.max_exponent)
+    is_game_over = staticmethod(bitboard.is_game_over)
+    has_won = staticmethod(bitboard.has_won)
+    transpose = staticmethod(bitboard.transpose)
+    changed_cells = staticmethod(bitboard.changed_cells)
+    to_grid = staticmethod(bitboard.to_grid)
+    from_grid = staticmethod(bitboard.from_grid)
+
+
+class Engine:
+    def __init__(self, size):
+        self.size = size
+        self.cells = size * size
+        self.cell_bits = 4 if size <= 4 else 5
+        self.cell_mask = (1 << self.cell_bits) - 1
+        self.max_exponent_value = self.cell_mask
+        self.row_bits = size * self.cell_bits
+        self.row_mask = (1 << self.row_bits) - 1
+        self.table_driven = (1 << self.row_bits) <= FULL_TABLE_ROWS
+
+        # (result_row, score) for moving a row towards its first cell, and
+        # the row's cells spread out into column 0 for transposing
+        self._left = {}
+        self._right = {}
+        self._columns = {}
+        if self.table_driven:
+            for row in range(1 << self.row_bits):
+                self._left[row] = self._slide(row, False)
+                self._right[row] = self._slide(row, True)
+                self._columns[row] = self._spread(row)
+
+        self.moves = (self._move_left, self._move_right, self._move_up, self._move_down)
+
+    def _slide(self, row, reverse):
+        """Slide and merge one packed row, same rules as bitboard"""
+        bits = self.cell_bits
+        line = [(row >> (bits * k)) & self.cell_mask for k in range(self.size)]
+        if reverse:
+            line.reverse()
+
+        tiles = [e for e in line if e]
+        merged = []
+        score = 0
+        j = 0
+        while j < len(tiles):
+            if j + 1 < len(tiles) and tiles[j] == tiles[j + 1] and tiles[j] < self.max_exponent_value:
+                merged.append(tiles[j] + 1)
+                score += 1 << (tiles[j] + 1)
+                j += 2
+            else:
+                merged.append(tiles[j])
+                j += 1
+        merged += [0] * (self.size - len(merged))
+        if reverse:
+            merged.reverse()
+
+        result = 0
+        for k, e in enumerate(merged):
+            result |= e << (bits * k)
+        return result, score
+
+    def _spread(self, row):
+        """Place the cells of a row one row apart, as column 0 of a board"""
+        bits = self.cell_bits
+        step = self.row_bits
+        column = 0
+        for k in range(self.size):
+            column |= ((row >> (bits * k)) & self.cell_mask) << (step * k)
+        return column
+
+    def _lookup(self, table, row, reverse):
+        entry = table.get(row)
+        if entry is None:
+            if len(table) >= MEMO_LIMIT:
+                table.clear()
+            entry = table[row] = self._slide(row, reverse)
+        return entry
+
+    def _move_rows(self, board, table, reverse):
+        new_board = 0
+        score = 0
+        row_bits = self.row_bits
+        row_mask = self.row_mask
+        for r in range(self.size):
+            shift = r * row_bits
+            row = (board >> shift) & row_mask
+            entry = table.get(row)
+            if entry is None:
+                entry = self._lookup(table, row, reverse)
+            new_board |= entry[0] << shift
+            score += entry[1]
+        return new_board, score
+
+    def _move_left(self, board):
+        return self._move_rows(board, self._left, False)
+
+    def _move_right(self, board):
+        return self._move_rows(board, self._right, True)
+
+    def _move_up(self, board):
+        new_board, score = self._move_rows(self.transpose(board), self._left, False)
+        return self.transpose(new_board), score
+
+    def _move_down(self, board):
+        new_board, score = self._move_rows(self.transpose(board), self._right, True)
+        return self.transpose(new_board), score
+
+    def move(self, board, direction):
+        """Return (new_board, score_gained) for a move in the given direction"""
+        return self.moves[direction](board)
+
+    def transpose(self, board):
+        """Swap rows and columns of a packed board
+
+        Row r becomes column r, so the board is rebuilt from one spread-out
+        column per row instead of moving cells one at a time.
+        """
+        columns = self._columns
+        bits = self.cell_bits
+        row_bits = self.row_bits
+        row_mask = self.row_mask
+        result = 0
+        for r in range(self.size):
+            row = (board >> (r * row_bits)) & row_mask
+            column = columns.get(row)
+            if column is None:
+                if len(columns) >= MEMO_LIMIT:
+                    columns.clear()
+                column = columns[row] = self._spread(row)
+            result |= column << (bits * r)
+        return result
+
+    def empty_cells(self, board):
+        """Return the indices (size * row + col) of all empty cells"""
+        bits = self.cell_bits
+        mask = self.cell_mask
+        return [i for i in range(self.cells) if not (board >> (bits * i)) & mask]
+
+    def empty_mask(self, board):
+        """Return a mask with bit i set when cell i is empty"""
+        bits = self.cell_bits
+        mask = self.cell_mask
+        result = 0
+        for i in range(self.cells):
+            if not (board >> (bits * i)) & mask:
+                result |= 1 << i
+        return result
+
+    def count_empty(self, board):
+        """Count empty cells"""
+        return len(self.empty_cells(board))
+
+    def get_exponent(self, board, index):
+        """Return the exponent stored in cell index"""
+        return (board >> (self.cell_bits * index)) & self.cell_mask
+
+    def set_exponent(self, board, index, exponent):
+        """Return board with cell index set to exponent"""
+        shift = self.cell_bits * index
+        return (board & ~(self.cell_mask << shift)) | (exponent << shift)
+
+    def max_exponent(self, board):
+        """Return the largest exponent on the board"""
+        best = 0
+        while board:
+            if board & self.cell_mask > best:
+                best = board & self.cell_mask
+            board >>= self.cell_bits
+        return best
+
+    def is_game_over(self, board):
+        """Check if no move changes the board"""
+        if self.count_empty(board):
+            return False
+        return (self._move_left(board)[0] == board and
+                self._move_up(board)[0] == board)
+
+    def has_won(self, board, exponent=bitboard.WIN_EXPONENT):
+        """Check if any tile reached 2 ** exponent"""
+        return self.max_exponent(board) >= exponent
+
+    def changed_cells(self, old, new):
+        """Return (index, exponent in new) of every cell that differs from old
+
+        Every cell counts as changed when old is None.
+        """
+        bits = self.cell_bits
+        mask = self.cell_mask
+        changed = (1 << (bits * self.cells)) - 1 if old is None else old ^ new
+        cells = []
+        index = 0
+        while changed:
+            if changed & mask:
+                cells.append((index, (new >> (bits * index)) & mask))
+            changed >>= bits
+            index += 1
+        return cells
+
+    def from_grid(self, grid):
+        """Pack a list grid of tile values into a board"""
+        board = 0
+        for i in range(self.size):
+            for j in range(self.size):
+                value = grid[i][j]
+                if value:
+                    board |= (value.bit_length() - 1) << (self.cell_bits * (self.size * i + j))
+        return board
+
+    def to_grid(self, board):
+        """Unpack a board into a list grid of tile values"""
+        grid = []
+        for i in range(self.size):
+            row = []
+            for j in range(self.size):
+                exponent = self.get_exponent(board, self.size * i + j)
+                row.append(1 << exponent if exponent else 0)
+            grid.append(row)
+        return grid
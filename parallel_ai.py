@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import time
+
+import ai
+import bitboard
+
+# Root-split expectimax over a persistent process pool.
+#
+# The root of the search is four moves, each followed by a chance node with
+# one child per (empty cell, 2 or 4). Every one of those spawn children is
+# an independent max-node search, so they are handed to the pool as
+# separate tasks and the parent only does the weighted sums. Tasks carry the
+# board as a packed int and the deadline as wall-clock time, so they are a
+# few dozen bytes each. Workers keep their ExpectimaxAI, and with it the
+# transposition table, between searches.
+
+_worker_ai = None
+
+
+def _init_worker(max_depth, prob_cutoff, table_size):
+    global _worker_ai
+    _worker_ai = ai.ExpectimaxAI(max_depth=max_depth, prob_cutoff=prob_cutoff,
+                                 table_size=table_size)
+
+
+def _search_task(task):
+    """Search one spawn child, returns (key, value, nodes); value is None on timeout"""
+    key, board, depth, prob, deadline = task
+    searcher = _worker_ai
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return key, None, 0
+    searcher.trim_table()
+    searcher.deadline = time.perf_counter() + remaining
+    searcher.nodes = 0
+    try:
+        value = searcher._max(board, depth, prob)
+    except ai.SearchTimeout:
+        value = None
+    finally:
+        searcher.deadline = None
+    return key, value, searcher.nodes
+
+
+class ParallelExpectimaxAI:
+    """ExpectimaxAI with the root's spawn children searched in a process pool
+
+    The pool starts on first use and lives until close(). best_move() has
+    the same contract as ExpectimaxAI.best_move: iterative deepening, and
+    the result of the deepest search that finished inside the budget.
+    """
+
+    def __init__(self, workers=None, max_depth=6, prob_cutoff=1e-4, table_size=1 << 18,
+                 target_moves_per_sec=10):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_depth = max_depth
+        self.prob_cutoff = prob_cutoff
+        self.table_size = table_size
+        self.target_moves_per_sec = target_moves_per_sec
+        self.nodes = 0
+        self.last_depth = 0
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self.workers, initializer=_init_worker,
+                initargs=(self.max_depth, self.prob_cutoff, self.table_size))
+        return self._pool
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def default_budget_ms(self):
+        """Time per move that meets the moves/second target"""
+        return 1000.0 / self.target_moves_per_sec
+
+    def best_move(self, board, time_budget_ms=None):
+        """Return the best direction for board, or None if no move is legal"""
+        moves = [(d, bitboard.move(board, d)) for d in bitboard.DIRECTIONS]
+        moves = [(d, new, score) for d, (new, score) in moves if new != board]
+        if not moves:
+            return None
+        if len(moves) == 1:
+            return moves[0][0]
+
+        if time_budget_ms is None:
+            time_budget_ms = self.default_budget_ms()
+        deadline = time.time() + time_budget_ms / 1000.0
+        self.nodes = 0
+        self.last_depth = 0
+
+        best = moves[0][0]
+        for depth in range(1, ai.search_depth(board, self.max_depth) + 1):
+            result = self._search_root(moves, depth, deadline)
+            if result is None:
+                break
+            best = result
+            self.last_depth = depth
+        return best
+
+    def _search_root(self, moves, depth, deadline):
+        """One full-width search at depth, None if it missed the deadline"""
+        tasks = []
+        for direction, new_board, _ in moves:
+            empty = bitboard.empty_cells(new_board)
+            prob_2 = ai.SPAWN_2 / len(empty)
+            prob_4 = ai.SPAWN_4 / len(empty)
+            for index in empty:
+                shift = 4 * index
+                tasks.append(((direction, index, 1), new_board | (1 << shift), depth - 1, prob_2, deadline))
+                tasks.append(((direction, index, 2), new_board | (2 << shift), depth - 1, prob_4, deadline))
+
+        values = {}
+        results = self.pool.imap_unordered(_search_task, tasks)
+        try:
+            for _ in tasks:
+                key, value, nodes = results.next(max(0.0, deadline - time.time()))
+                self.nodes += nodes
+                if value is None:
+                    return None
+                values[key] = value
+        except multiprocessing.TimeoutError:
+            # Unfinished tasks see the passed deadline and return at once
+            return None
+
+        # Sum in the same order as the serial search
+        best_value = None
+        best_direction = None
+        for direction, new_board, score in moves:
+            empty = bitboard.empty_cells(new_board)
+            total = 0.0
+            for index in empty:
+                total += ai.SPAWN_2 * values[direction, index, 1]
+                total += ai.SPAWN_4 * values[direction, index, 2]
+            value = score + total / len(empty)
+            if best_value is None or value > best_value:
+                best_value = value
+                best_direction = direction
+        return best_direction
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Best score and per-game statistics shared by both front-ends.
+#
+# Callers only update in-memory state; a background thread writes it out.
+# Updates that arrive within flush_delay of each other are coalesced into a
+# single write. The best score file is replaced atomically (write to a
+# temporary file, fsync, rename), and finished games are appended as JSON
+# lines to a statistics log that is compacted once it grows past
+# max_entries. A write that fails is kept and retried, backing off from
+# retry_delay up to MAX_RETRY_DELAY while the failures continue.
+
+log = logging.getLogger(__name__)
+
+BEST_SCORE_FILE = 'best_score.json'
+STATS_FILE = 'game_stats.jsonl'
+MAX_RETRY_DELAY = 60.0
+
+
+def atomic_write(path, data):
+    """Replace path with data so readers never see a partial file"""
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ScoreStore:
+    def __init__(self, directory='.', flush_delay=0.5, max_entries=1000, retry_delay=1.0):
+        self.best_path = os.path.join(directory, BEST_SCORE_FILE)
+        self.stats_path = os.path.join(directory, STATS_FILE)
+        self.flush_delay = flush_delay
+        self.max_entries = max_entries
+        self.retry_delay = retry_delay
+        self.last_error = None
+
+        self.best_score = self._load_best_score()
+        self._saved_best = self.best_score
+        self._pending_games = []
+        self._log_entries = None
+        self._closing = False
+        self._urgent = False
+        self._busy = False
+        self._failures = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _load_best_score(self):
+        try:
+            with open(self.best_path) as f:
+                return int(json.load(f).get('best_score', 0))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, AttributeError) as e:
+            log.warning("Could not read %s: %s", self.best_path, e)
+            return 0
+
+    def set_best_score(self, score):
+        """Raise the best score; written out in the background"""
+        with self._cond:
+            if score <= self.best_score:
+                return
+            self.best_score = score
+            self._wake()
+
+    def record_game(self, score, max_tile, moves, duration):
+        """Queue a finished game for the statistics log"""
+        with self._cond:
+            self._pending_games.append({
+                'time': round(time.time(), 3),
+                'score': score,
+                'max_tile': max_tile,
+                'moves': moves,
+                'duration': round(duration, 3),
+            })
+            if score > self.best_score:
+                self.best_score = score
+            self._wake()
+
+    def _wake(self):
+        # Called with the lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='ScoreStore', daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _dirty(self):
+        return self.best_score != self._saved_best or bool(self._pending_games)
+
+    def _run(self):
+        with self._cond:
+            while True:
+                while not self._dirty() and not self._closing:
+                    self._cond.wait()
+                if not self._dirty():
+                    return
+                # Give more updates a chance to arrive before writing
+                deadline = time.monotonic() + self.flush_delay
+                while not (self._closing or self._urgent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                best = self.best_score
+                games = self._pending_games
+                self._pending_games = []
+                self._busy = True
+
+                self._cond.release()
+                try:
+                    saved = self._write(best, games)
+                finally:
+                    self._cond.acquire()
+                self._busy = False
+                if saved:
+                    self._saved_best = best
+                    self._failures = 0
+                else:
+                    # Keep the games, ahead of any that arrived meanwhile
+                    self._pending_games[:0] = games
+                    self._failures += 1
+                self._cond.notify_all()
+                if saved:
+                    continue
+                if self._closing:
+                    # Still pending; the next update starts a new writer
+                    return
+                delay = min(self.retry_delay * 2 ** (self._failures - 1), MAX_RETRY_DELAY)
+                deadline = time.monotonic() + delay
+                while not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+    def _write(self, best, games):
+        """Write the best score and append games, returns False if that failed"""
+        try:
+            if best != self._saved_best:
+                atomic_write(self.best_path, json.dumps({'best_score': best}))
+            if games:
+                with open(self.stats_path, 'a') as f:
+                    for game in games:
+                        f.write(json.dumps(game) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            self.last_error = e
+            log.warning("Could not save scores: %s", e)
+            return False
+
+        # The games are logged by now; a failed compaction is tried again
+        # after the next game instead of writing them twice
+        if games:
+            try:
+                if self._log_entries is None:
+                    self._log_entries = len(self.load_stats())
+                else:
+                    self._log_entries += len(games)
+                if self._log_entries > 2 * self.max_entries:
+                    self.compact()
+            except OSError as e:
+                self.last_error = e
+                log.warning("Could not compact %s: %s", self.stats_path, e)
+        return True
+
+    def load_stats(self):
+        """Return the logged games, oldest first"""
+        games = []
+        try:
+            with open(self.stats_path) as f:
+                for line in f:
+                    try:
+                        games.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line after a crash is skipped
+                        continue
+        except FileNotFoundError:
+            pass
+        return games
+
+    def compact(self):
+        """Rewrite the statistics log keeping the newest max_entries games"""
+        games = self.load_stats()[-self.max_entries:]
+        atomic_write(self.stats_path, ''.join(json.dumps(g) + '\n' for g in games))
+        self._log_entries = len(games)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is on disk
+
+        Returns False if the timeout ran out first. Without a timeout this
+        waits through any failed writes until one succeeds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # Skip the coalescing delay while someone is waiting
+            self._urgent = True
+            try:
+                while self._dirty() or self._busy:
+                    self._wake()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._urgent = False
+
+    def close(self, timeout=5.0):
+        """Flush pending writes and stop the writer thread"""
+        self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._closing = False
@@ -0,0 +1,244 @@
+import argparse
+import array
+import os
+import struct
+import sys
+import time
+
+import bitboard
+from game_core import GameCore
+
+# Compact game recordings.
+#
+# A replay stores the game's RNG seed and one byte per turn:
+#   bits 0-1  direction (LEFT, RIGHT, UP, DOWN)
+#   bits 2-5  cell index of the spawned tile
+#   bit  6    spawned tile was a 4 instead of a 2
+#   bit  7    reserved, always 0
+# Every legal move leaves an empty cell, so every turn has a spawn.
+# Every KEYFRAME_INTERVAL turns the board and score are stored as well, so
+# seeking to turn n replays at most KEYFRAME_INTERVAL - 1 moves.
+#
+# File layout (little endian):
+#   header     '<4sQII'  magic, seed, turn count, keyframe interval
+#   turns      one byte per turn
+#   keyframes  '<QQ' board and score before turns 0, k, 2k, ...
+
+MAGIC = b'R2K1'
+HEADER = struct.Struct('<4sQII')
+KEYFRAME_INTERVAL = 256
+
+_SPAWN_FOUR = 0x40
+_RESERVED = 0x80
+
+
+class ReplayError(Exception):
+    pass
+
+
+def pack_turn(direction, spawn):
+    """Pack a turn, its direction and (cell_index, exponent) spawn, into one byte"""
+    index, exponent = spawn
+    return direction | (index << 2) | (_SPAWN_FOUR if exponent == 2 else 0)
+
+
+def unpack_turn(turn):
+    """Return (direction, (cell_index, exponent)) for a packed turn"""
+    return turn & 3, ((turn >> 2) & 0xF, 2 if turn & _SPAWN_FOUR else 1)
+
+
+def apply_turn(board, turn):
+    """Apply a packed turn to board, returns (new_board, score_gained)"""
+    board, score_gained = bitboard.MOVES[turn & 3](board)
+    board = bitboard.set_exponent(board, (turn >> 2) & 0xF, 2 if turn & _SPAWN_FOUR else 1)
+    return board, score_gained
+
+
+class Replay:
+    def __init__(self, seed, initial_board, turns=b'', keyframes=None,
+                 keyframe_interval=KEYFRAME_INTERVAL):
+        self.seed = seed
+        self.turns = bytearray(turns)
+        self.keyframe_interval = keyframe_interval
+        if keyframes is None:
+            keyframes = array.array('Q', [initial_board, 0])
+        self.keyframes = keyframes
+
+    @property
+    def initial_board(self):
+        return self.keyframes[0]
+
+    def __len__(self):
+        return len(self.turns)
+
+    def append(self, direction, spawn, board, score):
+        """Record a turn and the board/score it led to"""
+        self.turns.append(pack_turn(direction, spawn))
+        if len(self.turns) % self.keyframe_interval == 0:
+            self.keyframes.append(board)
+            self.keyframes.append(score)
+
+    def truncate(self, turns):
+        """Drop every turn after the first `turns`, e.g. after an undo"""
+        del self.turns[turns:]
+        del self.keyframes[2 * (turns // self.keyframe_interval + 1):]
+
+    def state_at(self, turn):
+        """Return (board, score) after the first `turn` turns"""
+        if not 0 <= turn <= len(self.turns):
+            raise IndexError(f"Turn {turn} out of range 0..{len(self.turns)}")
+        k = turn // self.keyframe_interval
+        board = self.keyframes[2 * k]
+        score = self.keyframes[2 * k + 1]
+        for packed in self.turns[k * self.keyframe_interval:turn]:
+            board, gained = apply_turn(board, packed)
+            score += gained
+        return board, score
+
+    def verify(self):
+        """Replay from the seed and check every recorded turn
+
+        Raises ReplayError on the first mismatch, returns the final score.
+        """
+        game = GameCore(self.seed)
+        if game.board != self.initial_board:
+            raise ReplayError("Initial board does not match the seed")
+        for n, packed in enumerate(self.turns):
+            direction, spawn = unpack_turn(packed)
+            moved, _ = game.move(direction)
+            if not moved:
+                raise ReplayError(f"Turn {n}: illegal move")
+            actual = game.add_random_tile()
+            if actual != spawn:
+                raise ReplayError(f"Turn {n}: spawn {spawn} does not match RNG {actual}")
+            if (n + 1) % self.keyframe_interval == 0:
+                k = (n + 1) // self.keyframe_interval
+                if (game.board, game.score) != tuple(self.keyframes[2 * k:2 * k + 2]):
+                    raise ReplayError(f"Turn {n}: keyframe does not match")
+        return game.score
+
+    def to_bytes(self):
+        keyframes = self.keyframes
+        if sys.byteorder != 'little':
+            keyframes = array.array('Q', keyframes)
+            keyframes.byteswap()
+        return (HEADER.pack(MAGIC, self.seed, len(self.turns), self.keyframe_interval) +
+                bytes(self.turns) + keyframes.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError("Truncated replay header")
+        magic, seed, count, interval = HEADER.unpack_from(data)
+        if magic != MAGIC or not interval:
+            raise ReplayError("Not a replay file")
+        turns = data[HEADER.size:HEADER.size + count]
+        keyframe_data = data[HEADER.size + count:]
+        if len(turns) != count or len(keyframe_data) != 16 * (count // interval + 1):
+            raise ReplayError("Truncated replay")
+        if turns and max(turns) & _RESERVED:
+            raise ReplayError("Reserved bit set in a turn")
+        keyframes = array.array('Q')
+        keyframes.frombytes(keyframe_data)
+        if sys.byteorder != 'little':
+            keyframes.byteswap()
+        return cls(seed, keyframes[0], turns, keyframes, interval)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """Game observer that records every turn
+
+    With a directory set, each finished recording (on reset, or an explicit
+    save()) is written there as <timestamp>-<seed>.2048r.
+
+    After an undo (see history.History) the recording keeps the undone
+    turns in case they are redone; the next turn played, or saving, drops
+    them. The game's RNG is restored with its state, so what remains still
+    verifies against the seed.
+    """
+
+    def __init__(self, game, directory=None):
+        self.directory = directory
+        self.replay = Replay(game.seed, game.board)
+        self.played = 0  # Turns of the recording leading to the game's state
+        game.observers.append(self)
+
+    def on_step(self, game, direction, score_gained, spawn):
+        if len(self.replay) > self.played:
+            self.replay.truncate(self.played)
+        self.replay.append(direction, spawn, game.board, game.score)
+        self.played += 1
+
+    def on_reset(self, game):
+        self.save()
+        self.replay = Replay(game.seed, game.board)
+        self.played = 0
+
+    def on_restore(self, game):
+        self.played = game.moves
+
+    def save(self):
+        """Write the current recording, returns its path or None"""
+        if len(self.replay) > self.played:
+            self.replay.truncate(self.played)
+        if self.directory is None or not len(self.replay):
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, '%s-%d.2048r' % (
+                time.strftime('%Y%m%d-%H%M%S'), self.replay.seed))
+            self.replay.save(path)
+            return path
+        except OSError:
+            return None
+
+
+def render(board, score):
+    """Format a board as text"""
+    lines = [f"Score: {score}"]
+    for row in bitboard.to_grid(board):
+        lines.append(' '.join(f"{value or '.':>5}" for value in row))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify or show a recorded 2048 game")
+    parser.add_argument('command', choices=['verify', 'show', 'info'])
+    parser.add_argument('path')
+    parser.add_argument('--turn', type=int, default=None, help="turn to show (default: last)")
+    args = parser.parse_args(argv)
+
+    try:
+        replay = Replay.load(args.path)
+        if args.command == 'verify':
+            start = time.perf_counter()
+            score = replay.verify()
+            print(f"OK: {len(replay)} turns, final score {score} "
+                  f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+        elif args.command == 'show':
+            turn = len(replay) if args.turn is None else args.turn
+            print(f"Turn {turn}/{len(replay)}")
+            print(render(*replay.state_at(turn)))
+        else:
+            board, score = replay.state_at(len(replay))
+            print(f"Seed: {replay.seed}")
+            print(f"Turns: {len(replay)}")
+            print(f"Final score: {score}")
+            print(f"Max tile: {1 << bitboard.max_exponent(board)}")
+    except (OSError, ReplayError, IndexError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
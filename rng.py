@@ -0,0 +1,157 @@
+import random
+
+# Random number generators for games.
+#
+# GameCore only needs seed(), random(), getrandbits() and randrange() from
+# its RNG (History adds getstate() and setstate()), so anything providing
+# those can stand in for random.Random.
+# random.Random carries about 2.5 KB of Mersenne Twister state per instance;
+# SplitMix64 keeps a single 64-bit int, which is what lets a parked session
+# be stored in a few array slots.
+#
+# BulkRandom serves the NumPy simulators (batch.BatchGame, montecarlo),
+# which take arrays of uniform floats a batch at a time: calling a NumPy
+# generator for every small batch costs more than the numbers, so it draws
+# a block of them at once and hands out slices. It has the GameCore methods
+# too, so a scalar game can share its stream, but one number at a time
+# random.Random is faster. Its state is the generator state the current
+# block was drawn from, the position in the block and the generator's state
+# now, so setstate() redraws the block and picks up where it left off.
+
+MASK64 = (1 << 64) - 1
+
+
+class SplitMix64:
+    """Seedable 64-bit generator whose whole state is one int
+
+    The sequence is SplitMix64 (Steele, Lea and Flood), which passes BigCrush
+    and is plenty for tile spawns. Not a drop-in for random.Random streams:
+    the same seed gives different numbers.
+    """
+
+    __slots__ = ('state',)
+
+    def __init__(self, seed=None):
+        self.seed(seed)
+
+    def seed(self, a=None):
+        if a is None:
+            a = random.SystemRandom().getrandbits(64)
+        self.state = a & MASK64
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+    def next64(self):
+        """Return the next 64-bit output"""
+        self.state = state = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def getrandbits(self, k):
+        """Return an int with k random bits"""
+        if k <= 64:
+            return self.next64() >> (64 - k)
+        bits = 0
+        for shift in range(0, k, 64):
+            bits |= self.next64() << shift
+        return bits & ((1 << k) - 1)
+
+    def random(self):
+        """Return a float in [0.0, 1.0)"""
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def randbelow(self, n):
+        """Return an int in [0, n) without modulo bias"""
+        if n <= 0:
+            raise ValueError(f"randbelow() needs a positive bound, got {n}")
+        k = n.bit_length()
+        r = self.next64() >> (64 - k)
+        while r >= n:
+            r = self.next64() >> (64 - k)
+        return r
+
+    def randrange(self, stop):
+        return self.randbelow(stop)
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.randbelow(len(seq))]
+
+
+class BulkRandom:
+    """NumPy generator whose floats are drawn a block at a time (needs NumPy)
+
+    random(n) returns the next n floats as a view into the block, only
+    valid until the next call. The same seed gives the same numbers for
+    the same sequence of calls; changing the block size changes them.
+    """
+
+    def __init__(self, seed=None, block=1 << 16):
+        import numpy as np
+        self._np = np
+        self.values = np.empty(block)
+        self.seed(seed)
+
+    def seed(self, a=None):
+        self.generator = self._np.random.default_rng(a)
+        self.next = len(self.values)  # Nothing drawn yet
+        self._block_state = None
+
+    def getstate(self):
+        return self._block_state, self.next, self.generator.bit_generator.state
+
+    def setstate(self, state):
+        block_state, position, current = state
+        if block_state is not None:
+            self.generator.bit_generator.state = block_state
+            self.generator.random(out=self.values)
+        self.next = position
+        self._block_state = block_state
+        self.generator.bit_generator.state = current
+
+    def _refill(self):
+        self._block_state = self.generator.bit_generator.state
+        self.generator.random(out=self.values)
+        self.next = 0
+
+    def random(self, n=None):
+        """Return a float in [0.0, 1.0), or an array of n of them"""
+        if n is None:
+            if self.next >= len(self.values):
+                self._refill()
+            self.next += 1
+            return self.values.item(self.next - 1)
+        if n > len(self.values):
+            return self.generator.random(n)
+        if self.next + n > len(self.values):
+            self._refill()
+        self.next += n
+        return self.values[self.next - n:self.next]
+
+    def integers(self, low, high, size, dtype='int64'):
+        """Array of ints in [low, high), like Generator.integers"""
+        values = self.random(int(self._np.prod(size))) * (high - low) + low
+        return values.astype(dtype).reshape(size)
+
+    def getrandbits(self, k):
+        """Return an int with k random bits"""
+        bits = 0
+        for shift in range(0, k, 32):
+            bits |= int(self.random() * (1 << 32)) << shift
+        return bits & ((1 << k) - 1)
+
+    def randrange(self, stop):
+        if stop <= 0:
+            raise ValueError(f"randrange() needs a positive stop, got {stop}")
+        return int(self.random() * stop)
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.randrange(len(seq))]
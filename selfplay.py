@@ -0,0 +1,168 @@
+import argparse
+import array
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import ai
+import bitboard
+from game_core import GameCore, LEFT, RIGHT, UP, DOWN
+
+# Plays many headless games across a process pool. Game i is seeded with
+# game_seed(base_seed, i), so a run is reproducible no matter how many
+# workers it is spread over or in which order chunks finish.
+
+COLUMNS = ('seed', 'score', 'max_tile', 'moves', 'wall_time')
+_TYPECODES = {'seed': 'Q', 'score': 'Q', 'max_tile': 'L', 'moves': 'L', 'wall_time': 'd'}
+EXPECTIMAX_DEPTH = 2
+
+_searcher = None  # The expectimax policy's ExpectimaxAI, one per process
+
+
+def random_policy(game, rng):
+    """Pick a uniformly random legal move"""
+    legal = [d for d in bitboard.DIRECTIONS if bitboard.move(game.board, d)[0] != game.board]
+    return rng.choice(legal)
+
+
+def corner_policy(game, rng):
+    """Prefer down, then left, then right, then up"""
+    for direction in (DOWN, LEFT, RIGHT, UP):
+        if bitboard.move(game.board, direction)[0] != game.board:
+            return direction
+    return DOWN
+
+
+def expectimax_policy(game, rng):
+    """Search with the expectimax AI to a fixed depth
+
+    A fixed depth rather than a time budget keeps the moves, and so the
+    run's results, independent of machine speed and load. The table starts
+    empty each game, so a game plays the same in whichever worker it lands.
+    """
+    global _searcher
+    if _searcher is None:
+        _searcher = ai.ExpectimaxAI(max_depth=EXPECTIMAX_DEPTH)
+    if game.moves == 0:
+        _searcher.table.clear()
+    best = None
+    for _, best in _searcher.deepen(game.board, max_depth=EXPECTIMAX_DEPTH):
+        pass
+    return best
+
+
+POLICIES = {
+    'random': random_policy,
+    'corner': corner_policy,
+    'expectimax': expectimax_policy,
+}
+
+
+def game_seed(base_seed, index):
+    """Return the seed of game index within a run"""
+    return ((base_seed & 0xFFFFFFFF) << 32) | (index & 0xFFFFFFFF)
+
+
+def play_game(seed, policy=random_policy, max_moves=None):
+    """Play one game to the end, returns (score, max_tile, moves)"""
+    game = GameCore(seed)
+    # Policies get their own stream so the game's RNG only drives spawns,
+    # which keeps spawns reproducible from the seed alone
+    policy_rng = random.Random(~seed)
+    while not game.is_game_over():
+        if max_moves is not None and game.moves >= max_moves:
+            break
+        game.step(policy(game, policy_rng))
+    return game.score, game.max_tile(), game.moves
+
+
+def _play_chunk(task):
+    """Play games [start, stop) and return their results column by column"""
+    start, stop, base_seed, policy_name, max_moves = task
+    policy = POLICIES[policy_name]
+    columns = {name: array.array(_TYPECODES[name]) for name in COLUMNS}
+    for index in range(start, stop):
+        seed = game_seed(base_seed, index)
+        began = time.perf_counter()
+        score, max_tile, moves = play_game(seed, policy, max_moves)
+        columns['seed'].append(seed)
+        columns['score'].append(score)
+        columns['max_tile'].append(max_tile)
+        columns['moves'].append(moves)
+        columns['wall_time'].append(time.perf_counter() - began)
+    return start, columns
+
+
+def _collect(columns, chunks):
+    """Copy chunk results into the run-wide columns"""
+    for start, chunk in chunks:
+        for name in COLUMNS:
+            columns[name][start:start + len(chunk[name])] = chunk[name]
+
+
+def run(games, workers=None, base_seed=0, policy='random', max_moves=None, chunk_size=None):
+    """Play games across a process pool, returns (columns, elapsed_seconds)
+
+    columns maps each name in COLUMNS to an array ordered by game index.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool balanced without paying
+        # IPC for every single game
+        chunk_size = max(1, min(1000, games // (workers * 4)))
+
+    tasks = [(start, min(start + chunk_size, games), base_seed, policy, max_moves)
+             for start in range(0, games, chunk_size)]
+    columns = {name: array.array(_TYPECODES[name], [0] * games) for name in COLUMNS}
+
+    began = time.perf_counter()
+    if workers == 1:
+        _collect(columns, map(_play_chunk, tasks))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            _collect(columns, pool.imap_unordered(_play_chunk, tasks))
+    return columns, time.perf_counter() - began
+
+
+def write_results(path, columns):
+    """Write columns to path as .npz (needs NumPy) or columnar .json"""
+    if path.endswith('.npz'):
+        import numpy as np
+        np.savez_compressed(path, **{name: np.frombuffer(col, dtype=col.typecode)
+                                     for name, col in columns.items()})
+    else:
+        with open(path, 'w') as f:
+            json.dump({name: col.tolist() for name, col in columns.items()}, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless 2048 games in parallel")
+    parser.add_argument('-n', '--games', type=int, default=1000, help="number of games")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0, help="base seed of the run")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--max-moves', type=int, default=None, help="stop games after this many moves")
+    parser.add_argument('--chunk-size', type=int, default=None, help="games per worker task")
+    parser.add_argument('-o', '--output', help="write results to a .json or .npz file")
+    args = parser.parse_args(argv)
+
+    columns, elapsed = run(args.games, args.workers, args.seed, args.policy,
+                           args.max_moves, args.chunk_size)
+    if args.output:
+        write_results(args.output, columns)
+
+    scores = columns['score']
+    print(f"{args.games} games in {elapsed:.2f}s ({args.games / elapsed:.1f} games/s)")
+    print(f"Mean score: {sum(scores) / max(1, len(scores)):.1f}  "
+          f"Best: {max(scores, default=0)}  Best tile: {max(columns['max_tile'], default=0)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
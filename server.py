@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from game_core import GRID_SIZE, LEFT, RIGHT, UP, DOWN
+from sessions import SessionError, SessionStore
+
+# Headless game server for bots and thin clients.
+#
+# Clients talk newline-delimited JSON over TCP or a Unix socket. Every
+# request is one object with an "op", answered by one object on its own
+# line; an "id" field in a request is echoed back so clients can pipeline.
+#
+#   {"op": "new", "seed": 1, "size": 4}      -> session, board, score, over
+#   {"op": "move", "session": 7, "direction": "left"}
+#                                           -> moved, board, score, delta, over, won
+#   {"op": "state", "session": 7}            -> board, score, over, won
+#   {"op": "close", "session": 7}
+#
+# Boards are sent packed, as a hex string of the engine's int (4 bits per
+# cell up to 4x4, 5 bits above); add "grid": true to a request to also get
+# the tile values as a list of rows. Errors come back as
+# {"ok": false, "error": "..."}. Sessions live in a SessionStore: idle ones
+# are parked in compact arrays and dropped after idle_timeout seconds
+# without a request.
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 2048
+DIRECTION_NAMES = {'left': LEFT, 'right': RIGHT, 'up': UP, 'down': DOWN}
+WRITE_BUFFER_LIMIT = 64 * 1024  # Wait for the socket to drain above this
+MAINTAIN_INTERVAL = 1.0  # Seconds between session parking/expiry passes
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _state(game, with_grid):
+    response = {
+        'board': '%x' % game.board,
+        'size': game.size,
+        'score': game.score,
+        'over': game.is_game_over(),
+    }
+    if with_grid:
+        response['grid'] = game.grid
+    return response
+
+
+class GameServer:
+    def __init__(self, sessions=None):
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.requests = 0
+        self._servers = []
+        self._maintain_task = None
+
+    def handle(self, request):
+        """Answer one decoded request, returns the response dict"""
+        if not isinstance(request, dict):
+            raise ProtocolError("Request must be a JSON object")
+        op = request.get('op')
+        with_grid = bool(request.get('grid'))
+
+        if op == 'move':
+            game = self.sessions.get(request.get('session'))
+            direction = request.get('direction')
+            if isinstance(direction, str):
+                direction = DIRECTION_NAMES.get(direction)
+            if type(direction) is not int or direction not in (LEFT, RIGHT, UP, DOWN):
+                raise ProtocolError(f"Bad direction: {request.get('direction')!r}")
+            moved, delta = game.step(direction)
+            response = _state(game, with_grid)
+            response['moved'] = moved
+            response['delta'] = delta
+            response['won'] = game.has_won()
+            return response
+
+        if op == 'new':
+            seed = request.get('seed')
+            size = request.get('size', GRID_SIZE)
+            if seed is not None and not isinstance(seed, int):
+                raise ProtocolError("seed must be an integer")
+            if not isinstance(size, int):
+                raise ProtocolError("size must be an integer")
+            try:
+                session, game = self.sessions.create(seed, size)
+            except ValueError as e:
+                # Unsupported board size
+                raise ProtocolError(str(e))
+            response = _state(game, with_grid)
+            response['session'] = session
+            response['seed'] = game.seed
+            return response
+
+        if op == 'state':
+            game = self.sessions.get(request.get('session'))
+            response = _state(game, with_grid)
+            response['won'] = game.has_won()
+            response['moves'] = game.moves
+            return response
+
+        if op == 'close':
+            session = request.get('session')
+            if isinstance(session, int):
+                self.sessions.close(session)
+            return {}
+
+        raise ProtocolError(f"Unknown op: {op!r}")
+
+    def handle_line(self, line):
+        """Answer one request line, returns the encoded response line"""
+        self.requests += 1
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise ProtocolError(f"Bad JSON: {e}")
+            if isinstance(request, dict):
+                request_id = request.get('id')
+            response = self.handle(request)
+            response['ok'] = True
+        except (ProtocolError, SessionError) as e:
+            response = {'ok': False, 'error': str(e)}
+        if request_id is not None:
+            response['id'] = request_id
+        return (json.dumps(response, separators=(',', ':')) + '\n').encode()
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # readline() raises this for lines over the stream limit
+                    log.warning("Dropping client with an oversized request line")
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(self.handle_line(line))
+                # Replies go out as soon as they are written; only wait when a
+                # slow client lets the buffer grow
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=None, port=DEFAULT_PORT, unix_path=None):
+        """Start listening; TCP on host:port unless only unix_path is given"""
+        if unix_path is not None:
+            self._servers.append(await asyncio.start_unix_server(self.serve_client, unix_path))
+        if host is not None or unix_path is None:
+            self._servers.append(await asyncio.start_server(self.serve_client, host, port))
+        self._maintain_task = asyncio.ensure_future(self._maintain_loop())
+        return self._servers
+
+    async def _maintain_loop(self):
+        while True:
+            await asyncio.sleep(MAINTAIN_INTERVAL)
+            self.sessions.maintain()
+
+    def close(self):
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        if self._maintain_task is not None:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+
+
+class Client:
+    """Minimal asyncio client, one request in flight per call"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op, **fields):
+        fields['op'] = op
+        self.writer.write((json.dumps(fields, separators=(',', ':')) + '\n').encode())
+        response = json.loads(await self.reader.readline())
+        if not response.get('ok'):
+            raise ProtocolError(response.get('error'))
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve headless 2048 games over NDJSON")
+    parser.add_argument('--host', default=None, help="TCP address (default: all interfaces)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', dest='unix_path', default=None, help="listen on a Unix socket")
+    parser.add_argument('--max-sessions', type=int, default=1000000)
+    parser.add_argument('--idle-timeout', type=float, default=600.0,
+                        help="seconds before an unused session is dropped")
+    parser.add_argument('--park-after', type=float, default=30.0,
+                        help="seconds before an unused session is moved to compact storage")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    server = GameServer(SessionStore(args.max_sessions, args.idle_timeout, args.park_after))
+
+    async def run():
+        servers = await server.start(args.host, args.port, args.unix_path)
+        for s in servers:
+            for sock in s.sockets:
+                log.info("Listening on %s", sock.getsockname())
+        await asyncio.gather(*(s.serve_forever() for s in servers))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
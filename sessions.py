@@ -0,0 +1,192 @@
+import array
+import time
+
+from game_core import GameCore, GRID_SIZE
+from rng import SplitMix64
+
+# Session storage for the game server.
+#
+# Recently used sessions are live GameCore objects. A session left alone for
+# park_after seconds is parked: its board, score, move count, seed and RNG
+# state go into flat arrays indexed by the session's slot, and the object is
+# dropped. The next request rehydrates it. Games use SplitMix64 so the RNG
+# state is a single 64-bit value and a parked session costs about 60 bytes.
+#
+# Session ids are (generation << 32) | slot. Slots of closed sessions are
+# reused, so the arrays only grow with the number of open sessions, and the
+# generation stops a stale id from reaching the slot's next occupant.
+
+FREE = 0
+LIVE = 1
+PARKED = 2
+
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+SWEEP_BATCH = 65536  # Parked slots checked for expiry per maintain() call
+
+
+class SessionError(Exception):
+    pass
+
+
+class SessionStore:
+    def __init__(self, max_sessions=1000000, idle_timeout=600.0, park_after=30.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.park_after = park_after
+        self.live = {}  # slot -> GameCore
+        self.parked = 0
+
+        # One entry per slot
+        self.status = array.array('B')
+        self.generation = array.array('H')
+        self.last_used = array.array('d')
+        self.boards = array.array('Q')
+        self.scores = array.array('Q')
+        self.moves = array.array('L')
+        self.seeds = array.array('Q')
+        self.rng_states = array.array('Q')
+        self.sizes = array.array('B')
+        self.started_at = array.array('d')
+        # Boards wider than 64 bits (5x5 and up) are parked here instead
+        self.wide_boards = {}
+
+        self.free_slots = array.array('L')
+        self._sweep_cursor = 0
+
+    def __len__(self):
+        return len(self.live) + self.parked
+
+    def _allocate(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+        slot = len(self.status)
+        for column, value in ((self.status, FREE), (self.generation, 0),
+                              (self.last_used, 0.0), (self.boards, 0), (self.scores, 0),
+                              (self.moves, 0), (self.seeds, 0), (self.rng_states, 0),
+                              (self.sizes, 0), (self.started_at, 0.0)):
+            column.append(value)
+        return slot
+
+    def create(self, seed=None, size=GRID_SIZE):
+        """Start a game, returns (session_id, game)"""
+        if len(self) >= self.max_sessions:
+            self.maintain(full=True)
+            if len(self) >= self.max_sessions:
+                raise SessionError("Too many sessions")
+        if seed is not None and not 0 <= seed < 1 << 64:
+            raise SessionError("seed must be between 0 and 2**64 - 1")
+        game = GameCore(seed, size, rng_class=SplitMix64)
+        slot = self._allocate()
+        self.status[slot] = LIVE
+        self.last_used[slot] = time.monotonic()
+        self.live[slot] = game
+        return (self.generation[slot] << SLOT_BITS) | slot, game
+
+    def _slot(self, session):
+        if isinstance(session, int) and session >= 0:
+            slot = session & SLOT_MASK
+            if (slot < len(self.status) and self.status[slot] != FREE and
+                    self.generation[slot] == session >> SLOT_BITS):
+                return slot
+        return None
+
+    def get(self, session):
+        """Return the session's game, rehydrating it if it was parked"""
+        slot = self._slot(session)
+        if slot is None:
+            raise SessionError(f"Unknown session: {session}")
+        self.last_used[slot] = time.monotonic()
+        game = self.live.get(slot)
+        if game is None:
+            game = self._unpark(slot)
+        return game
+
+    def close(self, session):
+        slot = self._slot(session)
+        if slot is None:
+            return
+        if self.status[slot] == PARKED:
+            self.parked -= 1
+            self.wide_boards.pop(slot, None)
+        else:
+            del self.live[slot]
+        self.status[slot] = FREE
+        self.generation[slot] = (self.generation[slot] + 1) & 0xFFFF
+        self.free_slots.append(slot)
+
+    def _park(self, slot):
+        game = self.live.pop(slot)
+        if game.board >> 64:
+            self.wide_boards[slot] = game.board
+        else:
+            self.boards[slot] = game.board
+        self.scores[slot] = game.score
+        self.moves[slot] = game.moves
+        self.seeds[slot] = game.seed
+        self.rng_states[slot] = game.rng.getstate()
+        self.sizes[slot] = game.size
+        self.started_at[slot] = game.started_at
+        self.status[slot] = PARKED
+        self.parked += 1
+
+    def _unpark(self, slot):
+        board = self.wide_boards.pop(slot, None)
+        if board is None:
+            board = self.boards[slot]
+        rng = SplitMix64()
+        rng.setstate(self.rng_states[slot])
+        game = GameCore.restore(board, self.scores[slot], self.moves[slot], self.seeds[slot],
+                                rng, self.sizes[slot], self.started_at[slot])
+        self.status[slot] = LIVE
+        self.parked -= 1
+        self.live[slot] = game
+        return game
+
+    def park_idle(self, now=None):
+        """Park live sessions idle past park_after, returns how many"""
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.park_after
+        idle = [slot for slot in self.live if self.last_used[slot] <= cutoff]
+        for slot in idle:
+            self._park(slot)
+        return len(idle)
+
+    def expire(self, now=None, limit=SWEEP_BATCH):
+        """Close sessions idle past idle_timeout, returns how many
+
+        Live sessions are always checked; parked ones are swept limit slots
+        at a time so a large store never stalls the caller.
+        """
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.idle_timeout
+        stale = [slot for slot in self.live if self.last_used[slot] < cutoff]
+
+        total = len(self.status)
+        start = self._sweep_cursor if self._sweep_cursor < total else 0
+        stop = min(total, start + limit)
+        status = self.status
+        last_used = self.last_used
+        for slot in range(start, stop):
+            if status[slot] == PARKED and last_used[slot] < cutoff:
+                stale.append(slot)
+        self._sweep_cursor = stop
+
+        for slot in stale:
+            self.close((self.generation[slot] << SLOT_BITS) | slot)
+        return len(stale)
+
+    def maintain(self, full=False):
+        """Periodic upkeep: expire old sessions, then park idle ones"""
+        now = time.monotonic()
+        expired = self.expire(now, len(self.status) if full else SWEEP_BATCH)
+        return expired, self.park_idle(now)
+
+    def memory_usage(self):
+        """Bytes held by the parked-session arrays"""
+        columns = (self.status, self.generation, self.last_used, self.boards, self.scores,
+                   self.moves, self.seeds, self.rng_states, self.sizes, self.started_at,
+                   self.free_slots)
+        return sum(c.buffer_info()[1] * c.itemsize for c in columns)
@@ -15,6 +15,11 @@ setup(
     entry_points={
         'console_scripts': [
             '2048-game=main:main',
+            '2048-selfplay=selfplay:main',
+            '2048-replay=replay:main',
+            '2048-server=server:main',
+            '2048-trajectories=trajectories:main',
+            '2048-tablebase=tablebase:main',
         ],
     },
     classifiers=[
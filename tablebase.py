@@ -0,0 +1,478 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+import bitboard
+import nboard
+
+# Exact win probabilities for small boards.
+#
+# A tablebase holds, for every position reachable on a size x size board
+# before a 2 ** target tile appears, the probability of reaching that tile
+# with best play. Positions are equivalent under the board's eight
+# symmetries and the tables store one canonical board per class, the
+# smallest packed int of the eight.
+#
+# A move keeps the tile sum and the spawn adds 2 or 4 to it, so every
+# position's successors have a bigger sum. The generator enumerates the
+# reachable positions forward one sum at a time, then computes values
+# backwards from the biggest sum down (retrograde), each layer needing only
+# the two above it. Both passes split each layer into chunks for a process
+# pool; finished layers are written as .npy files and read back through
+# memory maps, so workers share them without copying.
+#
+# The result is a directory like a trajectory dataset:
+#   index.json   format, size, target exponent, number of positions
+#   keys.npy     uint64, the canonical boards in ascending order
+#   values.npy   float64, the win probability of each
+# Tablebase opens both with np.load(mmap_mode='r') and finds a board with
+# a binary search, O(log n) pages touched and nothing loaded up front. The
+# first steps of every search read the same few pages, so the pages a game
+# needs are mostly the ones holding its own positions.
+#
+# 4x4 is out of reach of this enumeration (billions of positions even for
+# small targets); sizes 2 and 3 build in seconds to minutes. That is also
+# why the 4x4 game, ai.ExpectimaxAI and the 4x4 hints never consult one. A
+# table over part of a 4x4 board (a row, a corner region) would not be
+# exact: moves slide and merge tiles across the region's edge and spawns
+# land outside it, so its values would be one more heuristic rather than
+# win probabilities, and heuristic.py already scores rows.
+
+FORMAT = '2048-tablebase'
+VERSION = 1
+INDEX_FILE = 'index.json'
+KEYS_FILE = 'keys.npy'
+VALUES_FILE = 'values.npy'
+MAX_SIZE = 4  # Boards must pack into 64 bits
+MAX_BUILD_SIZE = 3  # Bigger boards have far too many positions to enumerate
+CHUNK = 1 << 16  # Positions per pool task
+SPAWN_2 = 0.9
+SPAWN_4 = 0.1
+
+_U = np.uint64
+
+
+class TablebaseError(Exception):
+    pass
+
+
+class _Tables:
+    """Row tables of one board size, for NumPy arrays of packed boards"""
+
+    def __init__(self, size):
+        if not nboard.MIN_SIZE <= size <= MAX_SIZE:
+            raise TablebaseError(f"Tablebases cover sizes {nboard.MIN_SIZE}-{MAX_SIZE}, not {size}")
+        engine = nboard.get_engine(size)
+        self.size = size
+        self.cells = size * size
+        self.row_bits = 4 * size
+        rows = range(1 << self.row_bits)
+        left = [engine.move(row, bitboard.LEFT) for row in rows]
+        right = [engine.move(row, bitboard.RIGHT) for row in rows]
+        self.left = np.array([new for new, _ in left], dtype=np.uint64)
+        self.right = np.array([new for new, _ in right], dtype=np.uint64)
+        # A row's cells placed one row apart, as column 0
+        self.spread = np.array([engine.transpose(row) for row in rows], dtype=np.uint64)
+        self.reverse = np.array([self._reverse(row) for row in rows], dtype=np.uint64)
+        self.row_mask = _U((1 << self.row_bits) - 1)
+        self.engine = engine
+        self._reverse_rows = self.reverse.tolist()
+
+    def _reverse(self, row):
+        cells = [(row >> (4 * k)) & 0xF for k in range(self.size)]
+        return sum(e << (4 * k) for k, e in enumerate(reversed(cells)))
+
+    def _rows(self, boards):
+        return [((boards >> _U(self.row_bits * r)) & self.row_mask).astype(np.intp)
+                for r in range(self.size)]
+
+    def _map_rows(self, boards, table):
+        result = np.zeros_like(boards)
+        for r, row in enumerate(self._rows(boards)):
+            result |= table[row] << _U(self.row_bits * r)
+        return result
+
+    def transpose(self, boards):
+        result = np.zeros_like(boards)
+        for r, row in enumerate(self._rows(boards)):
+            result |= self.spread[row] << _U(4 * r)
+        return result
+
+    def mirror(self, boards):
+        """Reverse every row"""
+        return self._map_rows(boards, self.reverse)
+
+    def flip(self, boards):
+        """Reverse the order of the rows"""
+        result = np.zeros_like(boards)
+        for r, row in enumerate(self._rows(boards)):
+            result |= row.astype(np.uint64) << _U(self.row_bits * (self.size - 1 - r))
+        return result
+
+    def move(self, boards, direction):
+        if direction == bitboard.LEFT:
+            return self._map_rows(boards, self.left)
+        if direction == bitboard.RIGHT:
+            return self._map_rows(boards, self.right)
+        table = self.left if direction == bitboard.UP else self.right
+        return self.transpose(self._map_rows(self.transpose(boards), table))
+
+    def canonical(self, boards):
+        """The smallest of the eight symmetric images of every board"""
+        best = boards.copy()
+        for image in (boards, self.transpose(boards)):
+            mirrored = self.mirror(image)
+            for candidate in (image, mirrored, self.flip(image), self.flip(mirrored)):
+                np.minimum(best, candidate, out=best)
+        return best
+
+    def canonical_board(self, board):
+        """canonical() of one packed int, without NumPy's per-call overhead"""
+        row_bits = self.row_bits
+        mask = (1 << row_bits) - 1
+        reverse = self._reverse_rows
+        best = board
+        for image in (board, self.engine.transpose(board)):
+            rows = [(image >> (row_bits * r)) & mask for r in range(self.size)]
+            mirrored = [reverse[row] for row in rows]
+            for candidate in (rows, mirrored, rows[::-1], mirrored[::-1]):
+                packed = 0
+                for r, row in enumerate(candidate):
+                    packed |= row << (row_bits * r)
+                if packed < best:
+                    best = packed
+        return best
+
+    def max_exponent(self, boards):
+        result = np.zeros(boards.shape, dtype=np.uint64)
+        for k in range(self.cells):
+            np.maximum(result, (boards >> _U(4 * k)) & _U(0xF), out=result)
+        return result
+
+    def tile_sum(self, boards):
+        result = np.zeros(boards.shape, dtype=np.int64)
+        for k in range(self.cells):
+            exponent = ((boards >> _U(4 * k)) & _U(0xF)).astype(np.int64)
+            result += np.where(exponent > 0, np.left_shift(1, exponent), 0)
+        return result
+
+    def empty(self, boards, k):
+        return ((boards >> _U(4 * k)) & _U(0xF)) == 0
+
+
+_tables = {}
+
+
+def _get_tables(size):
+    tables = _tables.get(size)
+    if tables is None:
+        tables = _tables[size] = _Tables(size)
+    return tables
+
+
+def start_positions(size):
+    """Every board a new game can start from: two tiles on an empty board"""
+    tables = _get_tables(size)
+    boards = []
+    for a in range(tables.cells):
+        for b in range(a + 1, tables.cells):
+            for ea in (1, 2):
+                for eb in (1, 2):
+                    boards.append((ea << (4 * a)) | (eb << (4 * b)))
+    return np.unique(tables.canonical(np.array(boards, dtype=np.uint64)))
+
+
+def _children(tables, boards, target):
+    """Positions after every move and spawn, by spawned exponent; wins left out"""
+    found = {1: [], 2: []}
+    for direction in bitboard.DIRECTIONS:
+        after = tables.move(boards, direction)
+        after = after[(after != boards) & (tables.max_exponent(after) < target)]
+        for k in range(tables.cells):
+            open_ = after[tables.empty(after, k)]
+            for exponent in (1, 2):
+                found[exponent].append(open_ | _U(exponent << (4 * k)))
+    return [np.unique(tables.canonical(np.concatenate(found[e]))) for e in (1, 2)]
+
+
+def _expand_task(task):
+    size, boards, target = task
+    return _children(_get_tables(size), boards, target)
+
+
+class _Layer:
+    """Sorted keys and values of one finished layer, memory-mapped"""
+
+    def __init__(self, directory, total):
+        self.keys = np.load(os.path.join(directory, f'{total}.keys.npy'), mmap_mode='r')
+        self.values = np.load(os.path.join(directory, f'{total}.values.npy'), mmap_mode='r')
+
+    def lookup(self, boards):
+        index = np.searchsorted(self.keys, boards)
+        if len(self.keys) == 0 or not (self.keys[np.minimum(index, len(self.keys) - 1)] ==
+                                       boards).all():
+            raise TablebaseError("A successor position is missing from its layer")
+        return self.values[index]
+
+
+def _solve(tables, boards, target, layers):
+    """Win probabilities of boards, given the layers of their successors
+
+    layers maps a tile sum to its _Layer; every board here has the same sum.
+    """
+    total = int(tables.tile_sum(boards[:1])[0]) if len(boards) else 0
+    best = np.zeros(len(boards))
+    for direction in bitboard.DIRECTIONS:
+        after = tables.move(boards, direction)
+        legal = after != boards
+        value = np.zeros(len(boards))
+        won = legal & (tables.max_exponent(after) >= target)
+        value[won] = 1.0
+        playing = legal & ~won
+        after = after[playing]
+        expected = np.zeros(len(after))
+        open_count = np.zeros(len(after))
+        for k in range(tables.cells):
+            empty = tables.empty(after, k)
+            open_count += empty
+            for exponent, prob in ((1, SPAWN_2), (2, SPAWN_4)):
+                children = after[empty] | _U(exponent << (4 * k))
+                child_values = np.ones(len(children))
+                growing = tables.max_exponent(children) < target
+                if growing.any():
+                    child_values[growing] = layers[total + 2 * exponent].lookup(
+                        tables.canonical(children[growing]))
+                expected[empty] += prob * child_values
+        value[playing] = expected / open_count
+        np.maximum(best, value, out=best)
+    return best
+
+
+def _solve_task(task):
+    size, boards, target, directory, sums = task
+    layers = {total: _Layer(directory, total) for total in sums}
+    return _solve(_get_tables(size), boards, target, layers)
+
+
+def _chunks(boards):
+    return [boards[start:start + CHUNK] for start in range(0, len(boards), CHUNK)]
+
+
+def build(path, size=3, target=7, workers=None, log=None):
+    """Generate the tablebase of size x size boards for reaching 2 ** target
+
+    Returns the number of positions. workers defaults to every core; with
+    one worker everything runs in this process.
+    """
+    if not nboard.MIN_SIZE <= size <= MAX_BUILD_SIZE:
+        raise TablebaseError(
+            f"Tablebases can be built for sizes {nboard.MIN_SIZE}-{MAX_BUILD_SIZE}, not {size}")
+    if os.path.exists(os.path.join(path, INDEX_FILE)):
+        raise TablebaseError(f"{path} already holds a tablebase")
+    if not 3 <= target <= 15:
+        raise TablebaseError(f"The target exponent must be between 3 and 15, got {target}")
+    tables = _get_tables(size)
+    workers = workers or os.cpu_count() or 1
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    mapper = pool.imap if pool is not None else map
+    os.makedirs(path, exist_ok=True)
+    work = os.path.join(path, 'layers')
+    os.makedirs(work, exist_ok=True)
+    started = time.perf_counter()
+    try:
+        # Forward: the reachable positions of each tile sum
+        pending = {}
+        for board in start_positions(size):
+            pending.setdefault(int(tables.tile_sum(np.array([board], dtype=np.uint64))[0]),
+                               []).append(np.array([board], dtype=np.uint64))
+        sums = []
+        while pending:
+            total = min(pending)
+            boards = np.unique(np.concatenate(pending.pop(total)))
+            np.save(os.path.join(work, f'{total}.keys.npy'), boards)
+            sums.append(total)
+            tasks = [(size, chunk, target) for chunk in _chunks(boards)]
+            for twos, fours in mapper(_expand_task, tasks):
+                for gained, children in ((2, twos), (4, fours)):
+                    if len(children):
+                        pending.setdefault(total + gained, []).append(children)
+            if log is not None:
+                log(f"sum {total}: {len(boards)} positions")
+
+        # Backward: values from the biggest sum down
+        for total in reversed(sums):
+            boards = np.load(os.path.join(work, f'{total}.keys.npy'))
+            needed = [s for s in (total + 2, total + 4) if s in sums]
+            tasks = [(size, chunk, target, work, needed) for chunk in _chunks(boards)]
+            values = np.concatenate([np.zeros(0)] + list(mapper(_solve_task, tasks)))
+            np.save(os.path.join(work, f'{total}.values.npy'), values)
+
+        # Merge the layers into one sorted table
+        keys = np.concatenate([np.load(os.path.join(work, f'{s}.keys.npy')) for s in sums])
+        values = np.concatenate([np.load(os.path.join(work, f'{s}.values.npy')) for s in sums])
+        order = np.argsort(keys, kind='stable')
+        np.save(os.path.join(path, KEYS_FILE), keys[order])
+        np.save(os.path.join(path, VALUES_FILE), values[order])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    shutil.rmtree(work)
+
+    index = {
+        'format': FORMAT,
+        'version': VERSION,
+        'size': size,
+        'target': target,
+        'positions': len(keys),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    tmp_path = os.path.join(path, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(path, INDEX_FILE))
+    return len(keys)
+
+
+class Tablebase:
+    """Read-only view of a tablebase written by build()"""
+
+    def __init__(self, path):
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            raise TablebaseError(f"Cannot read the index of {path}: {e}")
+        if index.get('format') != FORMAT or index.get('version') != VERSION:
+            raise TablebaseError(f"{path} is not a version {VERSION} tablebase")
+        self.path = path
+        self.size = index['size']
+        self.target = index['target']
+        self.keys = np.load(os.path.join(path, KEYS_FILE), mmap_mode='r')
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode='r')
+        self.engine = nboard.get_engine(self.size)
+        self._tables = _get_tables(self.size)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _find(self, keys):
+        """Positions of canonical keys in the table, and which are there"""
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return index, self.keys[index] == keys
+
+    def lookup(self, boards):
+        """Win probabilities of an array of boards, None if any is not covered
+
+        Boards that already have the target tile count as won. All the
+        boards are found with one vectorised binary search.
+        """
+        boards = np.asarray(boards, dtype=np.uint64)
+        values = np.ones(len(boards))
+        playing = self._tables.max_exponent(boards) < self.target
+        keys = self._tables.canonical(boards[playing])
+        if len(keys):
+            index, found = self._find(keys)
+            if not found.all():
+                return None
+            values[playing] = self.values[index]
+        return values
+
+    def value(self, board):
+        """Win probability of board with the player to move, None if not covered"""
+        if self.engine.max_exponent(board) >= self.target:
+            return 1.0
+        key = self._tables.canonical_board(board)
+        i = int(np.searchsorted(self.keys, _U(key)))
+        if i < len(self.keys) and int(self.keys[i]) == key:
+            return float(self.values[i])
+        return None
+
+    def afterstate_value(self, afterstate):
+        """Win probability after a move, before the spawn; None if not covered"""
+        empty = self.engine.empty_cells(afterstate)
+        if not empty or self.engine.max_exponent(afterstate) >= self.target:
+            return self.value(afterstate)
+        children = [self.engine.set_exponent(afterstate, index, exponent)
+                    for index in empty for exponent in (1, 2)]
+        values = self.lookup(children)
+        if values is None:
+            return None
+        return float(values[0::2].sum() * SPAWN_2 + values[1::2].sum() * SPAWN_4) / len(empty)
+
+    def best_move(self, board):
+        """(direction, win probability) of the best move, None if not covered
+
+        Boards that already have the target tile are not covered; one with
+        no legal move gives (None, 0.0).
+        """
+        if self.engine.max_exponent(board) >= self.target:
+            return None
+        best = (None, 0.0)
+        for direction in bitboard.DIRECTIONS:
+            after, _ = self.engine.move(board, direction)
+            if after == board:
+                continue
+            value = self.afterstate_value(after)
+            if value is None:
+                return None
+            if best[0] is None or value > best[1]:
+                best = (direction, value)
+        return best
+
+    def start_value(self):
+        """Win probability of a new game, over every way it can start"""
+        cells = self.engine.cells
+        boards = []
+        weights = []
+        for first in range(cells):
+            for first_exponent, first_prob in ((1, SPAWN_2), (2, SPAWN_4)):
+                for second in range(cells):
+                    if second == first:
+                        continue
+                    for exponent, prob in ((1, SPAWN_2), (2, SPAWN_4)):
+                        board = self.engine.set_exponent(0, first, first_exponent)
+                        boards.append(self.engine.set_exponent(board, second, exponent))
+                        weights.append(first_prob * prob / (cells * (cells - 1)))
+        return float(np.dot(self.lookup(boards), weights))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect 2048 tablebases")
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('path', help="tablebase directory")
+    parser.add_argument('--size', type=int, default=3, help="board size (default: %(default)s)")
+    parser.add_argument('--target', type=int, default=7,
+                        help="exponent of the winning tile (default: %(default)s, i.e. 128)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'build':
+            start = time.perf_counter()
+            positions = build(args.path, args.size, args.target, args.workers,
+                              log=lambda line: print(line, file=sys.stderr))
+            print(f"{positions} positions in {time.perf_counter() - start:.1f}s")
+        else:
+            tablebase = Tablebase(args.path)
+            print(f"Board size: {tablebase.size}x{tablebase.size}")
+            print(f"Target tile: {1 << tablebase.target}")
+            print(f"Positions: {len(tablebase)}")
+            print(f"Win probability of a new game: {tablebase.start_value():.6f}")
+    except TablebaseError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import random
+
+import pytest
+
+from game_core import GameCore
+
+# Helpers shared by the test modules.
+
+
+def random_boards(size, count, seed=0):
+    """Boards from seeded random play, a new game's first; games that end restart"""
+    rng = random.Random(seed)
+    game = GameCore(seed, size)
+    boards = [game.board]
+    while len(boards) < count:
+        if game.is_game_over():
+            game.reset()
+        if game.step(rng.randrange(4))[0]:
+            boards.append(game.board)
+    return boards
+
+
+@pytest.fixture(scope='session')
+def play_boards():
+    """random_boards(size, count, seed=0)"""
+    return random_boards
+
+
+class _NullStore:
+    best_score = 0
+
+    def set_best_score(self, score):
+        pass
+
+    def record_game(self, *args):
+        pass
+
+
+@pytest.fixture
+def null_store():
+    """A score store for the pygame game that keeps nothing"""
+    return _NullStore()
+
+
+@pytest.fixture(scope='module')
+def pygame_main():
+    """(pygame, main) on SDL's dummy drivers; skips without pygame"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    pygame = pytest.importorskip('pygame')
+    import main
+    pygame.init()
+    yield pygame, main
+    pygame.quit()
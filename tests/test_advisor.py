@@ -0,0 +1,65 @@
+import time
+
+import bitboard
+from advisor import MoveAdvisor
+
+# The thread worker shares the generation counter with the UI side, so a
+# search still running for an old board may publish results after a newer
+# board was submitted; poll() must never hand those out.
+
+TIMEOUT = 30.0
+# Boards with disjoint legal moves (RIGHT/DOWN and LEFT/UP), so advice for
+# one can't pass for advice on the other
+BOTTOM_RIGHT_GAP = bitboard.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 0]])
+TOP_LEFT_GAP = bitboard.from_grid([[0, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+
+
+def _wait(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _final_advice(advisor, seen):
+    def final():
+        advice = advisor.poll()
+        if advice is not None:
+            seen.append(advice)
+        return advice is not None and advice[2]
+    _wait(final)
+    return seen[-1]
+
+
+def test_results_for_an_older_board_are_discarded():
+    with MoveAdvisor(max_depth=3, use_process=False) as advisor:
+        advisor.submit(BOTTOM_RIGHT_GAP)
+        # Let the first board's results queue up unread, then switch boards
+        _wait(lambda: not advisor._results.empty())
+        advisor.submit(TOP_LEFT_GAP)
+        seen = []
+        direction, depth, final = _final_advice(advisor, seen)
+        assert final and depth >= 1
+        assert {advice[0] for advice in seen} <= {bitboard.LEFT, bitboard.UP}
+        assert not advisor.searching
+
+
+def test_stale_generations_are_ignored_by_poll():
+    with MoveAdvisor(max_depth=2, use_process=False) as advisor:
+        advisor.submit(TOP_LEFT_GAP)
+        _final_advice(advisor, [])
+        stale = advisor._generation - 1
+        advisor._results.put((stale, 9, bitboard.RIGHT, True))
+        assert advisor.poll()[0] in (bitboard.LEFT, bitboard.UP)
+        advisor.cancel()
+        advisor._results.put((stale + 1, 9, bitboard.RIGHT, True))
+        assert advisor.poll() is None and not advisor.searching
+
+
+def test_resubmitting_the_same_board_keeps_the_search():
+    with MoveAdvisor(max_depth=2, use_process=False) as advisor:
+        advisor.submit(TOP_LEFT_GAP)
+        advisor.submit(TOP_LEFT_GAP)
+        assert advisor.searches == 1
+        assert _final_advice(advisor, [])[0] in (bitboard.LEFT, bitboard.UP)
+    assert advisor._worker is None
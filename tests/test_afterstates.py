@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import nboard
+from afterstates import AfterstateCache
+from game_core import GameCore
+
+BOARDS = 5000  # Positions checked per board size
+
+
+@pytest.mark.parametrize('size', [3, 4, 5])
+def test_entries_match_engine(size):
+    rng = random.Random(size)
+    engine = nboard.get_engine(size)
+    cache = AfterstateCache(engine, capacity=256)
+    game = GameCore(rng.getrandbits(32), size)
+    for _ in range(BOARDS):
+        if game.is_game_over():
+            game.reset()
+        board = game.board
+        after_boards, scores, legal = cache.get(board)
+        for direction in range(4):
+            expected, score = engine.move(board, direction)
+            assert (after_boards[direction], scores[direction]) == (expected, score), hex(board)
+            assert bool(legal >> direction & 1) == (expected != board), hex(board)
+        assert cache.is_game_over(board) == engine.is_game_over(board), hex(board)
+        assert len(cache) <= cache.capacity
+        game.step(rng.randrange(4))
+    assert cache.hits and cache.misses
+
+
+def test_least_recently_used_board_goes_first():
+    engine = nboard.get_engine(4)
+    cache = AfterstateCache(engine, capacity=3)
+    boards = [engine.from_grid([[2 << k, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4]) for k in range(4)]
+    for board in boards[:3]:
+        cache.get(board)
+    cache.get(boards[0])  # Now the most recently used
+    cache.get(boards[3])
+    assert boards[1] not in cache.entries
+    assert all(board in cache.entries for board in (boards[0], boards[2], boards[3]))
+
+
+@pytest.mark.parametrize('size', [4, 6])
+def test_cached_game_plays_like_plain_one(size):
+    plain = GameCore(size, size)
+    cached = GameCore(size, size, afterstates=AfterstateCache(nboard.get_engine(size), capacity=64))
+    rng = random.Random(size)
+    while not plain.is_game_over():
+        assert cached.legal_moves() == plain.legal_moves()
+        assert cached.hint() == plain.hint()
+        direction = rng.randrange(4)
+        assert cached.step(direction) == plain.step(direction)
+        assert (cached.board, cached.score) == (plain.board, plain.score)
+    assert cached.is_game_over()
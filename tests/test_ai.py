@@ -0,0 +1,47 @@
+import random
+
+import ai
+import bitboard
+from game_core import GameCore
+
+
+def _play(searcher, seed, moves):
+    """Play moves searched to depth 2, yields the table's keys after each search"""
+    game = GameCore(seed)
+    for _ in range(moves):
+        if game.is_game_over():
+            break
+        best = None
+        for _, best in searcher.deepen(game.board, max_depth=2):
+            pass
+        game.step(best)
+        yield set(searcher.table)
+
+
+def test_best_move_is_legal():
+    game = GameCore(3)
+    rng = random.Random(3)
+    for _ in range(30):
+        game.step(rng.randrange(4))
+    direction = ai.ExpectimaxAI().best_move(game.board, time_budget_ms=50)
+    assert bitboard.move(game.board, direction)[0] != game.board
+
+
+def test_table_stays_within_size():
+    searcher = ai.ExpectimaxAI(table_size=500)
+    for keys in _play(searcher, 1, 40):
+        assert len(keys) <= searcher.table_size
+
+
+def test_full_table_keeps_caching_new_positions():
+    searcher = ai.ExpectimaxAI(table_size=500)
+    filled = False
+    searches_after = 0
+    previous = set()
+    for keys in _play(searcher, 1, 80):
+        if filled:
+            assert keys - previous, "table stopped caching once it was full"
+            searches_after += 1
+        filled = filled or len(keys) >= searcher.table_size
+        previous = keys
+    assert searches_after > 10
@@ -0,0 +1,109 @@
+import pytest
+
+from atlas import TileAtlas
+from nboard import get_engine
+
+
+def _painter(log):
+    def paint(key, rect):
+        log.append((key, rect))
+    return paint
+
+
+def test_hits_return_the_painted_rect():
+    painted = []
+    atlas = TileAtlas(10, 20, capacity=6)
+    assert (atlas.columns, atlas.rows, atlas.width, atlas.height) == (3, 2, 30, 40)
+    first = atlas.get('a', _painter(painted))
+    second = atlas.get('b', _painter(painted))
+    assert first == atlas.slot_rect(0) == (0, 0, 10, 20)
+    assert second == (10, 0, 10, 20)
+    assert atlas.get('a', _painter(painted)) == first
+    assert painted == [('a', first), ('b', second)]
+    assert (atlas.hits, atlas.misses, atlas.evictions) == (1, 2, 0)
+
+
+def test_paint_can_cut_the_rect_down():
+    atlas = TileAtlas(10, 10, capacity=4)
+    rect = atlas.get('x', lambda key, rect: (7, 3))
+    assert rect == (0, 0, 7, 3)
+    assert atlas.get('x', None) == rect
+
+
+def test_least_recently_used_slot_is_reused():
+    painted = []
+    paint = _painter(painted)
+    atlas = TileAtlas(8, 8, capacity=3)
+    rects = {key: atlas.get(key, paint) for key in 'abc'}
+    atlas.get('a', paint)  # b is now the least recently used
+    assert atlas.get('d', paint) == rects['b']
+    assert 'b' not in atlas and len(atlas) == 3
+    assert atlas.evictions == 1
+    atlas.get('b', paint)  # Takes c's slot
+    assert atlas.get('b', paint) == rects['c']
+    assert [key for key, _ in painted] == ['a', 'b', 'c', 'd', 'b']
+
+
+def test_clear_frees_every_slot():
+    paint = _painter([])
+    atlas = TileAtlas(8, 8, capacity=2)
+    atlas.get('a', paint)
+    atlas.get('b', paint)
+    atlas.clear()
+    assert len(atlas) == 0
+    assert atlas.get('c', paint) == atlas.slot_rect(0)
+    assert atlas.evictions == 0
+
+
+def _big_tile_boards(size, count):
+    """Boards with a big tile in every cell, up to the largest the engine packs"""
+    engine = get_engine(size)
+    boards = []
+    for offset in range(count):
+        grid = [[1 << (1 + (offset + i * size + j) % min(engine.cell_mask, 30))
+                 for j in range(size)] for i in range(size)]
+        boards.append(engine.from_grid(grid))
+    return boards
+
+
+def _draw_directly(pygame, main, game, screen):
+    """The grid as Game2048.draw painted it before the atlas"""
+    cell_size = game.cell_size
+    grid = game.grid
+    for i in range(game.size):
+        for j in range(game.size):
+            x, y = game.cell_pos(i, j)
+            value = grid[i][j]
+            pygame.draw.rect(screen, main.COLORS.get(value, main.COLORS[8192]),
+                             (x, y, cell_size, cell_size), border_radius=3)
+            if value != 0:
+                text_color = main.COLORS['text_light'] if value > 4 else main.COLORS['text_dark']
+                font_size = main.tile_font_size(value, cell_size)
+                font = game.tile_fonts.get(font_size)
+                if font is None:
+                    font = game.tile_fonts[font_size] = pygame.font.Font(None, font_size)
+                text = font.render(str(value), True, text_color)
+                screen.blit(text, text.get_rect(center=(x + cell_size // 2, y + cell_size // 2)))
+
+
+@pytest.mark.parametrize('size', [4, 8, 16])
+@pytest.mark.parametrize('capacity', [None, 4])
+def test_atlas_frames_match_direct_drawing(pygame_main, play_boards, null_store, size, capacity):
+    pygame, main = pygame_main
+    game = main.Game2048(seed=0, store=null_store, size=size)
+    game.tiles = main.TileSprites(game.cell_size, game.tile_fonts, capacity or main.ATLAS_SLOTS)
+    screen = pygame.Surface((game.window_width, game.window_height))
+    for board in play_boards(size, 40) + _big_tile_boards(size, 4):
+        game.board = board
+        expected = pygame.Surface(screen.get_size())
+        expected.fill(main.COLORS['background'])
+        _draw_directly(pygame, main, game, expected)
+        screen.fill(main.COLORS['background'])
+        grid = game.grid
+        for i in range(size):
+            for j in range(size):
+                game.tiles.blit(screen, grid[i][j], game.cell_pos(i, j))
+        assert pygame.image.tostring(screen, 'RGB') == pygame.image.tostring(expected, 'RGB'), \
+            hex(board)
+    if capacity is not None:
+        assert game.tiles.atlas.evictions > 0
@@ -0,0 +1,89 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import batch  # noqa: E402
+import bitboard  # noqa: E402
+from rng import BulkRandom  # noqa: E402
+
+# The NumPy batch against the scalar bitboard it copies, on boards from
+# seeded random play.
+
+BOARDS = 2000  # Boards per batch
+SEED = 5
+
+
+@pytest.fixture(scope='module')
+def boards(play_boards):
+    return play_boards(bitboard.SIZE, BOARDS, SEED)
+
+
+def test_moves_and_scores_match_bitboard(boards):
+    packed = np.array(boards, dtype=np.uint64)
+    all_boards, all_scores = batch.move_all(packed)
+    for direction in bitboard.DIRECTIONS:
+        moved, scores = batch.move(packed, direction)
+        expected = [bitboard.move(board, direction) for board in boards]
+        assert [int(b) for b in moved] == [b for b, _ in expected]
+        assert scores.tolist() == [s for _, s in expected]
+        assert (all_boards[direction] == moved).all()
+        assert (all_scores[direction] == scores).all()
+
+
+def test_grids_and_empty_cells_match_bitboard(boards):
+    packed = np.array(boards, dtype=np.uint64)
+    assert [int(b) for b in batch.transpose(packed)] == [bitboard.transpose(b) for b in boards]
+    grids = batch.to_grids(packed)
+    assert grids.tolist() == [bitboard.to_grid(board) for board in boards]
+    assert (batch.from_grids(grids) == packed).all()
+    empty = batch.empty_cells(packed)
+    assert [np.flatnonzero(row).tolist() for row in empty] == \
+        [bitboard.empty_cells(board) for board in boards]
+
+
+def test_spawn_fills_one_empty_cell_per_masked_board(boards):
+    packed = np.array(boards, dtype=np.uint64)
+    counts = batch.empty_cells(packed).sum(axis=1)
+    mask = np.arange(len(boards)) % 3 != 0
+    spawned = batch.spawn(packed, BulkRandom(SEED), mask)
+    after = batch.empty_cells(spawned).sum(axis=1)
+    fills = mask & (counts > 0)
+    assert (after == counts - fills).all()
+    assert (spawned[~fills] == packed[~fills]).all()
+    # The new tile lands on a cell that was empty and is a 2 or a 4
+    new_tiles = batch.to_grids(spawned).reshape(len(boards), -1) - \
+        batch.to_grids(packed).reshape(len(boards), -1)
+    assert ((new_tiles != 0).sum(axis=1) == fills).all()
+    assert set(np.unique(new_tiles)) <= {0, 2, 4}
+
+
+def test_game_over_matches_bitboard(boards):
+    full = [0x1234432112344321, 0x1212212112122121, 0x1234432112344322]
+    packed = np.array(boards + full, dtype=np.uint64)
+    assert batch.is_game_over(packed).tolist() == \
+        [bitboard.is_game_over(board) for board in boards + full]
+    assert batch.is_game_over(packed[-3:]).tolist() == [True, True, False]
+
+
+def test_batch_game_plays_to_the_end():
+    games = batch.BatchGame(64, seed=SEED)
+    assert (batch.empty_cells(games.boards).sum(axis=1) == 14).all()
+    rng = np.random.default_rng(SEED)
+    total = np.zeros(len(games), dtype=np.int64)
+    while not games.done.all():
+        before = games.boards.copy()
+        done_before = games.done.copy()
+        actions = rng.integers(0, 4, len(games))
+        gained, moved, done = games.step(actions)
+        total += gained
+        assert not moved[done_before].any()
+        assert (games.boards[~moved] == before[~moved]).all()
+        # A board that moved is the scalar move plus one spawned tile
+        for i in np.flatnonzero(moved):
+            board, score = bitboard.move(int(before[i]), int(actions[i]))
+            assert gained[i] == score
+            assert bitboard.count_empty(int(games.boards[i])) == bitboard.count_empty(board) - 1
+            assert int(games.boards[i]) & board == board
+        assert (done == (batch.is_game_over(games.boards) | done_before)).all()
+    assert (games.scores == total).all()
+    assert [bitboard.is_game_over(int(board)) for board in games.boards] == [True] * len(games)
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import bitboard
+import nboard
+
+# The packed engines against the list-grid moves they replaced: slide the
+# tiles of each row towards the move, merge equal neighbours once, and
+# score the merged tiles.
+
+BOARDS = 3000  # Random boards per size
+
+
+def _slide_left(row):
+    """(row, score) after moving one list row left, as the old grid code did"""
+    tiles = [value for value in row if value]
+    merged = []
+    score = 0
+    j = 0
+    while j < len(tiles):
+        if j + 1 < len(tiles) and tiles[j] == tiles[j + 1]:
+            merged.append(tiles[j] * 2)
+            score += tiles[j] * 2
+            j += 2
+        else:
+            merged.append(tiles[j])
+            j += 1
+    return merged + [0] * (len(row) - len(merged)), score
+
+
+def _reference_move(grid, direction):
+    """(grid, score) of a move on a list grid"""
+    if direction in (bitboard.UP, bitboard.DOWN):
+        grid = [list(column) for column in zip(*grid)]
+    if direction in (bitboard.RIGHT, bitboard.DOWN):
+        grid = [row[::-1] for row in grid]
+    rows = [_slide_left(row) for row in grid]
+    grid = [row for row, _ in rows]
+    if direction in (bitboard.RIGHT, bitboard.DOWN):
+        grid = [row[::-1] for row in grid]
+    if direction in (bitboard.UP, bitboard.DOWN):
+        grid = [list(column) for column in zip(*grid)]
+    return grid, sum(score for _, score in rows)
+
+
+def _random_grid(rng, size, max_exponent):
+    # Few distinct values and plenty of gaps, so merges and chains are common
+    top = rng.randint(2, max_exponent)
+    return [[0 if rng.random() < 0.3 else 1 << rng.randint(1, top) for _ in range(size)]
+            for _ in range(size)]
+
+
+def test_bitboard_moves_match_list_grid():
+    rng = random.Random(1)
+    for _ in range(BOARDS):
+        grid = _random_grid(rng, bitboard.SIZE, bitboard.MAX_EXPONENT - 1)
+        board = bitboard.from_grid(grid)
+        assert bitboard.to_grid(board) == grid
+        for direction in bitboard.DIRECTIONS:
+            expected, score = _reference_move(grid, direction)
+            moved, gained = bitboard.move(board, direction)
+            assert (bitboard.to_grid(moved), gained) == (expected, score), (grid, direction)
+            assert (moved != board) == (expected != grid)
+
+
+@pytest.mark.parametrize('size', [2, 3, 5, 6, 8])
+def test_engine_moves_match_list_grid(size):
+    engine = nboard.get_engine(size)
+    rng = random.Random(size)
+    for _ in range(BOARDS // 3):
+        grid = _random_grid(rng, size, min(engine.max_exponent_value - 1, 20))
+        board = engine.from_grid(grid)
+        for direction in bitboard.DIRECTIONS:
+            expected, score = _reference_move(grid, direction)
+            moved, gained = engine.move(board, direction)
+            assert (engine.to_grid(moved), gained) == (expected, score), (grid, direction)
+
+
+def test_rows_merge_once_and_from_the_front():
+    for row, expected in (([2, 2, 2, 2], ([4, 4, 0, 0], 8)),
+                          ([2, 2, 4, 0], ([4, 4, 0, 0], 4)),
+                          ([4, 0, 4, 8], ([8, 8, 0, 0], 8)),
+                          ([2, 4, 8, 16], ([2, 4, 8, 16], 0))):
+        grid = [row, [0] * 4, [0] * 4, [0] * 4]
+        moved, score = bitboard.move(bitboard.from_grid(grid), bitboard.LEFT)
+        assert (bitboard.to_grid(moved)[0], score) == expected
+
+
+def test_largest_tiles_do_not_merge():
+    top = 1 << bitboard.MAX_EXPONENT
+    board = bitboard.from_grid([[top, top, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+    assert bitboard.move(board, bitboard.LEFT) == (board, 0)
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+import nboard
+from game_core import GameCore
+
+# GameCore keeps an empty-cell mask, the max tile and a cached game-over
+# flag up to date as it moves and spawns. These tests play seeded random
+# games and check every status query, and every spawn, against a
+# from-scratch recomputation on the engine, including boards assigned from
+# outside.
+
+GAMES = 150  # Seeded games per board size
+
+
+class _Reference:
+    """The spawn before the bookkeeping: rng.choice over a fresh list of empty cells"""
+
+    def __init__(self, seed, size):
+        self.rng = random.Random(seed)
+        self.engine = nboard.get_engine(size)
+
+    def spawn(self, board):
+        cells = self.engine.empty_cells(board)
+        if not cells:
+            return board, None
+        index = self.rng.choice(cells)
+        exponent = 1 if self.rng.random() < 0.9 else 2
+        return self.engine.set_exponent(board, index, exponent), (index, exponent)
+
+
+def _check(game):
+    engine = game.engine
+    board = game.board
+    assert game.is_game_over() == engine.is_game_over(board), hex(board)
+    assert game.has_won() == engine.has_won(board), hex(board)
+    exponent = engine.max_exponent(board)
+    assert game.max_tile() == (1 << exponent if exponent else 0), hex(board)
+
+
+@pytest.mark.parametrize('size', [3, 4, 5])
+def test_bookkeeping_matches_recomputation(size):
+    rng = random.Random(size)
+    engine = nboard.get_engine(size)
+    assigned = 0
+    for _ in range(GAMES):
+        game_seed = rng.getrandbits(32)
+        game = GameCore(game_seed, size)
+        reference = _Reference(game_seed, size)
+        board, _ = reference.spawn(0)
+        board, _ = reference.spawn(board)
+        assert game.board == board
+        _check(game)
+        while not game.is_game_over():
+            direction = rng.randrange(4)
+            moved, gained = game.move(direction)
+            expected, expected_gain = engine.move(board, direction)
+            assert (moved, gained) == (expected != board, expected_gain if expected != board else 0)
+            if moved:
+                board = expected
+                _check(game)
+                spawn = game.add_random_tile()
+                board, expected_spawn = reference.spawn(board)
+                assert (game.board, spawn) == (board, expected_spawn)
+            _check(game)
+
+            # Boards set from outside must be picked up by the next query
+            if rng.random() < 0.01:
+                board = 0
+                for i in range(engine.cells):
+                    if rng.random() < 0.8:
+                        board = engine.set_exponent(board, i, rng.randint(1, 11))
+                game.board = board
+                _check(game)
+                assigned += 1
+    assert assigned > 10
+
+
+def test_step_counts_moves_and_spawns():
+    game = GameCore(9)
+    rng = random.Random(9)
+    while not game.is_game_over():
+        before = game.moves
+        moved, _ = game.step(rng.randrange(4))
+        assert game.moves == before + moved
+    assert game.moves > 0
+
+
+def test_restore_resumes_bookkeeping():
+    game = GameCore(4)
+    rng = random.Random(4)
+    for _ in range(50):
+        game.step(rng.randrange(4))
+    copy_rng = random.Random()
+    copy_rng.setstate(game.rng.getstate())
+    copy = GameCore.restore(game.board, game.score, game.moves, game.seed, copy_rng)
+    _check(copy)
+    for _ in range(50):
+        direction = rng.randrange(4)
+        assert copy.step(direction) == game.step(direction)
+        assert copy.board == game.board
+        _check(copy)
+
+
+def test_grid_is_a_copy_and_set_tile_writes_through():
+    game = GameCore(2)
+    game.grid = [[0] * 4 for _ in range(4)]
+    game.grid[1][2] = 8
+    assert game.grid[1][2] == 0
+    game.set_tile(1, 2, 8)
+    game.set_tile(3, 0, 2)
+    assert game.grid[1][2] == 8 and game.grid[3][0] == 2
+    assert game.max_tile() == 8
+    _check(game)
+    game.set_tile(1, 2, 0)
+    assert game.grid[1][2] == 0 and game.max_tile() == 2
@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+# kivy_main.GlyphAtlas against the labels it replaces: every region, drawn
+# into an Fbo, must give the same pixels as the number's own label texture,
+# including after slots were evicted and reused. Kivy opens a window and a
+# GL context on import, so the check runs in a child process and is
+# skipped where kivy is missing or no context can be made.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY = 'GL context ready'
+
+CHECK = '''
+from kivy.core.window import Window  # noqa: F401
+print(%r, flush=True)
+from kivy.graphics import Color, Fbo, Rectangle
+import kivy_main
+
+def draw(texture):
+    fbo = Fbo(size=(texture.width, texture.height))
+    with fbo:
+        Color(1, 1, 1, 1)
+        Rectangle(texture=texture, size=texture.size)
+    fbo.draw()
+    return fbo.pixels
+
+glyphs = kivy_main.GlyphAtlas(capacity=8)
+checked = 0
+values = [1 << e for e in range(1, 36)]
+for board_size in (4, 8):
+    for value in values + values[:10]:
+        font_size = kivy_main.tile_font_size(value, board_size)
+        label = glyphs._render(value, font_size)
+        region = glyphs.region(value, board_size)
+        assert region.size == label.size, (value, region.size, label.size)
+        assert draw(region) == draw(label), (value, board_size)
+        checked += 1
+assert glyphs.evictions > 0
+print('checked', checked, flush=True)
+''' % READY
+
+
+def test_glyph_regions_match_their_labels(tmp_path):
+    if importlib.util.find_spec('kivy') is None:
+        pytest.skip("kivy is not installed")
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1', KIVY_HOME=str(tmp_path),
+               PYTHONPATH=ROOT)
+    # The pygame tests switch SDL to its dummy drivers; kivy needs a real one
+    for name in ('SDL_VIDEODRIVER', 'SDL_AUDIODRIVER'):
+        if env.get(name) == 'dummy':
+            del env[name]
+    out = subprocess.run([sys.executable, '-c', CHECK], cwd=str(tmp_path), env=env,
+                         capture_output=True, text=True, timeout=120)
+    lines = out.stdout.splitlines()
+    if READY not in lines:
+        pytest.skip("kivy could not create a GL context: " + out.stderr.strip()[-200:])
+    # kivy may exit non-zero at shutdown after the check has finished
+    assert lines[-1] == 'checked 90', out.stderr[-2000:]
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import bitboard
+import heuristic
+
+# The feature tables are cached on disk; a cache file that is short, too
+# long or unreadable must be rebuilt rather than trusted, and changing the
+# weights must rebuild the weighted table.
+
+BOARDS = [0, 0x1234432112344321, 0x0000000100020011, 0xFEDCBA9876543210]
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('GAME2048_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _cache_file(cache_dir):
+    files = [name for name in os.listdir(cache_dir) if name.startswith('heuristic-')]
+    assert len(files) == 1
+    return cache_dir / files[0]
+
+
+def _expected():
+    return heuristic._build_features(heuristic.MONOTONICITY_POWER, heuristic.SUM_POWER)
+
+
+def test_cache_is_written_then_read_back(cache_dir):
+    assert heuristic.load_features() == _expected()
+    path = _cache_file(cache_dir)
+    assert path.stat().st_size == 8 * len(heuristic.FEATURES) * 65536
+    assert heuristic.load_features() == _expected()
+
+
+@pytest.mark.parametrize('damage', ['truncated', 'trailing', 'directory'])
+def test_damaged_cache_is_rebuilt(cache_dir, damage):
+    heuristic.load_features()
+    path = _cache_file(cache_dir)
+    data = path.read_bytes()
+    if damage == 'truncated':
+        path.write_bytes(data[:len(data) // 2])
+    elif damage == 'trailing':
+        path.write_bytes(data + bytes(8 * 65536))
+    else:
+        path.unlink()
+        path.mkdir()
+    assert heuristic.load_features() == _expected()
+    if damage != 'directory':
+        assert path.read_bytes() == data
+
+
+def test_cache_is_keyed_on_the_powers(cache_dir):
+    heuristic.load_features()
+    features = heuristic.load_features(monotonicity_power=2.0, sum_power=2.0)
+    assert features == heuristic._build_features(2.0, 2.0)
+    assert features != _expected()
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_set_weights_rebuilds_the_table():
+    h = heuristic.Heuristic(use_cache=False)
+    before = [h.evaluate(board) for board in BOARDS]
+    features = h._features
+    h.set_weights(empty=0.0, merges=0.0, monotonicity=0.0, sum=0.0)
+    assert h._features is features
+    assert [h.evaluate(board) for board in BOARDS] == [8 * h.weights['lost_penalty']] * len(BOARDS)
+    h.set_weights(**heuristic.DEFAULT_WEIGHTS)
+    assert [h.evaluate(board) for board in BOARDS] == before
+    assert before[0] == heuristic.Heuristic(use_cache=False).evaluate(0)
+    with pytest.raises(ValueError):
+        h.set_weights(corners=1.0)
+
+
+def test_evaluate_matches_the_transposed_board():
+    h = heuristic.Heuristic(use_cache=False)
+    for board in BOARDS:
+        assert h.evaluate(board) == pytest.approx(h.evaluate(bitboard.transpose(board)))
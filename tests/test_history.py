@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from game_core import GameCore
+from history import History
+from replay import ReplayRecorder
+from rng import SplitMix64
+
+GAMES = 60  # Seeded games per RNG class
+DEPTH = 50  # Undo levels kept
+
+
+def _state(game):
+    return game.board, game.score, game.moves, game.rng.getstate()
+
+
+@pytest.mark.parametrize('rng_class', [random.Random, SplitMix64])
+def test_random_undo_redo(rng_class):
+    """Every restored state, RNG included, is the game as it was"""
+    rng = random.Random(rng_class.__name__)
+    turns = 0
+    for _ in range(GAMES):
+        game = GameCore(rng.getrandbits(32), rng_class=rng_class)
+        recorder = ReplayRecorder(game)
+        history = History(game, DEPTH)
+        states = [_state(game)]  # Every state back to the start
+        position = 0
+        oldest = 0  # First state still in the ring
+        while not game.is_game_over():
+            action = rng.random()
+            if action < 0.15:
+                undone = history.undo()
+                assert undone == (position > oldest)
+                if undone:
+                    position -= 1
+            elif action < 0.25:
+                redone = history.redo()
+                assert redone == (position < len(states) - 1)
+                if redone:
+                    position += 1
+            else:
+                if game.step(rng.randrange(4))[0]:
+                    del states[position + 1:]
+                    states.append(_state(game))
+                    position += 1
+                    oldest = max(oldest, position - DEPTH)
+                    turns += 1
+            assert _state(game) == states[position]
+            assert history.undo_levels == position - oldest
+            assert history.redo_levels == len(states) - 1 - position
+            if rng.random() < 0.02:
+                back = rng.randrange(history.undo_levels + 1)
+                assert _state(history.fork(back)) == states[position - back]
+        recorder.save()
+        assert len(recorder.replay) == game.moves
+        # Replays always play back with the default RNG
+        if rng_class is random.Random:
+            recorder.replay.verify()
+    assert turns > GAMES * 50
+
+
+def test_reset_clears_history():
+    game = GameCore(2)
+    history = History(game, 10)
+    rng = random.Random(2)
+    for _ in range(20):
+        game.step(rng.randrange(4))
+    assert history.undo_levels == 10
+    game.reset()
+    assert history.undo_levels == history.redo_levels == 0
+    assert not history.undo()
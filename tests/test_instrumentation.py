@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+import pytest
+
+from instrumentation import FRAME, HISTOGRAM_BUCKETS, NullProfiler, Profiler, instrument
+
+# The profiler's ring buffer, frame histogram and trace export, fed with
+# events at chosen times instead of timing real work.
+
+CAPACITY = 8
+
+
+def _fill(profiler, count, start=0.0):
+    for k in range(count):
+        profiler.record('phase%d' % (k % 3), start + k, k / 1000)
+
+
+def test_events_before_the_buffer_fills():
+    profiler = Profiler(CAPACITY)
+    _fill(profiler, 5)
+    assert profiler.events() == [('phase%d' % (k % 3), float(k), k / 1000) for k in range(5)]
+
+
+@pytest.mark.parametrize('count', [CAPACITY, CAPACITY + 1, 3 * CAPACITY + 5])
+def test_events_wrap_around_oldest_first(count):
+    profiler = Profiler(CAPACITY)
+    _fill(profiler, count)
+    assert profiler.total == count
+    kept = range(max(0, count - CAPACITY), count)
+    assert profiler.events() == [('phase%d' % (k % 3), float(k), k / 1000) for k in kept]
+
+
+def test_recent_stops_at_the_window_across_the_wrap():
+    profiler = Profiler(CAPACITY)
+    now = time.perf_counter()
+    # Twelve events a second apart, the newest starting now
+    _fill(profiler, 12, start=now - 11)
+    recent = profiler.recent(4.5)
+    assert [start for _, start, _ in recent] == [now - 11 + k for k in range(7, 12)]
+    assert profiler.recent(100.0) == profiler.events()
+    assert Profiler(CAPACITY).recent() == []
+
+
+def test_histogram_bucket_edges():
+    profiler = Profiler(64)
+    durations_ms = [0.0, 0.999]
+    for bound in HISTOGRAM_BUCKETS:
+        durations_ms += [bound - 0.001, bound]
+    durations_ms.append(10000.0)
+    for ms in durations_ms:
+        profiler.record(FRAME, 0.0, ms / 1000)
+    profiler.record('render', 0.0, 0.5)  # Only frames are counted
+    # A frame exactly on a bound goes to the next bucket up
+    assert profiler.frame_histogram() == [3, 2, 2, 2, 2, 2, 2, 2]
+    assert sum(profiler.frame_histogram()) == len(durations_ms)
+    assert profiler.frame_histogram([]) == [0] * (len(HISTOGRAM_BUCKETS) + 1)
+
+
+def test_phase_stats():
+    profiler = Profiler(CAPACITY)
+    for duration in (0.001, 0.003):
+        profiler.record('ai', 0.0, duration)
+    profiler.record('render', 0.0, 0.002)
+    stats = profiler.phase_stats()
+    assert stats.keys() == {'ai', 'render'}
+    assert stats['ai'][0] == 2
+    assert stats['ai'][1:] == pytest.approx((2.0, 3.0))
+    assert stats['render'] == (1, pytest.approx(2.0), pytest.approx(2.0))
+
+
+def test_chrome_trace(tmp_path):
+    profiler = Profiler(CAPACITY)
+    origin = profiler.origin
+    profiler.record('render', origin + 0.5, 0.25)
+    with profiler.phase('ai'):
+        pass
+    profiler.begin_frame()
+    profiler.end_frame()
+    profiler.end_frame()  # Unmatched, records nothing
+
+    trace = profiler.chrome_trace()
+    events = trace['traceEvents']
+    assert trace['displayTimeUnit'] == 'ms'
+    assert [event['name'] for event in events] == ['render', 'ai', FRAME]
+    assert events[0] == {'name': 'render', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                         'ts': 500000.0, 'dur': 250000.0}
+    assert all(event['ts'] >= 0 and event['dur'] >= 0 for event in events)
+
+    path = profiler.dump_chrome_trace(str(tmp_path / 'trace.json'))
+    with open(path) as f:
+        assert json.load(f) == trace
+
+
+def test_instrument_wraps_only_an_enabled_profiler():
+    class Target:
+        def work(self, x, scale=1):
+            return x * scale
+
+    profiler = Profiler(CAPACITY)
+    target = Target()
+    instrument(target, profiler, ['work'])
+    assert target.work(3, scale=2) == 6
+    assert [name for name, _, _ in profiler.events()] == ['work']
+    assert 'work' not in vars(Target())
+
+    null_target = Target()
+    instrument(null_target, NullProfiler(), ['work'])
+    assert 'work' not in vars(null_target)
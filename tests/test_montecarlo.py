@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+import bitboard  # noqa: E402
+from montecarlo import MonteCarloAI  # noqa: E402
+
+# Small playout budgets keep these fast; what matters is that every
+# decision, however it is sliced or cut short, ends on a legal move.
+
+SLICE_MS = 1.0
+DECISION_MS = 150.0
+# Only RIGHT and DOWN move this board: the one gap is in the bottom-right
+# corner and no two neighbours match
+ONE_GAP = bitboard.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 0]])
+# Only DOWN moves this one
+ONLY_DOWN = bitboard.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [0, 0, 0, 0]])
+
+
+def _legal(board):
+    return [d for d in bitboard.DIRECTIONS if bitboard.move(board, d)[0] != board]
+
+
+def _small_ai(seed):
+    return MonteCarloAI(playouts=64, round_size=8, min_playouts=8, max_depth=20, seed=seed)
+
+
+def test_think_slices_converge_to_a_legal_move(play_boards):
+    player = _small_ai(1)
+    for board in play_boards(4, 12, seed=2)[2:]:
+        slices = 0
+        direction = None
+        while direction is None:
+            direction = player.think(board, SLICE_MS, DECISION_MS)
+            slices += 1
+            assert slices < 10000
+        assert direction in _legal(board)
+        assert player.last_playouts > 0
+
+
+def test_think_restarts_on_a_new_board():
+    player = _small_ai(2)
+    assert player.think(ONE_GAP, 0.0, DECISION_MS) is None
+    # Switching boards mid-decision starts over on the new one
+    direction = None
+    while direction is None:
+        direction = player.think(ONLY_DOWN, SLICE_MS, DECISION_MS)
+    assert direction == bitboard.DOWN
+    direction = None
+    while direction is None:
+        direction = player.think(ONE_GAP, SLICE_MS, DECISION_MS)
+    assert direction in (bitboard.RIGHT, bitboard.DOWN)
+
+
+def test_only_legal_move_is_played_without_playouts():
+    player = _small_ai(3)
+    assert _legal(ONLY_DOWN) == [bitboard.DOWN]
+    assert player.think(ONLY_DOWN, 0.0) == bitboard.DOWN
+    assert player.best_move(ONLY_DOWN) == bitboard.DOWN
+    assert player.last_playouts == 0
+    over = bitboard.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+    assert player.best_move(over) is None
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_elimination_keeps_a_legal_move_alive(play_boards, seed):
+    # Very narrow bounds drop moves after the first round; whatever is
+    # dropped, the best move left must stay alive and be the one chosen
+    player = MonteCarloAI(playouts=256, round_size=8, min_playouts=8, confidence=0.01,
+                          max_depth=4, seed=seed)
+    dropped = 0
+    for board in play_boards(4, 30, seed=seed)[5:] + [ONE_GAP]:
+        direction = player.best_move(board, time_budget_ms=DECISION_MS)
+        assert direction in _legal(board)
+        alive = [candidate[0] for candidate, kept in zip(player._candidates, player._alive)
+                 if kept]
+        assert direction in alive
+        dropped += len(player._candidates) - len(alive)
+    assert dropped > 0
@@ -0,0 +1,29 @@
+import time
+
+import bitboard
+import parallel_ai
+
+
+def test_worker_table_keeps_caching_once_full(play_boards):
+    # The worker's side of the search, run in this process
+    parallel_ai._init_worker(6, 1e-4, 300)
+    searcher = parallel_ai._worker_ai
+    filled = False
+    searches_after = 0
+    for board in play_boards(4, 40):
+        before = set(searcher.table)
+        key, value, nodes = parallel_ai._search_task((0, board, 2, 1.0, time.time() + 60))
+        assert value is not None
+        assert len(searcher.table) <= searcher.table_size
+        if filled and nodes:
+            assert set(searcher.table) - before, "worker table stopped caching once it was full"
+            searches_after += 1
+        filled = filled or len(searcher.table) >= searcher.table_size
+    assert searches_after > 5
+
+
+def test_best_move_is_legal(play_boards):
+    board = play_boards(4, 30, seed=4)[-1]
+    with parallel_ai.ParallelExpectimaxAI(workers=2) as searcher:
+        direction = searcher.best_move(board, time_budget_ms=500)
+    assert bitboard.move(board, direction)[0] != board
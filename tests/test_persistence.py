@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+import persistence
+from persistence import ScoreStore
+
+# ScoreStore writes from a background thread; these tests drive it in a
+# temporary directory and wait on flush() rather than sleeping.
+
+LONG_DELAY = 60.0  # A coalescing delay no test waits out
+
+
+def _game(store, score):
+    store.record_game(score, 2048, 100, 12.5)
+
+
+def test_best_score_is_replaced_atomically(tmp_path, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        # The temporary file is complete by the time it is renamed
+        with open(src) as f:
+            replaced.append((dst, json.load(f)))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(persistence.os, 'replace', replace)
+    store = ScoreStore(str(tmp_path), flush_delay=0)
+    store.set_best_score(1234)
+    assert store.flush(5)
+    assert replaced == [(store.best_path, {'best_score': 1234})]
+    assert os.listdir(tmp_path) == [persistence.BEST_SCORE_FILE]
+    assert ScoreStore(str(tmp_path)).best_score == 1234
+    store.close()
+
+
+def test_updates_are_coalesced_into_one_write(tmp_path, monkeypatch):
+    writes = []
+    real_write = ScoreStore._write
+
+    def write(self, best, games):
+        writes.append((best, len(games)))
+        return real_write(self, best, games)
+
+    monkeypatch.setattr(ScoreStore, '_write', write)
+    store = ScoreStore(str(tmp_path), flush_delay=LONG_DELAY)
+    for score in (100, 300, 200):
+        store.set_best_score(score)
+        _game(store, score)
+    assert writes == []
+    assert store.flush(5)
+    assert writes == [(300, 3)]
+    assert [game['score'] for game in store.load_stats()] == [100, 300, 200]
+    store.close()
+
+
+def test_flush_and_close_wait_for_the_writer(tmp_path, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    real_write = ScoreStore._write
+
+    def write(self, best, games):
+        started.set()
+        release.wait(5)
+        return real_write(self, best, games)
+
+    monkeypatch.setattr(ScoreStore, '_write', write)
+    store = ScoreStore(str(tmp_path), flush_delay=LONG_DELAY)
+    _game(store, 10)
+    assert not store.flush(0.05)  # Skips the delay, then times out mid-write
+    assert started.wait(5)
+    _game(store, 20)
+    release.set()
+    store.close()
+    assert not store._thread.is_alive()
+    assert [game['score'] for game in store.load_stats()] == [10, 20]
+    assert store.flush(0)
+
+
+def test_log_is_compacted_past_twice_max_entries(tmp_path):
+    store = ScoreStore(str(tmp_path), flush_delay=0, max_entries=5)
+    for score in range(10):
+        _game(store, score)
+        assert store.flush(5)
+    assert len(store.load_stats()) == 10
+    _game(store, 10)
+    assert store.flush(5)
+    assert [game['score'] for game in store.load_stats()] == [6, 7, 8, 9, 10]
+    store.close()
+
+    # A new store counts what is already on disk
+    store = ScoreStore(str(tmp_path), flush_delay=0, max_entries=2)
+    _game(store, 11)
+    assert store.flush(5)
+    assert [game['score'] for game in store.load_stats()] == [10, 11]
+    store.close()
+
+
+def test_failed_writes_are_kept_and_retried(tmp_path):
+    store = ScoreStore(str(tmp_path), flush_delay=0, retry_delay=0.01)
+    # Directories where the files should be make both writes fail
+    os.mkdir(store.stats_path)
+    os.mkdir(store.best_path)
+    store.set_best_score(500)
+    _game(store, 400)
+    _game(store, 500)
+    assert not store.flush(0.2)
+    assert isinstance(store.last_error, OSError)
+    assert store._saved_best == 0
+    _game(store, 100)
+
+    os.rmdir(store.stats_path)
+    os.rmdir(store.best_path)
+    assert store.flush(5)
+    assert [game['score'] for game in store.load_stats()] == [400, 500, 100]
+    assert ScoreStore(str(tmp_path)).best_score == 500
+    store.close()
+
+
+def test_close_gives_up_on_a_failing_disk(tmp_path):
+    store = ScoreStore(str(tmp_path), flush_delay=0, retry_delay=LONG_DELAY)
+    os.mkdir(store.stats_path)
+    _game(store, 1)
+    store.close(timeout=0.2)
+    assert not store._thread.is_alive()
+    # The game is still queued for a later write
+    os.rmdir(store.stats_path)
+    _game(store, 2)
+    assert store.flush(5)
+    assert [game['score'] for game in store.load_stats()] == [1, 2]
+    store.close()
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+# The pygame Renderer repaints only what changed since the last frame. On
+# SDL's dummy video driver, check that a move returns just the moved tiles'
+# rects (plus the header when the score changes), that those partial
+# frames end up identical to a full redraw, and that a new game or a
+# resized window is repainted in full.
+
+MOVES = 60
+
+
+def _pixels(pygame, surface):
+    return pygame.image.tostring(surface, 'RGB')
+
+
+def _tile_rects(pygame, game, old, new):
+    """Screen rects of the cells that differ between two boards"""
+    rects = []
+    for index in range(game.size * game.size):
+        shift = game.engine.cell_bits * index
+        if ((old ^ new) >> shift) & game.engine.cell_mask:
+            rects.append(pygame.Rect(game.cell_pos(*divmod(index, game.size)),
+                                     (game.cell_size, game.cell_size)))
+    return rects
+
+
+@pytest.mark.parametrize('size', [3, 4, 6])
+def test_moves_repaint_only_changed_tiles(pygame_main, null_store, size):
+    pygame, main = pygame_main
+    game = main.Game2048(seed=size, store=null_store, size=size)
+    renderer = main.Renderer(game)
+    screen = pygame.Surface((game.window_width, game.window_height))
+    expected = pygame.Surface(screen.get_size())
+    assert renderer.render(screen) == [screen.get_rect()]
+    assert renderer.render(screen) == []
+
+    rng = random.Random(size)
+    header = pygame.Rect(0, 0, game.window_width, 100)
+    for _ in range(MOVES):
+        if game.is_game_over() or game.has_won():
+            break
+        old_board, old_score = game.board, game.score
+        if not game.step(rng.randrange(4))[0]:
+            assert renderer.render(screen) == []
+            continue
+        rects = renderer.render(screen)
+        if game.is_game_over() or game.has_won():
+            assert rects == [screen.get_rect()]
+            break
+        tiles = _tile_rects(pygame, game, old_board, game.board)
+        assert rects == ([header] if game.score != old_score else []) + tiles
+        game.draw(expected)
+        assert _pixels(pygame, screen) == _pixels(pygame, expected)
+
+
+def test_new_game_is_a_full_redraw(pygame_main, null_store):
+    pygame, main = pygame_main
+    game = main.Game2048(seed=1, store=null_store)
+    renderer = main.Renderer(game)
+    screen = pygame.Surface((game.window_width, game.window_height))
+    renderer.render(screen)
+    for direction in (main.LEFT, main.UP, main.RIGHT, main.DOWN):
+        game.step(direction)
+    renderer.render(screen)
+    game.reset_game()
+    assert renderer.render(screen) == [screen.get_rect()]
+    assert renderer.render(screen) == []
+
+
+def test_resized_window_is_a_full_redraw(pygame_main, null_store):
+    pygame, main = pygame_main
+    game = main.Game2048(seed=2, store=null_store)
+    renderer = main.Renderer(game)
+    screen = pygame.Surface((game.window_width, game.window_height))
+    renderer.render(screen)
+    bigger = pygame.Surface((game.window_width + 40, game.window_height + 40))
+    assert renderer.render(bigger) == [bigger.get_rect()]
+    assert renderer.render(bigger) == []
+    renderer.invalidate()
+    assert renderer.render(bigger) == [bigger.get_rect()]
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+import selfplay
+from game_core import GameCore
+from replay import (KEYFRAME_INTERVAL, Replay, ReplayError, ReplayRecorder, pack_turn,
+                    unpack_turn)
+
+
+INTERVAL = 16  # Short keyframe interval, so every game crosses several
+
+
+def _record(index, turns=None, interval=INTERVAL):
+    """Play a seeded game, returns its recording and the (board, score) after each turn"""
+    game = GameCore(selfplay.game_seed(0, index))
+    recorder = ReplayRecorder(game)
+    recorder.replay = Replay(game.seed, game.board, keyframe_interval=interval)
+    rng = random.Random(index)
+    states = [(game.board, game.score)]
+    while not game.is_game_over() and (turns is None or len(states) <= turns):
+        game.step(selfplay.corner_policy(game, rng))
+        states.append((game.board, game.score))
+    return recorder.replay, states
+
+
+@pytest.fixture(scope='module')
+def games():
+    return [_record(index) for index in range(6)]
+
+
+def test_keyframes_match_states(games):
+    for replay, states in games:
+        assert len(replay) > 2 * INTERVAL
+        for k in range(len(replay) // INTERVAL + 1):
+            assert tuple(replay.keyframes[2 * k:2 * k + 2]) == states[k * INTERVAL]
+
+
+def test_default_interval():
+    replay, states = _record(2, interval=KEYFRAME_INTERVAL)
+    assert len(replay) > KEYFRAME_INTERVAL
+    assert tuple(replay.keyframes[2:4]) == states[KEYFRAME_INTERVAL]
+    assert replay.verify() == states[-1][1]
+
+
+def test_verify_replays_from_seed(games):
+    for replay, states in games:
+        assert replay.verify() == states[-1][1]
+
+
+def test_state_at_every_turn(games):
+    for replay, states in games:
+        assert len(replay) == len(states) - 1
+        for turn, state in enumerate(states):
+            assert replay.state_at(turn) == state
+        with pytest.raises(IndexError):
+            replay.state_at(len(replay) + 1)
+
+
+def test_bytes_round_trip(games, tmp_path):
+    for n, (replay, states) in enumerate(games):
+        path = str(tmp_path / f'{n}.2048r')
+        replay.save(path)
+        loaded = Replay.load(path)
+        assert loaded.to_bytes() == replay.to_bytes()
+        assert loaded.state_at(len(loaded)) == states[-1]
+        assert loaded.verify() == states[-1][1]
+
+
+def test_tampered_turn_fails_verify(games):
+    replay, _ = games[0]
+    data = bytearray(replay.to_bytes())
+    data[20 + len(replay) // 2] ^= 0x04  # Move the spawn one cell along
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(bytes(data)).verify()
+
+
+def test_reserved_bit_is_rejected(games):
+    replay, _ = games[0]
+    data = bytearray(replay.to_bytes())
+    data[20 + len(replay) // 2] |= 0x80
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(bytes(data))
+
+
+def test_every_turn_has_a_spawn(games):
+    for replay, _ in games:
+        assert all(not turn & 0x80 for turn in replay.turns)
+        assert all(unpack_turn(turn)[1] is not None for turn in replay.turns)
+        assert [pack_turn(*unpack_turn(turn)) for turn in replay.turns] == list(replay.turns)
+
+
+def test_truncated_file_is_rejected(games):
+    data = games[0][0].to_bytes()
+    for cut in (10, len(data) - 1, len(data) - 16):
+        with pytest.raises(ReplayError):
+            Replay.from_bytes(data[:cut])
+
+
+def test_truncate_drops_later_turns_and_keyframes():
+    replay, states = _record(1, turns=3 * INTERVAL + 10)
+    replay.truncate(2 * INTERVAL - 3)
+    assert len(replay) == 2 * INTERVAL - 3
+    assert len(replay.keyframes) == 4
+    assert replay.state_at(len(replay)) == states[2 * INTERVAL - 3]
+    assert replay.verify() == states[2 * INTERVAL - 3][1]
@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+from game_core import GameCore
+from rng import BulkRandom, SplitMix64
+
+# Chi-square critical values at p = 0.001: a correct generator fails a test
+# with a fixed seed once in a thousand seeds, so these only trip on real bias
+CHI2_1_DF = 10.828  # 2s against 4s
+CHI2_15_DF = 37.697  # Cell picked on an empty 4x4 board
+SPAWNS = 200000
+
+
+def _bulk(seed):
+    pytest.importorskip('numpy')
+    return BulkRandom(seed)
+
+
+def _bulk_small_blocks(seed):
+    pytest.importorskip('numpy')
+    return BulkRandom(seed, block=64)
+
+
+RNG_CLASSES = {
+    'random.Random': random.Random,
+    'SplitMix64': SplitMix64,
+    'BulkRandom': _bulk,
+    'BulkRandom, 64-float blocks': _bulk_small_blocks,
+}
+
+
+def _chi_square(observed, expected):
+    return sum((o - e) ** 2 / e for o, e in zip(observed, expected))
+
+
+def _play(game, turns, rng):
+    """Play random moves, returns the boards seen"""
+    boards = []
+    for _ in range(turns):
+        if game.is_game_over():
+            break
+        game.step(rng.randrange(4))
+        boards.append(game.board)
+    return boards
+
+
+def _check_spawns(spawns):
+    """Chi-square tests of (cell, exponent) spawns on an empty board"""
+    exponents = [0, 0]
+    cells = [0] * 16
+    for index, exponent in spawns:
+        exponents[exponent - 1] += 1
+        cells[index] += 1
+    assert sum(cells) == SPAWNS
+    assert _chi_square(exponents, [0.9 * SPAWNS, 0.1 * SPAWNS]) < CHI2_1_DF, exponents
+    assert _chi_square(cells, [SPAWNS / 16] * 16) < CHI2_15_DF, cells
+
+
+@pytest.mark.parametrize('name', sorted(RNG_CLASSES))
+def test_same_seed_same_game(name):
+    factory = RNG_CLASSES[name]
+    first = _play(GameCore(7, rng_class=factory), 300, random.Random(1))
+    second = _play(GameCore(7, rng_class=factory), 300, random.Random(1))
+    assert first == second
+
+
+@pytest.mark.parametrize('name', sorted(RNG_CLASSES))
+def test_empty_ranges_raise(name):
+    rng = RNG_CLASSES[name](3)
+    for stop in (0, -1):
+        with pytest.raises(ValueError):
+            rng.randrange(stop)
+    with pytest.raises(IndexError):
+        rng.choice([])
+    assert {rng.randrange(3) for _ in range(200)} == {0, 1, 2}
+
+
+@pytest.mark.parametrize('name', sorted(RNG_CLASSES))
+def test_snapshot_replays_spawns(name):
+    """A getstate() snapshot replays the same spawns, whatever was drawn since"""
+    game = GameCore(7, rng_class=RNG_CLASSES[name])
+    _play(game, 40, random.Random(2))
+    state = game.rng.getstate()
+    board, score, moves = game.board, game.score, game.moves
+    expected = _play(game, 300, random.Random(3))
+    game.rng.random()
+    game.rng.setstate(state)
+    game.board, game.score, game.moves = board, score, moves
+    assert _play(game, 300, random.Random(3)) == expected
+
+
+@pytest.mark.parametrize('block', [64, 1 << 16])
+def test_batch_snapshot_replays_steps(block):
+    np = pytest.importorskip('numpy')
+    import batch
+    game = batch.BatchGame(100, seed=7)
+    game.rng = BulkRandom(7, block)
+    actions = np.random.default_rng(1).integers(0, 4, size=(60, 100))
+    for k in range(20):
+        game.step(actions[k])
+    state = game.rng.getstate()
+    saved = (game.boards.copy(), game.scores.copy(), game.done.copy())
+    for k in range(20, 60):
+        game.step(actions[k])
+    expected = game.boards.copy()
+    game.rng.setstate(state)
+    game.boards, game.scores, game.done = (a.copy() for a in saved)
+    for k in range(20, 60):
+        game.step(actions[k])
+    assert (game.boards == expected).all()
+
+
+@pytest.mark.parametrize('name', ['random.Random', 'SplitMix64', 'BulkRandom'])
+def test_game_spawn_distribution(name):
+    game = GameCore(11, rng_class=RNG_CLASSES[name])
+
+    def spawns():
+        for _ in range(SPAWNS):
+            game.board = 0
+            yield game.add_random_tile()
+    _check_spawns(spawns())
+
+
+def test_batch_spawn_distribution():
+    np = pytest.importorskip('numpy')
+    import batch
+    boards = batch.spawn(np.zeros(SPAWNS, dtype=np.uint64), BulkRandom(11))
+    # One tile per board: its cell and exponent
+    cells = np.zeros(len(boards), dtype=np.int64)
+    for k in range(16):
+        cells[(boards >> np.uint64(4 * k)) & np.uint64(0xF) > 0] = k
+    exponents = (boards >> (cells * 4).astype(np.uint64)) & np.uint64(0xF)
+    _check_spawns(zip(cells.tolist(), exponents.astype(np.int64).tolist()))
+
+
+def test_chi_square_catches_a_biased_split():
+    # The bound is tight enough to see a 11% share of 4s
+    biased = [int(0.89 * SPAWNS), int(0.11 * SPAWNS)]
+    assert _chi_square(biased, [0.9 * SPAWNS, 0.1 * SPAWNS]) > CHI2_1_DF
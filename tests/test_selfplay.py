@@ -0,0 +1,15 @@
+import selfplay
+
+
+def test_results_do_not_depend_on_worker_count():
+    for policy in ('random', 'expectimax'):
+        serial, _ = selfplay.run(3, workers=1, policy=policy, max_moves=25)
+        pooled, _ = selfplay.run(3, workers=3, policy=policy, max_moves=25, chunk_size=1)
+        for name in ('seed', 'score', 'max_tile', 'moves'):
+            assert serial[name] == pooled[name], (policy, name)
+
+
+def test_play_game_counts_moves():
+    score, max_tile, moves = selfplay.play_game(5, selfplay.corner_policy, max_moves=40)
+    assert moves == 40
+    assert score > 0 and max_tile >= 4
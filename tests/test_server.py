@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from server import Client, GameServer, ProtocolError
+
+
+def _ask(server, request):
+    line = request if isinstance(request, bytes) else json.dumps(request).encode()
+    return json.loads(server.handle_line(line))
+
+
+def test_new_move_state():
+    server = GameServer()
+    created = _ask(server, {'op': 'new', 'seed': 3, 'id': 'a'})
+    assert created['ok'] and created['id'] == 'a'
+    session = created['session']
+    moved = {'moved': False}
+    for direction in ('left', 'up', 'right', 'down'):
+        moved = _ask(server, {'op': 'move', 'session': session, 'direction': direction})
+        if moved['moved']:
+            break
+    assert moved['ok'] and moved['moved']
+    state = _ask(server, {'op': 'state', 'session': session, 'grid': True})
+    assert state['board'] == moved['board'] and state['moves'] == 1
+    assert len(state['grid']) == 4
+
+
+def test_bad_json_is_reported_as_such():
+    server = GameServer()
+    for line in (b'{"op": "new"', b'\xff\xfe{}'):
+        response = _ask(server, line)
+        assert not response['ok'] and response['error'].startswith('Bad JSON')
+
+
+def test_request_errors_are_not_bad_json():
+    server = GameServer()
+    session = _ask(server, {'op': 'new', 'seed': 1})['session']
+    for request in ({'op': 'move', 'session': session + 1, 'direction': 'left'},
+                    {'op': 'move', 'session': session, 'direction': 'sideways'},
+                    {'op': 'new', 'seed': -1},
+                    {'op': 'new', 'size': 99},
+                    {'op': 'jump'},
+                    [1, 2]):
+        response = _ask(server, request)
+        assert not response['ok']
+        assert not response['error'].startswith('Bad JSON'), (request, response)
+
+
+def test_unexpected_errors_are_not_swallowed(monkeypatch):
+    server = GameServer()
+
+    def broken(session):
+        raise ValueError("bug")
+    monkeypatch.setattr(server.sessions, 'get', broken)
+    with pytest.raises(ValueError):
+        server.handle_line(b'{"op": "state", "session": 1}')
+
+
+def test_round_trip_over_socket(tmp_path):
+    async def play():
+        server = GameServer()
+        path = str(tmp_path / 'server.sock')
+        await server.start(unix_path=path)
+        client = await Client.connect(unix_path=path)
+        try:
+            created = await client.request('new', seed=5)
+            state = await client.request('state', session=created['session'])
+            with pytest.raises(ProtocolError):
+                await client.request('state', session=created['session'] + 1)
+            return created, state
+        finally:
+            await client.close()
+            server.close()
+
+    created, state = asyncio.run(play())
+    assert state['board'] == created['board']
@@ -0,0 +1,132 @@
+import random
+import time
+
+import pytest
+
+from game_core import GameCore
+from rng import SplitMix64
+from sessions import SLOT_BITS, SessionError, SessionStore
+
+# Parked sessions live in flat arrays; unparking one must give back exactly
+# the game that was parked, RNG included, so a client sees no difference.
+# Times are passed explicitly, far enough ahead that every session counts
+# as idle.
+
+MOVES = 40
+LATER = 1e6  # Seconds past now: beyond any park_after or idle_timeout used here
+
+
+def _play(game, rng, moves=MOVES):
+    for _ in range(moves):
+        if game.is_game_over():
+            break
+        game.step(rng.randrange(4))
+
+
+def _snapshot(game):
+    return game.board, game.score, game.moves, game.seed, game.rng.getstate(), game.size
+
+
+@pytest.mark.parametrize('size', [3, 4, 5, 6])
+def test_park_and_unpark_restore_the_game_exactly(size):
+    store = SessionStore()
+    rng = random.Random(size)
+    session, game = store.create(seed=size, size=size)
+    _play(game, rng)
+    before = _snapshot(game)
+    started_at = game.started_at
+
+    assert store.park_idle(time.monotonic() + LATER) == 1
+    assert store.live == {} and store.parked == 1 and len(store) == 1
+    restored = store.get(session)
+    assert restored is not game
+    assert _snapshot(restored) == before
+    assert restored.started_at == started_at
+    assert store.parked == 0
+
+    # The restored game spawns the same tiles as one that was never parked
+    shadow_rng = SplitMix64()
+    shadow_rng.setstate(before[4])
+    shadow = GameCore.restore(*before[:4], shadow_rng, size)
+    for _ in range(MOVES):
+        direction = rng.randrange(4)
+        assert restored.step(direction) == shadow.step(direction)
+        assert restored.board == shadow.board
+
+
+def test_parked_sessions_round_trip_repeatedly():
+    store = SessionStore()
+    rng = random.Random(1)
+    sessions = [store.create(seed=seed, size=4 + seed % 2)[0] for seed in range(20)]
+    for _ in range(5):
+        expected = {}
+        for session in sessions:
+            game = store.get(session)
+            _play(game, rng, 5)
+            expected[session] = _snapshot(game)
+        assert store.park_idle(time.monotonic() + LATER) == len(sessions)
+        assert {session: _snapshot(store.get(session)) for session in sessions} == expected
+
+
+def test_closed_ids_are_not_reused():
+    store = SessionStore()
+    first, _ = store.create(seed=1)
+    store.close(first)
+    with pytest.raises(SessionError):
+        store.get(first)
+    second, game = store.create(seed=2)
+    # Same slot, next generation
+    assert second & ((1 << SLOT_BITS) - 1) == first & ((1 << SLOT_BITS) - 1)
+    assert second >> SLOT_BITS == (first >> SLOT_BITS) + 1
+    assert store.get(second) is game
+    with pytest.raises(SessionError):
+        store.get(first)
+    store.close(first)  # A stale id closes nothing
+    assert store.get(second) is game
+    for bad in (-1, 'x', second + 1, second | (5 << SLOT_BITS)):
+        with pytest.raises(SessionError):
+            store.get(bad)
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(idle_timeout=100.0, park_after=10.0)
+    stale, _ = store.create(seed=1)
+    parked, _ = store.create(seed=2)
+    store.park_idle(time.monotonic() + LATER)
+    fresh, _ = store.create(seed=3)
+    assert store.live.keys() == {fresh & ((1 << SLOT_BITS) - 1)} and store.parked == 2
+    store.get(stale)  # Unparked, but not used since the cutoff below
+
+    now = time.monotonic()
+    store.last_used[fresh & ((1 << SLOT_BITS) - 1)] = now + 150.0
+    assert store.expire(now + 200.0) == 2
+    assert len(store) == 1 and store.parked == 0
+    for session in (stale, parked):
+        with pytest.raises(SessionError):
+            store.get(session)
+    store.get(fresh)
+
+
+def test_expiry_sweeps_parked_slots_in_batches():
+    store = SessionStore(idle_timeout=100.0)
+    sessions = [store.create(seed=seed)[0] for seed in range(10)]
+    later = time.monotonic() + LATER
+    store.park_idle(later)
+    assert store.expire(later, limit=4) == 4
+    assert store.expire(later, limit=4) == 4
+    assert store.expire(later, limit=4) == 2
+    assert len(store) == 0
+    assert store.create()[0] not in sessions
+
+
+def test_full_store_expires_before_refusing():
+    store = SessionStore(max_sessions=2, idle_timeout=0.0)
+    store.create()
+    store.create()
+    time.sleep(0.01)
+    store.create()  # Makes room by expiring the idle ones
+    assert len(store) == 1
+    store = SessionStore(max_sessions=1)
+    store.create()
+    with pytest.raises(SessionError):
+        store.create()
@@ -0,0 +1,118 @@
+import functools
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import nboard  # noqa: E402
+from tablebase import SPAWN_2, SPAWN_4, Tablebase, TablebaseError, build  # noqa: E402
+
+CASES = [(2, 4), (2, 5), (3, 4), (3, 5)]
+SAMPLES = 300  # Positions per table checked against the recursion
+
+
+def _exact(size, target):
+    """Win probability by plain recursion over the nboard engine"""
+    engine = nboard.get_engine(size)
+
+    @functools.lru_cache(maxsize=None)
+    def value(board):
+        if engine.max_exponent(board) >= target:
+            return 1.0
+        best = 0.0
+        for direction in range(4):
+            after, _ = engine.move(board, direction)
+            if after == board:
+                continue
+            if engine.max_exponent(after) >= target:
+                return 1.0
+            empty = engine.empty_cells(after)
+            total = sum(SPAWN_2 * value(engine.set_exponent(after, i, 1)) +
+                        SPAWN_4 * value(engine.set_exponent(after, i, 2)) for i in empty)
+            best = max(best, total / len(empty))
+        return best
+
+    return value
+
+
+def _images(engine, board):
+    """The eight symmetric images of board"""
+    grid = engine.to_grid(board)
+    images = []
+    for _ in range(4):
+        grid = [list(row) for row in zip(*grid[::-1])]  # Rotate a quarter turn
+        images.append(engine.from_grid(grid))
+        images.append(engine.from_grid([row[::-1] for row in grid]))
+    return images
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tablebases')
+    paths = {}
+    for size, target in CASES:
+        paths[size, target] = str(directory / f'{size}-{target}')
+        build(paths[size, target], size, target, workers=1)
+    return paths
+
+
+@pytest.mark.parametrize('size,target', CASES)
+def test_values_match_recursion(tables, size, target):
+    tablebase = Tablebase(tables[size, target])
+    exact = _exact(size, target)
+    keys = [int(key) for key in tablebase.keys]
+    for key in random.Random(size * 16 + target).sample(keys, min(SAMPLES, len(keys))):
+        assert abs(tablebase.value(key) - exact(key)) < 1e-12, hex(key)
+        for image in _images(tablebase.engine, key):
+            assert tablebase.value(image) == tablebase.value(key)
+
+
+def test_best_move_agrees_with_value(tables):
+    tablebase = Tablebase(tables[3, 5])
+    rng = random.Random(1)
+    for key in rng.sample([int(key) for key in tablebase.keys], 300):
+        direction, value = tablebase.best_move(key)
+        assert abs(value - tablebase.value(key)) < 1e-12
+        if direction is not None:
+            after, _ = tablebase.engine.move(key, direction)
+            assert after != key
+    assert 0.0 < tablebase.start_value() <= 1.0
+
+
+def test_uncovered_boards(tables):
+    tablebase = Tablebase(tables[3, 4])
+    engine = tablebase.engine
+    won = engine.set_exponent(0, 0, 4)
+    assert tablebase.value(won) == 1.0
+    assert tablebase.best_move(won) is None
+    # Every position is stored after a spawn of a 2 or a 4
+    unreachable = engine.from_grid([[8] * 3] * 3)
+    assert tablebase.value(unreachable) is None
+
+
+def test_parallel_build_writes_same_files(tables, tmp_path):
+    parallel = str(tmp_path / 'parallel')
+    build(parallel, 3, 5, workers=2)
+    for name in ('keys.npy', 'values.npy'):
+        with open(os.path.join(tables[3, 5], name), 'rb') as a, \
+                open(os.path.join(parallel, name), 'rb') as b:
+            assert a.read() == b.read()
+
+
+@pytest.mark.parametrize('size', [1, 4, 5])
+def test_build_refuses_sizes_out_of_reach(tmp_path, size):
+    path = str(tmp_path / 'big')
+    with pytest.raises(TablebaseError):
+        build(path, size, 5, workers=1)
+    assert not os.path.exists(path)
+
+
+def test_build_refuses_bad_target_and_existing_table(tables, tmp_path):
+    with pytest.raises(TablebaseError):
+        build(str(tmp_path / 'low'), 3, 2, workers=1)
+    with pytest.raises(TablebaseError):
+        build(tables[2, 4], 2, 4, workers=1)
+    with pytest.raises(TablebaseError):
+        Tablebase(str(tmp_path))
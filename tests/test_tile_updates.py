@@ -0,0 +1,49 @@
+import pytest
+
+from nboard import get_engine
+
+# The tile diff behind kivy's GameBoard.update_display: only cells listed by
+# engine.changed_cells are repainted, so applying those changes to the grid
+# on screen must always give the new board's grid.
+
+
+def _apply(grid, size, changes):
+    grid = [row[:] for row in grid]
+    for index, exponent in changes:
+        row, column = divmod(index, size)
+        grid[row][column] = 1 << exponent if exponent else 0
+    return grid
+
+
+@pytest.mark.parametrize('size', [3, 4, 5, 8])
+def test_changes_turn_shown_grid_into_new_one(play_boards, size):
+    engine = get_engine(size)
+    boards = play_boards(size, 300, seed=size)
+    shown = engine.to_grid(0)
+    previous = 0
+    for board in boards:
+        changes = engine.changed_cells(previous, board)
+        shown = _apply(shown, size, changes)
+        assert shown == engine.to_grid(board)
+
+        # Exactly the cells whose tile differs, each listed once
+        before, after = engine.to_grid(previous), engine.to_grid(board)
+        expected = [size * i + j for i in range(size) for j in range(size)
+                    if before[i][j] != after[i][j]]
+        assert [index for index, _ in changes] == expected
+        previous = board
+
+
+@pytest.mark.parametrize('size', [4, 6])
+def test_first_update_lists_every_cell(play_boards, size):
+    engine = get_engine(size)
+    board = play_boards(size, 20)[-1]
+    changes = engine.changed_cells(None, board)
+    assert [index for index, _ in changes] == list(range(size * size))
+    assert _apply(engine.to_grid(0), size, changes) == engine.to_grid(board)
+
+
+def test_unchanged_board_lists_nothing(play_boards):
+    for size in (4, 5):
+        board = play_boards(size, 10)[-1]
+        assert get_engine(size).changed_cells(board, board) == []
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import nboard  # noqa: E402
+from game_core import GameCore  # noqa: E402
+from trajectories import (TrajectoryDataset, TrajectoryError, TrajectoryRecorder,  # noqa: E402
+                          TrajectoryWriter, export_selfplay)
+
+
+def _record(path, size, games, rng, chunk_rows=197):
+    """Record random games through TrajectoryRecorder, returns the turns as played"""
+    expected = []
+    with TrajectoryWriter(path, size, chunk_rows=chunk_rows) as writer:
+        for _ in range(games):
+            game = GameCore(rng.getrandbits(32), size)
+            TrajectoryRecorder(game, writer)
+            while not game.is_game_over():
+                board = game.board
+                direction = rng.randrange(4)
+                moved, gained = game.step(direction)
+                if moved:
+                    expected.append((board, direction, gained, game.is_game_over()))
+    return expected
+
+
+@pytest.mark.parametrize('size', [3, 4, 5])
+def test_rows_read_back_as_played(tmp_path, size):
+    engine = nboard.get_engine(size)
+    path = str(tmp_path / 'data')
+    expected = _record(path, size, 30, random.Random(size))
+
+    dataset = TrajectoryDataset(path)
+    assert len(dataset) == len(expected)
+    assert len(dataset.chunks) > 1
+    row = 0
+    for chunk in dataset.iter_chunks():
+        grids = dataset.exponents(chunk['board'])
+        for k in range(len(chunk['action'])):
+            board, direction, gained, done = expected[row]
+            assert int.from_bytes(chunk['board'][k].tobytes(), 'little') == board
+            assert grids[k].ravel().tolist() == [engine.get_exponent(board, i)
+                                                 for i in range(engine.cells)]
+            assert (chunk['action'][k], chunk['reward'][k], chunk['done'][k]) == \
+                (direction, gained, done)
+            row += 1
+    assert row == len(expected)
+    assert sum(dataset.column('done')[k].sum() for k in range(len(dataset.chunks))) == 30
+
+
+def test_batches_match_single_turns(tmp_path):
+    expected = _record(str(tmp_path / 'single'), 4, 10, random.Random(1))
+    boards = np.array([board for board, _, _, _ in expected], dtype=np.uint64)
+    actions = np.array([a for _, a, _, _ in expected], dtype=np.uint8)
+    rewards = np.array([r for _, _, r, _ in expected], dtype=np.uint32)
+    dones = np.array([d for _, _, _, d in expected], dtype=np.bool_)
+    with TrajectoryWriter(str(tmp_path / 'batched'), 4, chunk_rows=997) as writer:
+        for start in range(0, len(expected), 300):
+            writer.write_batch(boards[start:start + 300], actions[start:start + 300],
+                               rewards[start:start + 300], dones[start:start + 300])
+
+    single = TrajectoryDataset(str(tmp_path / 'single'))
+    batched = TrajectoryDataset(str(tmp_path / 'batched'))
+    for name in ('board', 'action', 'reward', 'done'):
+        assert (np.concatenate(single.column(name)) == np.concatenate(batched.column(name))).all()
+
+
+def test_export_selfplay(tmp_path):
+    path = str(tmp_path / 'export')
+    rows = export_selfplay(path, 200, batch_size=64, chunk_rows=4096)
+    dataset = TrajectoryDataset(path)
+    assert len(dataset) == rows
+    # Every exported game ends in exactly one done row
+    assert sum(int(done.sum()) for done in dataset.column('done')) >= 200
+    boards = np.concatenate(dataset.column('board')).view('<u8').ravel()
+    assert (boards != 0).all()
+
+
+def test_refuses_existing_dataset_and_bad_index(tmp_path):
+    path = str(tmp_path / 'data')
+    _record(path, 4, 1, random.Random(0))
+    with pytest.raises(TrajectoryError):
+        TrajectoryWriter(path)
+    with pytest.raises(TrajectoryError):
+        TrajectoryDataset(str(tmp_path))
+    (tmp_path / 'data' / 'index.json').write_text('{"format": "other"}')
+    with pytest.raises(TrajectoryError):
+        TrajectoryDataset(path)
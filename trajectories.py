@@ -0,0 +1,299 @@
+import argparse
+import array
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import nboard
+from game_core import GRID_SIZE
+
+# Training data export: one row per turn with the board before the move,
+# the move, the score it gained and whether it ended the game.
+#
+# A dataset is a directory of fixed-size chunks. Each chunk stores every
+# column as its own .npy file, preallocated to CHUNK_ROWS rows and written
+# through a memory map, so the writer's memory stays bounded however big
+# the dataset grows. index.json lists the finished chunks and how many rows
+# each holds (only the last one can be short, the unwritten end of its
+# files left sparse where the filesystem allows); it is rewritten after every
+# chunk, so an interrupted export leaves a readable dataset behind. Readers
+# open the chunks with np.load(mmap_mode='r') and never copy them.
+#
+# Columns:
+#   board   (rows, board_bytes) uint8  packed board, little-endian bytes
+#                                      (view a 4x4 board as '<u8' to get
+#                                      the bitboard int)
+#   action  uint8                      LEFT, RIGHT, UP or DOWN
+#   reward  uint32                     score gained by the move
+#   done    bool                       the move ended the game
+#
+# Turns can be written one at a time (TrajectoryRecorder hooks any game's
+# move loop, headless or Game2048) or a batch at a time from
+# batch.BatchGame.
+
+FORMAT = '2048-trajectories'
+VERSION = 1
+INDEX_FILE = 'index.json'
+CHUNK_ROWS = 1 << 22
+FLUSH_ROWS = 1 << 14  # Turns buffered by append() before they are written out
+COLUMNS = ('board', 'action', 'reward', 'done')
+_DTYPES = {'board': np.uint8, 'action': np.uint8, 'reward': np.uint32, 'done': np.bool_}
+
+
+class TrajectoryError(Exception):
+    pass
+
+
+def board_bytes(size):
+    """Bytes per packed board of the given size"""
+    engine = nboard.get_engine(size)
+    return (engine.cells * engine.cell_bits + 7) // 8
+
+
+def chunk_path(path, name, column):
+    return os.path.join(path, f"{name}.{column}.npy")
+
+
+def exponents(boards, size=GRID_SIZE):
+    """Unpack a (rows, board_bytes) board column into (rows, size, size) exponents"""
+    engine = nboard.get_engine(size)
+    bits = np.unpackbits(np.asarray(boards, dtype=np.uint8), axis=1, bitorder='little')
+    bits = bits[:, :engine.cells * engine.cell_bits].reshape(-1, engine.cells, engine.cell_bits)
+    weights = (1 << np.arange(engine.cell_bits)).astype(np.uint8)
+    return (bits * weights).sum(axis=2, dtype=np.uint8).reshape(-1, size, size)
+
+
+class TrajectoryWriter:
+    def __init__(self, path, size=GRID_SIZE, chunk_rows=CHUNK_ROWS):
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            raise TrajectoryError(f"{path} already holds a dataset")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = size
+        self.board_bytes = board_bytes(size)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.chunks = []  # [name, rows] of every finished chunk
+        self._chunk = None  # column -> memmap of the chunk being filled
+        self._filled = 0
+
+        # Turns from append(), written out every FLUSH_ROWS
+        self._boards = bytearray()
+        self._actions = bytearray()
+        self._rewards = array.array('L')
+        self._dones = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def append(self, board, action, reward, done):
+        """Add one turn; board is the packed int before the move"""
+        self._boards += board.to_bytes(self.board_bytes, 'little')
+        self._actions.append(action)
+        self._rewards.append(reward)
+        self._dones.append(done)
+        if len(self._actions) >= FLUSH_ROWS:
+            self.flush()
+
+    def write_batch(self, boards, actions, rewards, dones):
+        """Add many turns at once
+
+        boards is either a (rows,) uint64 array of bitboards, as kept by
+        batch.BatchGame, or a (rows, board_bytes) uint8 array.
+        """
+        self.flush()
+        boards = np.asarray(boards)
+        if boards.ndim == 1:
+            boards = boards.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :self.board_bytes]
+        self._write(boards, actions, rewards, dones)
+
+    def flush(self):
+        """Write out turns buffered by append()"""
+        if not self._actions:
+            return
+        self._write(np.frombuffer(self._boards, dtype=np.uint8).reshape(-1, self.board_bytes),
+                    np.frombuffer(self._actions, dtype=np.uint8),
+                    np.frombuffer(self._rewards, dtype=np.dtype(self._rewards.typecode)),
+                    np.frombuffer(self._dones, dtype=np.bool_))
+        self._boards = bytearray()
+        self._actions = bytearray()
+        self._rewards = array.array('L')
+        self._dones = bytearray()
+
+    def _write(self, boards, actions, rewards, dones):
+        columns = (boards, actions, rewards, dones)
+        start = 0
+        total = len(actions)
+        while start < total:
+            if self._chunk is None:
+                self._open_chunk()
+            take = min(total - start, self.chunk_rows - self._filled)
+            for name, values in zip(COLUMNS, columns):
+                self._chunk[name][self._filled:self._filled + take] = values[start:start + take]
+            self._filled += take
+            self.rows += take
+            start += take
+            if self._filled == self.chunk_rows:
+                self._finish_chunk()
+
+    def _open_chunk(self):
+        name = '%05d' % len(self.chunks)
+        self._chunk = {}
+        for column in COLUMNS:
+            shape = (self.chunk_rows, self.board_bytes) if column == 'board' else (self.chunk_rows,)
+            self._chunk[column] = np.lib.format.open_memmap(
+                chunk_path(self.path, name, column), mode='w+', dtype=_DTYPES[column], shape=shape)
+        self._filled = 0
+
+    def _finish_chunk(self):
+        for memmap in self._chunk.values():
+            memmap.flush()
+        self.chunks.append(['%05d' % len(self.chunks), self._filled])
+        # Dropping the maps unmaps the chunk, so the writer never holds
+        # more than one chunk's pages
+        self._chunk = None
+        self._filled = 0
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            'format': FORMAT,
+            'version': VERSION,
+            'size': self.size,
+            'board_bytes': self.board_bytes,
+            'chunk_rows': self.chunk_rows,
+            'rows': sum(rows for _, rows in self.chunks),
+            'chunks': self.chunks,
+        }
+        path = os.path.join(self.path, INDEX_FILE)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """Write out everything and the final index"""
+        self.flush()
+        if self._chunk is not None:
+            self._finish_chunk()
+        elif not os.path.exists(os.path.join(self.path, INDEX_FILE)):
+            self._write_index()
+
+
+class TrajectoryRecorder:
+    """Game observer that exports every turn to a TrajectoryWriter"""
+
+    def __init__(self, game, writer):
+        self.writer = writer
+        self.board = game.board  # The board before the next move
+        game.observers.append(self)
+
+    def on_step(self, game, direction, score_gained, spawn):
+        self.writer.append(self.board, direction, score_gained, game.is_game_over())
+        self.board = game.board
+
+    def on_reset(self, game):
+        self.board = game.board
+
+    def on_restore(self, game):
+        self.board = game.board
+
+
+class TrajectoryDataset:
+    """Read-only, zero-copy view of a dataset written by TrajectoryWriter"""
+
+    def __init__(self, path):
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            raise TrajectoryError(f"Cannot read the index of {path}: {e}")
+        if index.get('format') != FORMAT or index.get('version') != VERSION:
+            raise TrajectoryError(f"{path} is not a version {VERSION} trajectory dataset")
+        self.path = path
+        self.size = index['size']
+        self.board_bytes = index['board_bytes']
+        self.chunks = [(name, rows) for name, rows in index['chunks']]
+        self.rows = index['rows']
+
+    def __len__(self):
+        return self.rows
+
+    def chunk(self, k):
+        """The columns of chunk k as {name: read-only memmap}"""
+        name, rows = self.chunks[k]
+        return {column: np.load(chunk_path(self.path, name, column), mmap_mode='r')[:rows]
+                for column in COLUMNS}
+
+    def iter_chunks(self):
+        for k in range(len(self.chunks)):
+            yield self.chunk(k)
+
+    def column(self, name):
+        """One column of every chunk, a list of memmaps"""
+        return [chunk[name] for chunk in self.iter_chunks()]
+
+    def exponents(self, boards):
+        return exponents(boards, self.size)
+
+
+def export_selfplay(path, games, batch_size=10000, seed=0, chunk_rows=CHUNK_ROWS):
+    """Play random 4x4 games with batch.BatchGame and export every turn"""
+    import batch
+    game = batch.BatchGame(min(batch_size, games), seed=seed)
+    finished = 0
+    with TrajectoryWriter(path, GRID_SIZE, chunk_rows) as writer:
+        while finished < games:
+            actions = game.rng.integers(0, 4, size=len(game), dtype=np.uint8)
+            before = game.boards
+            was_done = game.done.copy()
+            rewards, moved, done = game.step(actions)
+            played = moved & ~was_done
+            writer.write_batch(before[played], actions[played], rewards[played], done[played])
+            ended = done & ~was_done
+            finished += int(ended.sum())
+            if ended.any():
+                game.reset(ended)
+        return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect 2048 training trajectories")
+    parser.add_argument('command', choices=['export', 'info'])
+    parser.add_argument('path', help="dataset directory")
+    parser.add_argument('-n', '--games', type=int, default=10000, help="games to export")
+    parser.add_argument('--batch', type=int, default=10000, help="games played at once")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'export':
+            start = time.perf_counter()
+            rows = export_selfplay(args.path, args.games, args.batch, args.seed, args.chunk_rows)
+            elapsed = time.perf_counter() - start
+            print(f"{rows} turns from {args.games} games in {elapsed:.2f}s "
+                  f"({rows / elapsed:.0f} turns/s)")
+        else:
+            dataset = TrajectoryDataset(args.path)
+            rewards = sum(int(c.sum(dtype=np.uint64)) for c in dataset.column('reward'))
+            episodes = sum(int(c.sum()) for c in dataset.column('done'))
+            print(f"Board size: {dataset.size}x{dataset.size}")
+            print(f"Turns: {len(dataset)} in {len(dataset.chunks)} chunks")
+            print(f"Finished games: {episodes}")
+            print(f"Total reward: {rewards}")
+    except TrajectoryError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())